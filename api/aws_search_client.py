@@ -13,6 +13,8 @@ from typing import List, Dict, Tuple, Optional
 import requests
 from flask import current_app
 from models import Mishna
+from utils.single_flight import coalesce
+from utils.text_utils import query_cache_key
 
 
 class AWSSearchError(Exception):
@@ -69,8 +71,8 @@ class AWSSemanticSearchClient:
         current_app.logger.info(f"Starting AWS semantic search, query length: {len(query)}")
         
         try:
-            # Make API request
-            api_response = self._make_api_request(query)
+            # Make API request, shared with identical concurrent searches
+            api_response = self._coalesced_api_request(query)
             
             # Fetch Mishnas from database
             mishnas_with_scores = self._fetch_mishnas_from_db(api_response)
@@ -107,6 +109,54 @@ class AWSSemanticSearchClient:
             current_app.logger.error(f"Unexpected error in AWS semantic search: {str(e)}")
             raise AWSSearchError(f"Search failed: {str(e)}")
     
+    def rank(self, query: str) -> List[Tuple[int, float]]:
+        """
+        Get the semantic ranking without loading Mishnas from the database.
+        
+        Only needs an application context for logging, so it can run on a
+        worker thread next to other searches.
+        
+        Args:
+            query: Search query text
+            
+        Returns:
+            List of (mishna number, score) tuples, highest score first
+            
+        Raises:
+            AWSSearchError: If API request fails
+        """
+        api_results = self._coalesced_api_request(query).get('results', {})
+        
+        ranking = []
+        for mishna_num_str, score in api_results.items():
+            try:
+                ranking.append((int(mishna_num_str), float(score)))
+            except (TypeError, ValueError) as e:
+                current_app.logger.warning(f"Invalid result '{mishna_num_str}': {score}: {str(e)}")
+        
+        ranking.sort(key=lambda item: item[1], reverse=True)
+        return ranking
+    
+    def _coalesced_api_request(self, query: str) -> dict:
+        """
+        Make the API request once for all concurrent identical queries.
+        
+        Queries are identical when they match apart from niqqud and spacing
+        (see query_cache_key); callers arriving while the request is in
+        flight, in this worker or another one, share its response.
+        
+        Args:
+            query: Search query text
+            
+        Returns:
+            The API response, see _make_api_request
+            
+        Raises:
+            AWSSearchError: If request fails or response is invalid
+        """
+        key = f"{self.api_url}\n{query_cache_key(query)}"
+        return coalesce(key, lambda: self._make_api_request(query))
+    
     def _make_api_request(self, query: str) -> dict:
         """
         Make HTTP POST request to AWS API Gateway.
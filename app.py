@@ -5,6 +5,8 @@ from models import db
 from config import Config
 from routes import main  # Import the routes blueprint
 from logger import setup_logger
+from utils.compression import init_compression
+from commands import register_commands
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -18,6 +20,12 @@ db.init_app(app)
 # Register the blueprint
 app.register_blueprint(main)
 
+# Compress responses (gzip/brotli)
+app = init_compression(app)
+
+# Register CLI commands (flask --app app <command>)
+app = register_commands(app)
+
 # Create database tables manually in the app context
 # with app.app_context():
 #     db.create_all()
@@ -0,0 +1,344 @@
+"""
+Flask CLI commands for maintenance and offline jobs.
+
+Usage:
+    flask --app app <command> [options]
+"""
+import json
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, Mishna
+from routes import get_aws_search_client
+from utils.static_export import export_static_site
+from utils.text_utils import normalize_hebrew, niqqud_offsets
+from utils import vector_index
+from utils.corpus_import import import_mishnayot
+from utils.corpus_export import EXPORT_FORMATS, stream_export
+from utils.embedding_pipeline import EMBEDDED_TABLES, embed_table
+from utils.related_mishnayot import DEFAULT_BATCH_SIZE as RELATED_BATCH_SIZE, rebuild_related, refresh_related
+from utils.popular_queries import app_log_lines, app_log_queries, precompute_popular_queries, semantic_queries
+from utils.query_log import read_query_log
+from utils.load_replay import (DEFAULT_MIX, HttpTarget, TestClientTarget, compare_runs, load_synthetic_corpus,
+                               recorded_traffic, run_replay, synthetic_traffic)
+
+
+@click.command('export-static')
+@click.argument('output_dir', type=click.Path(file_okay=False))
+@click.option('--full', is_flag=True, help='Re-render every page instead of only the changed ones.')
+@with_appcontext
+def export_static_command(output_dir, full):
+    """Render the whole corpus to static HTML and JSON in OUTPUT_DIR."""
+    stats = export_static_site(output_dir, full=full)
+    click.echo(f"Rendered {stats['rendered']} pages, skipped {stats['skipped']} unchanged, "
+               f"removed {stats['removed']} stale pages.")
+
+
+@click.command('backfill-normalized')
+@click.option('--batch-size', default=500, show_default=True, help='Rows read and updated per transaction.')
+@click.option('--all', 'recompute_all', is_flag=True,
+              help='Recompute every row, e.g. after the normalization pipeline changed.')
+@with_appcontext
+def backfill_normalized_command(batch_size, recompute_all):
+    """Fill mishna.text_normalized and text_offsets for rows that do not have them yet."""
+    updated = 0
+    last_id = ''
+    while True:
+        query = select(Mishna.id, Mishna.text_pretty, Mishna.text_raw).where(Mishna.id > last_id)
+        if not recompute_all:
+            query = query.where(or_(Mishna.text_normalized.is_(None), Mishna.text_offsets.is_(None)))
+        rows = db.session.execute(query.order_by(Mishna.id).limit(batch_size)).all()
+        if not rows:
+            break
+
+        db.session.execute(update(Mishna), [
+            {'id': row.id,
+             'text_normalized': normalize_hebrew(row.text_raw),
+             'text_offsets': niqqud_offsets(row.text_pretty)}
+            for row in rows
+        ])
+        db.session.commit()
+        updated += len(rows)
+        last_id = rows[-1].id
+
+    click.echo(f'Normalized {updated} mishnayot.')
+
+
+@click.command('import-mishnayot')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--dry-run', is_flag=True, help='Only report what would change.')
+@click.option('--prune', is_flag=True, help='Delete mishnayot that are not in the input.')
+@with_appcontext
+def import_mishnayot_command(source, dry_run, prune):
+    """Upsert the mishnayot of a raw text file (blank-line separated blocks, "header: text")."""
+    try:
+        report = import_mishnayot(source, dry_run=dry_run, prune=prune)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    except SQLAlchemyError as e:
+        raise click.ClickException(f'Import failed, nothing was written: {getattr(e, "orig", None) or e}')
+
+    for mishna_id in report.added:
+        click.echo(f'+ {mishna_id}')
+    for mishna_id, fields in report.changed.items():
+        click.echo(f'~ {mishna_id} ({", ".join(fields)})')
+    for mishna_id in report.missing:
+        click.echo(f'- {mishna_id}' if prune else f'? {mishna_id} is not in the input (kept)')
+    click.echo(f'{"Would import" if dry_run else "Imported"}: {len(report.added)} added, '
+               f'{len(report.changed)} changed, {report.unchanged} unchanged'
+               f'{f", {len(report.missing)} deleted" if prune else ""}.')
+
+    if dry_run:
+        return
+    # Renumbered and pruned mishnayot are still named in other mishnayot's related lists
+    touched = report.added + list(report.changed) + (report.missing if prune else [])
+    if touched:
+        refreshed = refresh_related(touched)
+        click.echo(f'Refreshed the related mishnayot of {refreshed} mishnayot.')
+    if report.added or report.changed:
+        # Running workers see the new corpus version once CORPUS_VERSION_TTL expires
+        click.echo('Run `flask --app app embed` to refresh the semantic search embeddings, '
+                   'then `flask --app app related` to rank the related mishnayot by them.')
+
+
+@click.command('export-corpus')
+@click.argument('output', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--format', 'export_format', type=click.Choice(list(EXPORT_FORMATS)), default='ndjson',
+              show_default=True, help='Output format.')
+@click.option('--batch-size', type=click.IntRange(1), help='Rows fetched per round trip (default: EXPORT_BATCH_SIZE).')
+@with_appcontext
+def export_corpus_command(output, export_format, batch_size):
+    """Stream the mishnayot with their tags and categories to OUTPUT ("-" for stdout)."""
+    # Binary, so the csv module's \r\n row endings are written unchanged
+    with click.open_file(output, 'wb') as target:
+        for chunk in stream_export(export_format, batch_size=batch_size):
+            target.write(chunk.encode('utf-8'))
+    if output != '-':
+        click.echo(f'Exported the corpus as {export_format} to {output}.')
+
+
+@click.command('embed')
+@click.option('--batch-size', type=click.IntRange(1), help='Rows encoded and written per transaction '
+                                                          '(default: EMBEDDING_BATCH_SIZE).')
+@click.option('--full', is_flag=True, help='Re-embed every row, not only the ones whose text changed.')
+@click.option('--only', type=click.Choice(list(EMBEDDED_TABLES)), help='Embed only mishnayot or only tags.')
+@with_appcontext
+def embed_command(batch_size, full, only):
+    """Compute semantic search embeddings for mishnayot and tags whose text changed."""
+    for table in ([only] if only else EMBEDDED_TABLES):
+        count = embed_table(table, batch_size=batch_size, full=full)
+        click.echo(f'Embedded {count} {table} rows.')
+
+
+@click.command('related')
+@click.option('--batch-size', default=RELATED_BATCH_SIZE, show_default=True, type=click.IntRange(1),
+              help='Mishnayot computed and written per transaction.')
+@with_appcontext
+def related_command(batch_size):
+    """Recompute the related mishnayot of every mishna from shared tags and embeddings."""
+    updated = rebuild_related(batch_size=batch_size)
+    click.echo(f'Computed related mishnayot for {updated} mishnayot.')
+
+
+@click.command('popular-queries')
+@click.option('--limit', type=click.IntRange(1), help='Popular queries kept (default: POPULAR_QUERIES_LIMIT).')
+@click.option('--min-count', type=click.IntRange(1),
+              help='Searches a query needs to be precomputed (default: POPULAR_QUERIES_MIN_COUNT).')
+@click.option('--rate', type=click.FloatRange(min=0, min_open=True),
+              help='Maximum semantic search calls per second (default: POPULAR_QUERIES_RATE).')
+@click.option('--log', 'log_path', type=click.Path(dir_okay=False),
+              help='Query log to mine, rotated backups included (default: QUERY_LOG_FILE).')
+@click.option('--app-log', 'app_log_path', type=click.Path(dir_okay=False),
+              help='Mine the search lines of this application log instead, e.g. for history before the query log.')
+@click.option('--full', is_flag=True, help='Recompute rankings that are still current as well.')
+@with_appcontext
+def popular_queries_command(limit, min_count, rate, log_path, app_log_path, full):
+    """Precompute the semantic rankings of the most frequent smart search queries."""
+    config = current_app.config
+    try:
+        client = get_aws_search_client()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if app_log_path:
+        queries = app_log_queries(app_log_lines(app_log_path))
+    else:
+        queries = semantic_queries(read_query_log(log_path))
+    stats = precompute_popular_queries(
+        client, queries,
+        limit=limit or config.get('POPULAR_QUERIES_LIMIT', 200),
+        min_count=min_count or config.get('POPULAR_QUERIES_MIN_COUNT', 3),
+        rate=rate or config.get('POPULAR_QUERIES_RATE', 1.0),
+        full=full)
+    click.echo(f'Computed {stats.refreshed} rankings, {stats.unchanged} already current, '
+               f'{stats.failed} failed, removed {stats.removed} no longer popular.')
+
+
+@click.group('vector-index')
+def vector_index_group():
+    """Manage the ANN indexes on mishna.embedding."""
+
+
+@vector_index_group.command('create')
+@click.argument('method', type=click.Choice(vector_index.INDEX_METHODS))
+@click.option('--m', default=vector_index.DEFAULT_HNSW_M, show_default=True, type=click.IntRange(2, 100),
+              help='HNSW: connections per node.')
+@click.option('--ef-construction', default=vector_index.DEFAULT_HNSW_EF_CONSTRUCTION, show_default=True,
+              type=click.IntRange(4, 1000), help='HNSW: candidate list size while building.')
+@click.option('--lists', type=click.IntRange(1, 32768), help='IVFFlat: number of lists (default: rows / 1000).')
+@click.option('--replace', is_flag=True, help='Drop an existing index of this method first, to change its parameters.')
+@click.option('--blocking', is_flag=True, help='Build without CONCURRENTLY (faster, blocks writes).')
+@with_appcontext
+def vector_index_create_command(method, m, ef_construction, lists, replace, blocking):
+    """Create an HNSW or IVFFlat index on mishna.embedding."""
+    statement = vector_index.create_index(method, m=m, ef_construction=ef_construction, lists=lists,
+                                          concurrently=not blocking, replace=replace)
+    click.echo(statement)
+
+
+@vector_index_group.command('drop')
+@click.argument('method', type=click.Choice(vector_index.INDEX_METHODS))
+@with_appcontext
+def vector_index_drop_command(method):
+    """Drop the HNSW or IVFFlat index."""
+    vector_index.drop_index(method)
+    click.echo(f'Dropped {vector_index.index_name(method)}.')
+
+
+@vector_index_group.command('rebuild')
+@click.argument('method', type=click.Choice(vector_index.INDEX_METHODS))
+@click.option('--blocking', is_flag=True, help='Rebuild without CONCURRENTLY (faster, blocks writes).')
+@with_appcontext
+def vector_index_rebuild_command(method, blocking):
+    """Rebuild an index in place, e.g. after a bulk load."""
+    vector_index.rebuild_index(method, concurrently=not blocking)
+    click.echo(f'Rebuilt {vector_index.index_name(method)}.')
+
+
+@vector_index_group.command('status')
+@with_appcontext
+def vector_index_status_command():
+    """List the ANN indexes and their sizes."""
+    indexes = vector_index.list_indexes()
+    if not indexes:
+        click.echo('No vector indexes; semantic queries scan every row.')
+    for index in indexes:
+        click.echo(f"{index['name']} ({index['size'] / 1024:.0f} KiB): {index['definition']}")
+
+
+@vector_index_group.command('report')
+@click.argument('method', type=click.Choice(vector_index.INDEX_METHODS))
+@click.option('--values', default='10,20,40,80,160', show_default=True,
+              help='Comma-separated ef_search (HNSW) or probes (IVFFlat) values to compare.')
+@click.option('--k', default=10, show_default=True, type=click.IntRange(1, 1000), help='Neighbours compared per query.')
+@click.option('--sample', default=50, show_default=True, type=click.IntRange(1), help='Stored embeddings used as queries.')
+@with_appcontext
+def vector_index_report_command(method, values, k, sample):
+    """Compare recall@k and latency of ANN search against exact search."""
+    try:
+        settings = [int(value) for value in values.split(',') if value.strip()]
+    except ValueError:
+        raise click.BadParameter('values must be comma-separated integers', param_hint='--values')
+
+    report = vector_index.recall_report(method, settings, k=k, sample=sample)
+    if not report:
+        click.echo('No embeddings to query.')
+        return
+    click.echo(f"{'setting':<22}{'index':<32}{'recall@' + str(k):>10}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}")
+    for row in report:
+        click.echo(f"{row['setting']:<22}{row['index']:<32}{row['recall']:>10.3f}{row['p50_ms']:>10.2f}"
+                   f"{row['p95_ms']:>10.2f}{row['mean_ms']:>10.2f}")
+    if any(row['index'] != vector_index.index_name(method) for row in report[1:]):
+        click.echo(f'Note: the planner did not use {vector_index.index_name(method)} for every setting; '
+                   f'create it, or drop the other index to measure this one.')
+
+
+def _parse_mix(value):
+    """Parse --mix 'label=weight,label=weight' into a dict."""
+    mix = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        label, _, weight = item.partition('=')
+        try:
+            mix[label.strip()] = float(weight)
+        except ValueError:
+            raise click.BadParameter(f'Expected label=weight, got {item!r}', param_hint='--mix')
+    return mix
+
+
+@click.group('replay')
+def replay_group():
+    """Replay search traffic and compare latency reports."""
+
+
+@replay_group.command('run')
+@click.option('--source', type=click.Choice(['synthetic', 'query-log']), default='synthetic', show_default=True,
+              help='Draw a synthetic mix of searches, or replay the query log.')
+@click.option('--log', 'log_path', type=click.Path(dir_okay=False),
+              help='Query log to replay, rotated backups included (default: QUERY_LOG_FILE).')
+@click.option('--requests', 'count', type=click.IntRange(1),
+              help='Synthetic searches to send, or the most recent logged ones to replay (default: 500 / all).')
+@click.option('--mix', help=f"Synthetic weights per action, e.g. {','.join(f'{k}={v}' for k, v in DEFAULT_MIX.items())}.")
+@click.option('--concurrency', default=4, show_default=True, type=click.IntRange(1), help='Concurrent senders.')
+@click.option('--rate', type=click.FloatRange(min=0, min_open=True),
+              help='Mean arrivals per second (Poisson); omit to send back to back.')
+@click.option('--url', help='Base URL of a running server; the in-process test client if omitted.')
+@click.option('--clients', default=200, show_default=True, type=click.IntRange(1),
+              help='Simulated client addresses (test client only).')
+@click.option('--seed', type=int, help='Random seed, for repeatable traffic and arrivals.')
+@click.option('--output', type=click.File('w', encoding='utf-8'), help='Write the run report as JSON.')
+@with_appcontext
+def replay_run_command(source, log_path, count, mix, concurrency, rate, url, clients, seed, output):
+    """Send search traffic to the app and report latency percentiles per action."""
+    try:
+        if source == 'query-log':
+            traffic = recorded_traffic(read_query_log(log_path), limit=count)
+        else:
+            traffic = synthetic_traffic(load_synthetic_corpus(), count or 500,
+                                        mix=_parse_mix(mix) if mix else None, seed=seed)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if not traffic:
+        raise click.ClickException('No searches to replay.')
+
+    target = HttpTarget(url) if url else TestClientTarget(current_app._get_current_object(), clients)
+    click.echo(f'Sending {len(traffic)} searches to {target} '
+               f"({concurrency} senders, {f'{rate}/s' if rate else 'back to back'})...")
+    report = run_replay(target, traffic, concurrency=concurrency, rate=rate, seed=seed)
+
+    click.echo(f"{'action':<24}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}"
+               f"{'p99 ms':>10}{'mean ms':>10}")
+    for label, row in report['actions'].items():
+        click.echo(f"{label:<24}{row['requests']:>9}{row['errors']:>8}{row['throughput_rps']:>9.1f}"
+                   f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['mean_ms']:>10.1f}")
+    if output:
+        json.dump(report, output, indent=2)
+        click.echo(f'Wrote the report to {output.name}.')
+
+
+@replay_group.command('compare')
+@click.argument('base', type=click.File('r', encoding='utf-8'))
+@click.argument('new', type=click.File('r', encoding='utf-8'))
+def replay_compare_command(base, new):
+    """Diff two run reports written by `replay run --output`."""
+    rows = compare_runs(json.load(base), json.load(new))
+    click.echo(f"{'action':<24}{'metric':<16}{'base':>12}{'new':>12}{'change':>10}")
+    for row in rows:
+        change = f"{row['change']:+.1%}" if row['change'] is not None else '-'
+        click.echo(f"{row['label']:<24}{row['metric']:<16}{row['base']:>12.3f}{row['new']:>12.3f}{change:>10}")
+
+
+def register_commands(app):
+    """Register the CLI commands on the application."""
+    app.cli.add_command(export_static_command)
+    app.cli.add_command(backfill_normalized_command)
+    app.cli.add_command(import_mishnayot_command)
+    app.cli.add_command(export_corpus_command)
+    app.cli.add_command(embed_command)
+    app.cli.add_command(related_command)
+    app.cli.add_command(popular_queries_command)
+    app.cli.add_command(vector_index_group)
+    app.cli.add_command(replay_group)
+    return app
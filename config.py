@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -47,3 +48,73 @@ class Config:
             'sslmode': 'require'
         }
     }
+
+    # Corpus version - seconds a computed fingerprint is trusted before re-checking
+    CORPUS_VERSION_TTL = int(os.getenv('CORPUS_VERSION_TTL', '30'))
+
+    # Response Compression
+    COMPRESSION_ENABLED = True
+    COMPRESSION_MIN_SIZE = 500  # Skip responses smaller than this (bytes)
+    COMPRESSION_LEVEL = 6  # gzip level
+    COMPRESSION_BROTLI_QUALITY = 5  # brotli quality for dynamic responses
+    COMPRESSION_CACHE_SIZE = 64  # Compressed deterministic pages kept in memory
+
+    # Permalink HTTP caching (/mishna/<n>, /chapter/<c>, /tag/<id>)
+    PERMALINK_MAX_AGE = 300  # seconds browsers/CDNs may serve without revalidating
+    PERMALINK_STALE_WHILE_REVALIDATE = 86400  # seconds a stale copy may be served while revalidating
+
+    # Rendered results fragments (/results) kept in memory
+    FRAGMENT_CACHE_SIZE = 256
+
+    # Hybrid search: BM25 matches fused with the semantic ranking (exact search returns every match)
+    LEXICAL_TOP_K = int(os.getenv('LEXICAL_TOP_K', '30'))
+
+    # Embedding ingestion (see utils/embedding_pipeline.py and `flask embed`)
+    EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'imvladikon/sentence-transformers-alephbert')
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '32'))
+    EMBEDDING_REFRESH_ON_SAVE = os.getenv('EMBEDDING_REFRESH_ON_SAVE', 'true').lower() == 'true'  # re-embed in the background after manage_content saves
+
+    # Related mishnayot (see utils/related_mishnayot.py and `flask related`)
+    RELATED_TOP_K = int(os.getenv('RELATED_TOP_K', '5'))
+    RELATED_TAG_WEIGHT = float(os.getenv('RELATED_TAG_WEIGHT', '0.5'))  # weight of tag Jaccard vs. embedding cosine
+
+    # Single-flight coalescing of identical concurrent semantic queries (see utils/single_flight.py)
+    SINGLE_FLIGHT_LOCK_DIR = os.getenv('SINGLE_FLIGHT_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'pirkei-avot-single-flight'))  # '' to coalesce within a worker only
+    SINGLE_FLIGHT_SHARE_SECONDS = float(os.getenv('SINGLE_FLIGHT_SHARE_SECONDS', '5'))  # how long other workers may reuse a result
+
+    # Structured query log (see utils/query_log.py): NDJSON, written in batches by a background thread
+    QUERY_LOG_ENABLED = os.getenv('QUERY_LOG_ENABLED', 'true').lower() == 'true'
+    QUERY_LOG_FILE = os.getenv('QUERY_LOG_FILE', 'logs/queries.ndjson')
+    QUERY_LOG_MAX_BYTES = int(os.getenv('QUERY_LOG_MAX_BYTES', str(16 * 1024 * 1024)))  # rotate at this size
+    QUERY_LOG_BACKUP_COUNT = int(os.getenv('QUERY_LOG_BACKUP_COUNT', '10'))
+    QUERY_LOG_BATCH_SIZE = 100  # records per write
+    QUERY_LOG_FLUSH_SECONDS = 2.0  # longest a record waits in memory
+    QUERY_LOG_MAX_PENDING = 10000  # records queued before new ones are dropped
+
+    # Popular-query precomputation (see utils/popular_queries.py and `flask popular-queries`)
+    POPULAR_QUERIES_LIMIT = int(os.getenv('POPULAR_QUERIES_LIMIT', '200'))
+    POPULAR_QUERIES_MIN_COUNT = int(os.getenv('POPULAR_QUERIES_MIN_COUNT', '3'))
+    POPULAR_QUERIES_RATE = float(os.getenv('POPULAR_QUERIES_RATE', '1.0'))  # semantic search calls per second
+
+    # Per-address rate limiting of public endpoints (see utils/rate_limiter.py); disable only for load tests
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+
+    # Autocomplete (see utils/autocomplete.py): seconds browsers may reuse a /autocomplete response
+    AUTOCOMPLETE_MAX_AGE = int(os.getenv('AUTOCOMPLETE_MAX_AGE', '60'))
+    AUTOCOMPLETE_POPULARITY_DAYS = int(os.getenv('AUTOCOMPLETE_POPULARITY_DAYS', '30'))  # query log days seeding popularity on startup
+
+    # Corpus export (see utils/corpus_export.py): rows per server-side cursor batch
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '500'))
+
+    # pgvector ANN query-time settings, applied per transaction (see utils/vector_index.py)
+    VECTOR_EF_SEARCH = int(os.getenv('VECTOR_EF_SEARCH', '40'))  # HNSW candidate list size
+    VECTOR_IVFFLAT_PROBES = int(os.getenv('VECTOR_IVFFLAT_PROBES', '10'))  # IVFFlat lists scanned
+
+    # Hybrid search (lexical + AWS semantic, fused with reciprocal-rank fusion)
+    HYBRID_SEARCH_ENABLED = os.getenv('HYBRID_SEARCH_ENABLED', 'true').lower() == 'true'
+    # Seconds to wait for the semantic leg. The AWS client itself allows 10s (api/aws_search_client.py): a later
+    # answer still arrives and is cached for the next identical query, but this request shows lexical results
+    # only. Raising the deadline towards 10s trades page latency on slow calls for fewer partial result pages.
+    HYBRID_SEMANTIC_DEADLINE = float(os.getenv('HYBRID_SEMANTIC_DEADLINE', '3.0'))
+    HYBRID_MAX_WORKERS = 4  # threads running semantic calls
+    HYBRID_CACHE_SIZE = 256  # fused rankings kept in memory
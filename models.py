@@ -1,5 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 
+from utils.text_utils import normalize_hebrew, niqqud_offsets
+
 db = SQLAlchemy()
 
 
@@ -14,7 +16,10 @@ class Mishna(db.Model):
         number (int): Unique number for each mishna.
         text_pretty (str): The formatted content of the mishna.
         text_raw (str): The raw content of the mishna.
+        text_normalized (str): Canonical search form of the text (see utils.text_utils.normalize_hebrew).
+        text_offsets (list[int]): Index in text_pretty of every character of text_raw, for highlighting.
         interpretation (str): Optional interpretation or commentary for the mishna.
+        related (list[dict]): Precomputed related mishnayot, best first (see utils.related_mishnayot).
         tags (list[Tag]): A list of tags associated with the mishna.
     """
     __tablename__ = 'mishna'
@@ -24,15 +29,25 @@ class Mishna(db.Model):
     number = db.Column(db.SmallInteger, nullable=False, unique=True)  # Unique number for each mishna
     text_pretty = db.Column(db.String, nullable=False)
     text_raw = db.Column(db.String, nullable=False)
+    text_normalized = db.Column(db.Text)  # Precomputed on save, searched with a trigram index
+    text_offsets = db.Column(db.JSON)  # Precomputed on save, maps text_raw positions to text_pretty
     interpretation = db.Column(db.Text)
+    related = db.Column(db.JSON)  # Precomputed by utils.related_mishnayot: [{"id", "number", "score"}, ...]
     tags = db.relationship('Tag', secondary='mishna_tag', back_populates='mishnaiot')
 
+    __table_args__ = (
+        db.Index('idx_mishna_text_normalized', 'text_normalized',
+                 postgresql_using='gin', postgresql_ops={'text_normalized': 'gin_trgm_ops'}),
+    )
+
     def __init__(self, chapter, mishna, number, text_pretty, text_raw, tags, interpretation=""):
         self.chapter = chapter
         self.mishna = mishna
         self.number = number
         self.text_pretty = text_pretty
         self.text_raw = text_raw
+        self.text_normalized = normalize_hebrew(text_raw)
+        self.text_offsets = niqqud_offsets(text_pretty)
         self.tags = tags
         self.interpretation = interpretation
         # Create a unique id by combining chapter and mishna
@@ -76,3 +91,27 @@ mishna_tag = db.Table(
     db.Column('mishna_id', db.String(100), db.ForeignKey('mishna.id'), primary_key=True),  # Foreign key updated to reference Mishna.id
     db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True)
 )
+
+
+class PopularQuery(db.Model):
+    """
+    Model representing a frequent smart search query with its precomputed semantic ranking.
+
+    Filled by `flask popular-queries` (see utils.popular_queries); a row is
+    only served while corpus_version matches the current corpus version.
+
+    Attributes:
+        normalized_query (str): The query without niqqud and extra spacing (see utils.text_utils.query_cache_key).
+        query_text (str): The most frequent spelling of the query, as sent to the semantic search API.
+        hits (int): Number of times the query was searched, in the query log the job last read.
+        results (dict): Semantic ranking as {mishna number: score}.
+        corpus_version (str): Corpus version the ranking was computed at.
+        refreshed_at (datetime): When the ranking was computed.
+    """
+    __tablename__ = 'popular_query'
+    normalized_query = db.Column(db.String(500), primary_key=True)
+    query_text = db.Column(db.String(500), nullable=False)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    results = db.Column(db.JSON, nullable=False)
+    corpus_version = db.Column(db.String(64), nullable=False)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
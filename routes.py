@@ -1,16 +1,39 @@
 from functools import wraps
-from flask import Blueprint, render_template, request, current_app, redirect, session
-from flask_wtf.csrf import generate_csrf
+from flask import (Blueprint, render_template, request, current_app, redirect, session, make_response, jsonify, url_for,
+                   Response, stream_with_context)
+from flask_wtf.csrf import generate_csrf, validate_csrf
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import text
+from sqlalchemy import text, or_, and_
+from sqlalchemy.orm import selectinload
+from wtforms.validators import ValidationError
 
 from api.supabase_client import supabase
 from api.aws_search_client import AWSSemanticSearchClient, AWSSearchError
 from constants import ALLOWED_CHAPTERS
 from forms import MishnaForm, TagForm
 from models import db, Mishna, Tag, Category
-from utils.text_utils import remove_niqqud
+from utils.text_utils import remove_niqqud, normalize_hebrew, niqqud_offsets
 from utils.rate_limiter import rate_limit
+from utils.compression import cache_compressed
+from utils.autocomplete import DEFAULT_LIMIT, KINDS, MAX_LIMIT, autocomplete_index
+from utils.corpus_version import bump_corpus_version, fresh_corpus_version, get_corpus_version
+from utils.lru_cache import LRUCache
+from utils.http_cache import corpus_conditional
+from utils.corpus_bundle import get_corpus_bundle
+from utils.corpus_export import EXPORT_FORMATS, stream_export
+from utils.corpus_index import refresh_search_indexes
+from utils.embedding_pipeline import enqueue_embedding
+from utils.fuzzy_index import suggest_correction
+from utils.highlight import highlight_segments
+from utils.hybrid_search import hybrid_search
+from utils.lexical_index import lexical_index
+from utils.popular_queries import precomputed_client
+from utils.query_language import is_structured_query
+from utils.query_log import begin_search, finish_search, mark_cache_hit, stage
+from utils.related_mishnayot import refresh_related
+from utils.tag_facets import tag_facets
+from utils.tag_operations import apply_tag_changes, delete_tags, merge_tags, recategorize_tags, tagged_mishna_ids
+import gzip
 import os
 
 # ============================================================================
@@ -100,218 +123,734 @@ def logout():
     session.clear()
     return redirect("/", code=302)
 
+# ~~~~~~~~~~~~~~~~~~~~~~~~~ Search Helpers ~~~~~~~~~~~~~~~~~~~~~
+def _query_chapter(chapter):
+    """Return all mishnayot of a chapter ordered by number."""
+    return Mishna.query.filter_by(chapter=chapter).order_by(Mishna.number).all()
+
+
+def _query_mishna(chapter, mishna):
+    """Return the mishna at chapter/mishna as a (possibly empty) list."""
+    mishna_id = f"{chapter}_{mishna}"
+    return Mishna.query.filter_by(id=mishna_id).all()
+
+
+def _query_by_number(number):
+    """Return the mishna with the given sequential number as a (possibly empty) list."""
+    if not 1 <= number <= 108:
+        return []
+    result = Mishna.query.filter_by(number=number).first()
+    return [result] if result else []
+
+
+def _query_by_tags(tag_ids):
+    """Return mishnayot having any of the given tags ordered by number."""
+    return Mishna.query.filter(Mishna.tags.any(Tag.id.in_(tag_ids))).order_by(Mishna.number).all()
+
+
+def _query_text(query_text):
+    """
+    Return mishnayot whose text contains the query, ordered by number.
+
+    Both sides are compared in their normalized form (see normalize_hebrew),
+    using the precomputed mishna.text_normalized column. Rows that were not
+    backfilled yet fall back to the old niqqud-insensitive match on text_raw.
+    """
+    query_normalized = normalize_hebrew(query_text)
+    query_raw = remove_niqqud(query_text.lower())
+    return Mishna.query.filter(or_(
+        Mishna.text_normalized.contains(query_normalized, autoescape=True),
+        and_(Mishna.text_normalized.is_(None), Mishna.text_raw.ilike(f"%{query_raw}%")),
+    )).order_by(Mishna.number).all()
+
+
+def _query_ranked(query_text):
+    """
+    Return every mishna matching a lexical query, ranked by BM25.
+
+    Plain words must all occur; quoted phrases, -exclusion, OR and tag:/chapter:
+    filters are supported (see utils/query_language). The score is attached as
+    similarity_score, scaled so the best match is 100, and the matched words as
+    text_segments for highlighting.
+    """
+    matches = lexical_index.search(query_text)
+    if not matches:
+        return []
+
+    mishnayot = {m.id: m for m in Mishna.query.options(selectinload(Mishna.tags))
+                 .filter(Mishna.id.in_([match.mishna_id for match in matches]))}
+    top_score = matches[0].score
+    results = []
+    for match in matches:
+        mishna = mishnayot.get(match.mishna_id)
+        if mishna is not None:
+            # Queries made of filters only are not ranked
+            if top_score > 0:
+                mishna.similarity_score = round(match.score / top_score * 100, 1)
+            segments = highlight_segments(mishna.text_pretty, mishna.text_offsets, match.spans)
+            if segments:
+                mishna.text_segments = segments
+            results.append(mishna)
+    return results
+
+
+def _query_exact(query_text):
+    """Ranked word search, falling back to substring search for partial words in plain queries."""
+    results = _query_ranked(query_text)
+    if results or is_structured_query(query_text):
+        return results
+    return _query_text(query_text)
+
+
+def load_tag_catalog():
+    """
+    Load the tag catalog embedded in the search page.
+
+    Returns:
+        Tuple of (tags, categories) as JSON-serializable lists of dicts
+    """
+    all_tags = Tag.query.all()
+    counts = tag_facets.counts()
+    tags_with_categories = [{"id": tag.id, "name": tag.name, "category": tag.category_name,
+                             "count": counts.get(tag.id, 0)} for tag in all_tags]
+
+    # Fetch categories for color legend
+    categories = Category.query.all()
+    categories_serialized = [
+        {"id": c.id, "name": c.name, "color": c.color} for c in categories
+    ]
+    return tags_with_categories, categories_serialized
+
+
+def render_search_page(form, results, catalog=None, **context):
+    """
+    Render the search page with the tag catalog and color legend.
+
+    Args:
+        form: MishnaForm used for the chapter/mishna dropdowns
+        results: List of Mishna objects to display
+        catalog: Optional (tags, categories) tuple from load_tag_catalog(),
+                 loaded from the database when omitted
+        **context: Template variables overriding the defaults below
+    """
+    tags_with_categories, categories_serialized = catalog or load_tag_catalog()
+
+    template_context = {
+        'searchType': 'search_mishna',
+        'search_query': None,
+        'aws_semantic_query': None,
+        'is_semantic_search': False,
+        'is_exact_match': False,
+        'selected_tags': [],
+        'selected_chapter': None,
+        'selected_mishna': None,
+        'search_suggestion': None,
+        'search_notice': None,
+        'partial_results': False,
+        'result_facets': None,
+    }
+    template_context.update(context)
+
+    return render_template('index.html',
+                           form=form,
+                           results=results,
+                           ALLOWED_CHAPTERS=ALLOWED_CHAPTERS,
+                           all_tags=tags_with_categories,
+                           categories=categories_serialized,
+                           **template_context)
+
+
+class SearchError(Exception):
+    """Raised when a search cannot be completed; the message is shown to the user."""
+    pass
+
+
+def _semantic_search(query_text):
+    """
+    Run an AWS semantic search.
+
+    Returns:
+        List of Mishna objects with similarity_score attached
+
+    Raises:
+        SearchError: If the search fails or is not configured
+    """
+    current_app.logger.info(f'Performing AWS semantic search with query length: {len(query_text)} characters')
+
+    try:
+        # Popular queries are served from their precomputed ranking, others from AWS (lazy loading)
+        client = precomputed_client(query_text) or get_aws_search_client()
+        results = client.search(query_text)
+
+        current_app.logger.info(f'AWS semantic search returned {len(results)} results')
+        return results
+
+    except (AWSSearchError, ValueError) as e:
+        raise _semantic_search_error(e)
+
+
+def _semantic_search_error(error):
+    """Log a failed semantic search and wrap it in a SearchError with a user-facing message."""
+    if isinstance(error, ValueError):
+        current_app.logger.error(f'AWS search configuration error: {str(error)}')
+        return SearchError("חיפוש סמנטי אינו מוגדר כראוי. אנא פנה למנהל המערכת.")
+    current_app.logger.error(f'AWS search failed: {str(error)}')
+    return SearchError("חיפוש סמנטי נכשל. אנא נסה שוב מאוחר יותר.")
+
+
+def _hybrid_search(query_text):
+    """
+    Run lexical and semantic search concurrently and fuse their rankings.
+
+    Returns:
+        Tuple of (results, result_context). Results carry similarity_score,
+        scaled so the best fused match is 100, and text_segments for the words
+        the lexical search matched. When the semantic search missed its deadline
+        or failed, result_context marks the results as partial.
+
+    Raises:
+        SearchError: If the semantic search fails and the lexical search found nothing
+    """
+    current_app.logger.info(f'Performing hybrid search with query length: {len(query_text)} characters')
+    try:
+        client = precomputed_client(query_text) or get_aws_search_client()
+        config_error = None
+    except ValueError as e:
+        client, config_error = None, e
+
+    hybrid = hybrid_search(query_text, client)
+    error = hybrid.error or config_error
+    if not hybrid.matches and error is not None:
+        raise _semantic_search_error(error)
+
+    mishnayot = {m.number: m for m in Mishna.query.options(selectinload(Mishna.tags))
+                 .filter(Mishna.number.in_([match.number for match in hybrid.matches]))}
+    results = []
+    for match in hybrid.matches:
+        mishna = mishnayot.get(match.number)
+        if mishna is not None:
+            mishna.similarity_score = round(match.score / hybrid.matches[0].score * 100, 1)
+            segments = highlight_segments(mishna.text_pretty, mishna.text_offsets, match.spans)
+            if segments:
+                mishna.text_segments = segments
+            results.append(mishna)
+    current_app.logger.info(f'Hybrid search returned {len(results)} results (complete: {hybrid.complete})')
+
+    result_context = {}
+    if not hybrid.complete:
+        result_context['partial_results'] = True
+        result_context['search_notice'] = "החיפוש הסמנטי לא הושלם. מוצגות תוצאות חיפוש מילים בלבד."
+    return results, result_context
+
+
+def _perform_search(action, mishna_form):
+    """
+    Run a search action submitted from the search form.
+
+    Args:
+        action: The form's action field (search_mishna, search_smart, ...)
+        mishna_form: MishnaForm bound to the submitted form data
+
+    Returns:
+        Tuple of (results, selected_tags, result_context), where result_context
+        holds template variables describing the results (e.g. search_suggestion)
+
+    Raises:
+        SearchError: If a semantic search fails
+    """
+    results = []
+    selected_tags = []
+    result_context = {}
+    current_app.logger.info(f'Search action initiated: {action}')
+
+    # Search by Chapter and Mishna
+    if action == 'search_mishna':
+        chapter = mishna_form.chapter.data
+        mishna = mishna_form.mishna.data
+        # If 'כל המשניות' (all) is selected, fetch all mishnas for the chapter
+        if mishna == 'all':
+            results = _query_chapter(chapter)
+        else:
+            results = _query_mishna(chapter, mishna)
+
+    # Smart Search - Unified Free Text and AI Search
+    elif action == 'search_smart':
+        query_text = request.form.get('search_query', '').strip()
+        is_exact_match = request.form.get('exact_match') == 'on'
+        
+        current_app.logger.info(f'Smart search initiated. Query: {query_text}, Exact Match: {is_exact_match}')
+        
+        if is_exact_match:
+            # LOGIC A: Exact Match - BM25 ranked word search, SQL substring fallback
+            query_text_normalized = normalize_hebrew(query_text)
+            current_app.logger.info(f'Performing exact match search with normalized query length: {len(query_text_normalized)} characters')
+            
+            with stage('lexical'):
+                results = _query_exact(query_text)
+            current_app.logger.info(f'Found {len(results)} results for exact match search')
+
+            # Nothing found - retry with typos corrected against the corpus vocabulary
+            if not results and not is_structured_query(query_text):
+                with stage('fuzzy'):
+                    suggestion = suggest_correction(query_text)
+                if suggestion:
+                    with stage('lexical'):
+                        results = _query_exact(suggestion)
+                    current_app.logger.info(f'Found {len(results)} results for corrected query: {suggestion}')
+                    if results:
+                        result_context['search_suggestion'] = suggestion
+        else:
+            # LOGIC B: AI Search - AWS semantic search, fused with BM25 when hybrid search is on
+            if current_app.config.get('HYBRID_SEARCH_ENABLED', True):
+                with stage('hybrid'):
+                    results, result_context = _hybrid_search(query_text)
+            else:
+                with stage('semantic'):
+                    results = _semantic_search(query_text)
+
+        if results and not is_structured_query(query_text):
+            autocomplete_index.record_query(query_text)
+
+    # Free Text Search (DEPRECATED - kept for backward compatibility)
+    elif action == 'search_free_text':
+        query_text = mishna_form.text.data or ''
+        current_app.logger.info(f'Performing free text search with query length: {len(query_text)} characters')
+
+        results = _query_text(query_text)
+        current_app.logger.info(f'Found {len(results)} results for free text search')
+
+    # Tag-based Search
+    elif action == 'search_by_tags':
+        selected_tags = request.form.get('tags', '').split(',')
+        selected_tags = [int(tag_id) for tag_id in selected_tags if tag_id.isdigit()]
+        current_app.logger.info(f'Searching by tags: {selected_tags}')
+
+        with stage('tags'):
+            results = _query_by_tags(selected_tags)
+        current_app.logger.info(f'Found {len(results)} results for tag-based search')
+
+    # AWS Semantic Search (DEPRECATED - kept for backward compatibility)
+    elif action == 'search_aws_semantic':
+        query_text = request.form.get('aws_semantic_query', '').strip()
+        with stage('semantic'):
+            results = _semantic_search(query_text)
+
+    # Navigate by Mishna Number
+    elif action == 'navigate_by_number':
+        mishna_number = request.form.get('mishna_number')
+        current_app.logger.info(f'Navigating to mishna number: {mishna_number}')
+        
+        if mishna_number and mishna_number.isdigit():
+            number = int(mishna_number)
+            # Validate number is in valid range
+            if 1 <= number <= 108:
+                results = _query_by_number(number)
+                current_app.logger.info(f'Found mishna with number {number}: {bool(results)}')
+            else:
+                current_app.logger.warning(f'Invalid mishna number: {number}')
+                results = []
+        else:
+            current_app.logger.warning(f'Invalid mishna number format: {mishna_number}')
+            results = []
+
+    # ============================================================================
+    # AI/Semantic Search - COMMENTED OUT (not in use)
+    # ============================================================================
+    # This search functionality has been disabled to reduce memory usage.
+    # The route handler remains here but will not be called since the UI
+    # button has been removed from index.html
+    # ============================================================================
+    
+    # # Semantic AI Search
+    # elif action == 'search_semantic':
+    #     query_text = request.form.get('semantic_query', '').strip()
+    #     current_app.logger.info(f'Performing semantic search with query length: {len(query_text)} characters')
+    #     
+    #     # Additional rate limiting for expensive semantic search
+    #     from utils.rate_limiter import rate_limiter
+    #     from utils.search_cache import search_cache
+    #     
+    #     key = request.remote_addr or 'unknown'
+    #     if not rate_limiter.is_allowed(key + '_semantic', 10, 60):
+    #         current_app.logger.warning(f'Semantic search rate limit exceeded for {key}')
+    #         return render_template('error.html', 
+    #                              error="חרגת ממגבלת החיפוש הסמנטי. מותרות 10 בקשות בדקה. אנא נסה שוב בעוד מספר שניות.")
+    #     
+    #     # Check cache first
+    #     cached_results = search_cache.get(query_text)
+    #     if cached_results is not None:
+    #         current_app.logger.info(f'Cache hit for query: {query_text[:50]}...')
+    #         results, compromise_info = cached_results
+    #     else:
+    #         current_app.logger.info(f'Cache miss - performing semantic search')
+    #         # Lazy-load the model only when needed
+    #         engine = get_semantic_search_engine()
+    #         results, compromise_info = engine.search_with_compromise(query_text)
+    #         # Cache the results
+    #         search_cache.set(query_text, (results, compromise_info))
+    #     
+    #     # Log compromise mode status
+    #     if compromise_info['is_active']:
+    #         current_app.logger.info(
+    #             f'Compromise mode was activated: '
+    #             f'Found results at {compromise_info["current_threshold"]}% '
+    #             f'(initial: {compromise_info["initial_threshold"]}%, '
+    #             f'attempts: {compromise_info["attempts"]})'
+    #         )
+
+    if len(results) > 1:
+        with stage('facets'):
+            result_context['result_facets'] = tag_facets.result_facets(result.number for result in results)
+
+    return results, selected_tags, result_context
+
+
+def _search_display_context(action, mishna_form):
+    """Template variables echoing the submitted query back to the user."""
+    context = {
+        'search_query': None,
+        'aws_semantic_query': None,
+        'is_semantic_search': False,
+        'is_exact_match': False,
+    }
+
+    if action == 'search_free_text':
+        context['search_query'] = mishna_form.text.data
+    elif action == 'search_aws_semantic':
+        context['aws_semantic_query'] = request.form.get('aws_semantic_query', '').strip()
+        context['search_query'] = context['aws_semantic_query']
+        context['is_semantic_search'] = True
+    elif action == 'search_smart':
+        context['search_query'] = request.form.get('search_query', '').strip()
+        context['is_exact_match'] = request.form.get('exact_match') == 'on'
+        context['is_semantic_search'] = not context['is_exact_match']  # It's semantic if not exact match
+    # elif action == 'search_semantic':  # COMMENTED OUT - AI search disabled
+    #     context['search_query'] = request.form.get('semantic_query', '').strip()
+    #     context['is_semantic_search'] = True
+
+    return context
+
+
 @main.route('/', methods=['GET', 'POST'])
 @rate_limit(max_requests=20, window_seconds=60)  # 20 requests per minute
 def search_mishna():
     """Handle mishna search functionality."""
     try:
-        mishna_form = MishnaForm(request.form)
+        # The public search form is read-only and never validated, so it carries no
+        # per-session CSRF token - this keeps the rendered page deterministic
+        mishna_form = MishnaForm(request.form, meta={'csrf': False})
         results = []
         selected_tags = []
-        all_tags = Tag.query.all()
-        tags_with_categories = [{"id": tag.id, "name": tag.name, "category": tag.category_name} for tag in all_tags]
         search_type = request.form.get('search_type', 'search_mishna')
+        display_context = {}
+        result_context = {}
 
-        # Fetch categories for color legend
-        categories = Category.query.all()
-        categories_serialized = [
-            {"id": c.id, "name": c.name, "color": c.color} for c in categories
-        ]
+        if request.method == 'GET':
+            cache_compressed('index')
 
         if request.method == 'POST':
             action = request.form.get('action')
-            current_app.logger.info(f'Search action initiated: {action}')
+            _begin_query_log('search', action, mishna_form)
+            try:
+                with stage('search'):
+                    results, selected_tags, result_context = _perform_search(action, mishna_form)
+            except SearchError as e:
+                finish_search(error=True)
+                return render_template('error.html', error=str(e))
 
-            # Search by Chapter and Mishna
-            if action == 'search_mishna':
-                chapter = mishna_form.chapter.data
-                mishna = mishna_form.mishna.data
-                # If 'כל המשניות' (all) is selected, fetch all mishnas for the chapter
-                if mishna == 'all':
-                    results = Mishna.query.filter_by(chapter=chapter).order_by(Mishna.number).all()
-                else:
-                    mishna_id = f"{chapter}_{mishna}"
-                    results = Mishna.query.filter_by(id=mishna_id).all()
-
-            # Smart Search - Unified Free Text and AI Search
-            elif action == 'search_smart':
-                query_text = request.form.get('search_query', '').strip()
-                is_exact_match = request.form.get('exact_match') == 'on'
-                
-                current_app.logger.info(f'Smart search initiated. Query: {query_text}, Exact Match: {is_exact_match}')
-                
-                if is_exact_match:
-                    # LOGIC A: Exact Match - Use SQL/Supabase search
-                    query_text_normalized = remove_niqqud(query_text.lower())
-                    current_app.logger.info(f'Performing exact match search with normalized query length: {len(query_text_normalized)} characters')
-                    
-                    results = Mishna.query.filter(
-                        Mishna.text_raw.ilike(f"%{query_text_normalized}%")
-                    ).order_by(Mishna.number).all()
-                    current_app.logger.info(f'Found {len(results)} results for exact match search')
-                else:
-                    # LOGIC B: AI Search - Use AWS Semantic Search
-                    current_app.logger.info(f'Performing AWS semantic search with query length: {len(query_text)} characters')
-                    
-                    try:
-                        # Initialize client (lazy loading)
-                        client = get_aws_search_client()
-                        results = client.search(query_text)
-                        
-                        current_app.logger.info(f'AWS semantic search returned {len(results)} results')
-                        
-                    except AWSSearchError as e:
-                        current_app.logger.error(f'AWS search failed: {str(e)}')
-                        return render_template('error.html', 
-                                             error="חיפוש סמנטי נכשל. אנא נסה שוב מאוחר יותר.")
-                    except ValueError as e:
-                        current_app.logger.error(f'AWS search configuration error: {str(e)}')
-                        return render_template('error.html', 
-                                             error="חיפוש סמנטי אינו מוגדר כראוי. אנא פנה למנהל המערכת.")
-
-            # Free Text Search (DEPRECATED - kept for backward compatibility)
-            elif action == 'search_free_text':
-                query_text = remove_niqqud(mishna_form.text.data.lower())
-                current_app.logger.info(f'Performing free text search with query length: {len(query_text)} characters')
-
-                results = Mishna.query.filter(Mishna.text_raw.ilike(f"%{query_text}%")).order_by(Mishna.number).all()
-                current_app.logger.info(f'Found {len(results)} results for free text search')
-
-            # Tag-based Search
-            elif action == 'search_by_tags':
-                selected_tags = request.form.get('tags', '').split(',')
-                selected_tags = [int(tag_id) for tag_id in selected_tags if tag_id.isdigit()]
-                current_app.logger.info(f'Searching by tags: {selected_tags}')
-
-                results = Mishna.query.filter(Mishna.tags.any(Tag.id.in_(selected_tags))).order_by(Mishna.number).all()
-                current_app.logger.info(f'Found {len(results)} results for tag-based search')
-
-            # AWS Semantic Search (DEPRECATED - kept for backward compatibility)
-            elif action == 'search_aws_semantic':
-                query_text = request.form.get('aws_semantic_query', '').strip()
-                current_app.logger.info(f'Performing AWS semantic search with query length: {len(query_text)} characters')
-                
-                try:
-                    # Initialize client (lazy loading)
-                    client = get_aws_search_client()
-                    results = client.search(query_text)
-                    
-                    current_app.logger.info(f'AWS semantic search returned {len(results)} results')
-                    
-                except AWSSearchError as e:
-                    current_app.logger.error(f'AWS search failed: {str(e)}')
-                    return render_template('error.html', 
-                                         error="חיפוש סמנטי נכשל. אנא נסה שוב מאוחר יותר.")
-                except ValueError as e:
-                    current_app.logger.error(f'AWS search configuration error: {str(e)}')
-                    return render_template('error.html', 
-                                         error="חיפוש סמנטי אינו מוגדר כראוי. אנא פנה למנהל המערכת.")
-
-            # Navigate by Mishna Number
-            elif action == 'navigate_by_number':
-                mishna_number = request.form.get('mishna_number')
-                current_app.logger.info(f'Navigating to mishna number: {mishna_number}')
-                
-                if mishna_number and mishna_number.isdigit():
-                    number = int(mishna_number)
-                    # Validate number is in valid range
-                    if 1 <= number <= 108:
-                        result = Mishna.query.filter_by(number=number).first()
-                        results = [result] if result else []
-                        current_app.logger.info(f'Found mishna with number {number}: {bool(result)}')
-                    else:
-                        current_app.logger.warning(f'Invalid mishna number: {number}')
-                        results = []
-                else:
-                    current_app.logger.warning(f'Invalid mishna number format: {mishna_number}')
-                    results = []
-
-            # ============================================================================
-            # AI/Semantic Search - COMMENTED OUT (not in use)
-            # ============================================================================
-            # This search functionality has been disabled to reduce memory usage.
-            # The route handler remains here but will not be called since the UI
-            # button has been removed from index.html
-            # ============================================================================
-            
-            # # Semantic AI Search
-            # elif action == 'search_semantic':
-            #     query_text = request.form.get('semantic_query', '').strip()
-            #     current_app.logger.info(f'Performing semantic search with query length: {len(query_text)} characters')
-            #     
-            #     # Additional rate limiting for expensive semantic search
-            #     from utils.rate_limiter import rate_limiter
-            #     from utils.search_cache import search_cache
-            #     
-            #     key = request.remote_addr or 'unknown'
-            #     if not rate_limiter.is_allowed(key + '_semantic', 10, 60):
-            #         current_app.logger.warning(f'Semantic search rate limit exceeded for {key}')
-            #         return render_template('error.html', 
-            #                              error="חרגת ממגבלת החיפוש הסמנטי. מותרות 10 בקשות בדקה. אנא נסה שוב בעוד מספר שניות.")
-            #     
-            #     # Check cache first
-            #     cached_results = search_cache.get(query_text)
-            #     if cached_results is not None:
-            #         current_app.logger.info(f'Cache hit for query: {query_text[:50]}...')
-            #         results, compromise_info = cached_results
-            #     else:
-            #         current_app.logger.info(f'Cache miss - performing semantic search')
-            #         # Lazy-load the model only when needed
-            #         engine = get_semantic_search_engine()
-            #         results, compromise_info = engine.search_with_compromise(query_text)
-            #         # Cache the results
-            #         search_cache.set(query_text, (results, compromise_info))
-            #     
-            #     # Log compromise mode status
-            #     if compromise_info['is_active']:
-            #         current_app.logger.info(
-            #             f'Compromise mode was activated: '
-            #             f'Found results at {compromise_info["current_threshold"]}% '
-            #             f'(initial: {compromise_info["initial_threshold"]}%, '
-            #             f'attempts: {compromise_info["attempts"]})'
-            #         )
-
-        # Capture search query for display
-        search_query = None
-        aws_semantic_query = None
-        is_semantic_search = False
-        is_exact_match = False
-        
-        if request.method == 'POST':
-            if action == 'search_free_text':
-                search_query = mishna_form.text.data
-            elif action == 'search_aws_semantic':
-                aws_semantic_query = request.form.get('aws_semantic_query', '').strip()
-                search_query = aws_semantic_query
-                is_semantic_search = True
-            elif action == 'search_smart':
-                search_query = request.form.get('search_query', '').strip()
-                is_exact_match = request.form.get('exact_match') == 'on'
-                is_semantic_search = not is_exact_match  # It's semantic if not exact match
-            # elif action == 'search_semantic':  # COMMENTED OUT - AI search disabled
-            #     search_query = request.form.get('semantic_query', '').strip()
-            #     is_semantic_search = True
-
-        return render_template('index.html',
-                               form=mishna_form,
-                               results=results,
-                               searchType=search_type,
-                               search_query=search_query,
-                               aws_semantic_query=aws_semantic_query,
-                               is_semantic_search=is_semantic_search,
-                               is_exact_match=is_exact_match,
-                               ALLOWED_CHAPTERS=ALLOWED_CHAPTERS,
-                               all_tags=tags_with_categories,
-                               categories=categories_serialized,
-                               selected_tags=selected_tags,
-                               selected_chapter=mishna_form.chapter.data,
-                               selected_mishna=mishna_form.mishna.data)
+            # A whole chapter is a deterministic page; the /results fragment of it is cached as HTML instead
+            if action == 'search_mishna' and mishna_form.mishna.data == 'all':
+                cache_compressed(f'chapter:{mishna_form.chapter.data}')
+
+            # Capture search query for display
+            display_context = _search_display_context(action, mishna_form)
+
+        with stage('render'):
+            response = render_search_page(mishna_form,
+                                          results,
+                                          searchType=search_type,
+                                          selected_tags=selected_tags,
+                                          selected_chapter=mishna_form.chapter.data,
+                                          selected_mishna=mishna_form.mishna.data,
+                                          **display_context,
+                                          **result_context)
+        finish_search(results, degraded=result_context.get('partial_results', False))
+        return response
 
     except Exception as e:
+        finish_search(error=True)
         current_app.logger.error(f'Error in search_mishna: {str(e)}', exc_info=True)
         # You might want to show an error page to the user here
         return render_template('error.html', error="An error occurred during search")
 
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~ Results Fragment ~~~~~~~~~~~~~~~~~~~~~~~
+# Renders only the results block so the page can swap it in client-side
+# instead of reloading the whole search page. Rendered fragments are
+# cached per (action, normalized parameters, corpus version), together with
+# the result numbers for the query log.
+
+_fragment_cache = LRUCache(max_entries=256)
+
+
+def _normalized_search_params(action, mishna_form):
+    """
+    Reduce the submitted form to the parameters that determine the results.
+
+    Returns:
+        Hashable tuple, or None if the action is unknown
+    """
+    if action == 'search_mishna':
+        return (mishna_form.chapter.data, mishna_form.mishna.data)
+    if action == 'search_smart':
+        query_text = request.form.get('search_query', '').strip()
+        if request.form.get('exact_match') == 'on':
+            return ('exact', normalize_hebrew(query_text))
+        return ('semantic', ' '.join(query_text.split()))
+    if action == 'search_free_text':
+        return (normalize_hebrew(mishna_form.text.data or ''),)
+    if action == 'search_by_tags':
+        tag_ids = request.form.get('tags', '').split(',')
+        return tuple(sorted({int(tag_id) for tag_id in tag_ids if tag_id.isdigit()}))
+    if action == 'search_aws_semantic':
+        return (' '.join(request.form.get('aws_semantic_query', '').split()),)
+    if action == 'navigate_by_number':
+        return (request.form.get('mishna_number', ''),)
+    return None
+
+
+# Form fields that determine a search, logged so it can be replayed
+_SEARCH_FIELDS = ('chapter', 'mishna', 'search_query', 'exact_match', 'text', 'tags', 'aws_semantic_query',
+                  'mishna_number')
+
+
+def _begin_query_log(endpoint, action, mishna_form):
+    """
+    Start the query log record of a search (see utils/query_log.py).
+
+    Returns:
+        The normalized search parameters, see _normalized_search_params
+    """
+    params = _normalized_search_params(action, mishna_form)
+    if params is None:
+        query = ''
+    elif action == 'search_smart':
+        query = normalize_hebrew(params[1]).strip()
+    else:
+        query = ' '.join(str(value) for value in params)
+    begin_search(endpoint, action, query,
+                 {field: request.form[field] for field in _SEARCH_FIELDS if request.form.get(field)})
+    return params
+
+
+@main.route('/results', methods=['POST'])
+@rate_limit(max_requests=20, window_seconds=60)  # Shares the search page's budget
+def search_results_fragment():
+    """Render only the results block for a search action."""
+    try:
+        mishna_form = MishnaForm(request.form, meta={'csrf': False})
+        action = request.form.get('action')
+        _fragment_cache.max_entries = current_app.config.get('FRAGMENT_CACHE_SIZE', 256)
+
+        params = _begin_query_log('results', action, mishna_form)
+        cache_key = (action, params, get_corpus_version()) if params is not None else None
+
+        cached = _fragment_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            current_app.logger.info(f'Results fragment cache hit for action: {action}')
+            html, numbers = cached
+            mark_cache_hit('fragment')
+            finish_search(numbers)
+        else:
+            try:
+                with stage('search'):
+                    results, _, result_context = _perform_search(action, mishna_form)
+                with stage('render'):
+                    html = render_template('_results.html', results=results, **result_context)
+                # Partial hybrid results are not cached so the full ranking shows up on retry
+                if cache_key and not result_context.get('partial_results'):
+                    _fragment_cache.set(cache_key, (html, [result.number for result in results]))
+                finish_search(results, degraded=result_context.get('partial_results', False))
+            except SearchError as e:
+                finish_search(error=True)
+                html = render_template('_results.html', results=[], error_message=str(e))
+
+        response = make_response(html)
+        response.headers['X-Fragment'] = 'results'
+        return response
+
+    except Exception as e:
+        finish_search(error=True)
+        current_app.logger.error(f'Error in search_results_fragment: {str(e)}', exc_info=True)
+        response = make_response(render_template('_results.html', results=[],
+                                                 error_message="An error occurred during search"), 500)
+        response.headers['X-Fragment'] = 'results'
+        return response
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~ Permalinks ~~~~~~~~~~~~~~~~~~~~~~~~~
+# Cacheable GET pages for the lookups that the search form does via POST.
+# Responses carry a strong ETag derived from the corpus version and are
+# answered with 304 straight from the cached version when possible.
+
+def _render_permalink(results, **context):
+    """Render a permalink page, or a 404 page when nothing was found."""
+    if not results:
+        return render_template('error.html', error="המשנה המבוקשת לא נמצאה"), 404
+
+    cache_compressed(request.path)
+    mishna_form = MishnaForm(meta={'csrf': False})
+    return render_search_page(mishna_form, results, **context)
+
+
+def _permalink(render):
+    """Serve a permalink with conditional-request handling and error logging."""
+    try:
+        return corpus_conditional(request.path, render)
+    except Exception as e:
+        current_app.logger.error(f'Error rendering permalink {request.path}: {str(e)}', exc_info=True)
+        return render_template('error.html', error="An error occurred during search")
+
+
+@main.route('/mishna/<int:number>')
+@rate_limit(max_requests=60, window_seconds=60, scope='permalink')
+def mishna_by_number(number):
+    """Permalink for a mishna by its sequential number (1-108)."""
+    def render():
+        results = _query_by_number(number)
+        if not results:
+            return _render_permalink(results)
+        return _render_permalink(results,
+                                 selected_chapter=results[0].chapter,
+                                 selected_mishna=results[0].mishna)
+    return _permalink(render)
+
+
+@main.route('/chapter/<chapter>')
+@rate_limit(max_requests=60, window_seconds=60, scope='permalink')
+def chapter_listing(chapter):
+    """Permalink for all mishnayot of a chapter."""
+    def render():
+        results = _query_chapter(chapter) if chapter in ALLOWED_CHAPTERS else []
+        return _render_permalink(results, selected_chapter=chapter, selected_mishna='all')
+    return _permalink(render)
+
+
+@main.route('/chapter/<chapter>/<mishna>')
+@rate_limit(max_requests=60, window_seconds=60, scope='permalink')
+def mishna_by_chapter(chapter, mishna):
+    """Permalink for a mishna by chapter and mishna letters."""
+    def render():
+        valid = mishna in ALLOWED_CHAPTERS.get(chapter, [])
+        results = _query_mishna(chapter, mishna) if valid else []
+        return _render_permalink(results, selected_chapter=chapter, selected_mishna=mishna)
+    return _permalink(render)
+
+
+@main.route('/tag/<int:tag_id>')
+@rate_limit(max_requests=60, window_seconds=60, scope='permalink')
+def tag_listing(tag_id):
+    """Permalink for all mishnayot with a tag."""
+    def render():
+        results = _query_by_tags([tag_id])
+        return _render_permalink(results, searchType='search_by_tags', selected_tags=[tag_id])
+    return _permalink(render)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~ Corpus Bundle ~~~~~~~~~~~~~~~~~~~~~~~~
+# The whole corpus as one pre-gzipped, content-hashed JSON file for the
+# client-side search module (static/js/offline_search.js).
+
+@main.route('/bundle/manifest.json')
+@rate_limit(max_requests=60, window_seconds=60, scope='bundle')
+def corpus_bundle_manifest():
+    """Point clients at the current content-hashed corpus bundle."""
+    def render():
+        bundle = get_corpus_bundle()
+        return jsonify(version=bundle.version,
+                       url=url_for('main.corpus_bundle', content_hash=bundle.content_hash),
+                       size=bundle.size)
+    try:
+        return corpus_conditional(request.path, render)
+    except Exception as e:
+        current_app.logger.error(f'Error serving corpus bundle manifest: {str(e)}', exc_info=True)
+        return jsonify(error='Corpus bundle unavailable'), 500
+
+
+@main.route('/bundle/corpus.<content_hash>.json')
+@rate_limit(max_requests=60, window_seconds=60, scope='bundle')
+def corpus_bundle(content_hash):
+    """Serve the pre-gzipped corpus bundle; the URL changes whenever the content does."""
+    # Content at a hashed URL never changes, so a matching ETag needs no lookup at all
+    if request.if_none_match.contains(content_hash):
+        response = make_response('', 304)
+        response.set_etag(content_hash)
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
+
+    try:
+        bundle = get_corpus_bundle()
+    except Exception as e:
+        current_app.logger.error(f'Error building corpus bundle: {str(e)}', exc_info=True)
+        return jsonify(error='Corpus bundle unavailable'), 500
+
+    if content_hash != bundle.content_hash:
+        return jsonify(error='Unknown bundle version', current=bundle.filename), 404
+
+    if request.accept_encodings['gzip']:
+        response = make_response(bundle.gzipped)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = make_response(gzip.decompress(bundle.gzipped))
+
+    response.mimetype = 'application/json'
+    response.vary.add('Accept-Encoding')
+    response.set_etag(bundle.content_hash)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+# ~~~~~~~~~~~~~~~~~~~ Tag Facets & Autocomplete ~~~~~~~~~~~~~~~~~~~~
+# JSON lookups answered from the in-memory corpus indexes, for the tag
+# picker and the type-ahead of the search box.
+
+@main.route('/tags/facets.json')
+@rate_limit(max_requests=60, window_seconds=60, scope='facets')
+def tag_facet_counts():
+    """Mishnayot per tag and the sparse tag co-occurrence matrix, keyed by tag id."""
+    def render():
+        return jsonify(counts=tag_facets.counts(), cooccurrence=tag_facets.cooccurrence())
+    try:
+        return corpus_conditional(request.path, render)
+    except Exception as e:
+        current_app.logger.error(f'Error serving tag facets: {str(e)}', exc_info=True)
+        return jsonify(error='Tag facets unavailable'), 500
+
+
+@main.route('/autocomplete')
+@rate_limit(max_requests=600, window_seconds=60, scope='autocomplete')
+def autocomplete():
+    """
+    Type-ahead completions of ?q=, optionally restricted to ?kind=word|phrase|tag.
+
+    Served from the in-memory autocomplete index, with a small public
+    Cache-Control lifetime so repeated keystrokes are answered by the browser.
+    """
+    query_text = request.args.get('q', '')
+    kinds = tuple(kind for kind in request.args.get('kind', '').split(',') if kind in KINDS) or KINDS
+    limit = min(request.args.get('limit', DEFAULT_LIMIT, type=int) or DEFAULT_LIMIT, MAX_LIMIT)
+    try:
+        completions = autocomplete_index.complete(query_text, kinds, limit)
+    except Exception as e:
+        current_app.logger.error(f'Error completing {query_text!r}: {str(e)}', exc_info=True)
+        return jsonify(error='Autocomplete unavailable'), 500
+
+    response = jsonify(q=query_text, completions=[
+        {'text': completion.text, 'kind': completion.kind, **({'tag_id': completion.tag_id} if completion.tag_id else {})}
+        for completion in completions
+    ])
+    response.headers['Cache-Control'] = f"public, max-age={current_app.config.get('AUTOCOMPLETE_MAX_AGE', 60)}"
+    return response
+
+
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ Front ~~~~~~~~~~~~~~~~~~~~~~~~~~~
 @main.route('/manage', methods=['GET', 'POST'])
 @login_is_required
@@ -325,10 +864,6 @@ def manage_content():
         mishna_message = None
         button_label = 'הוסף משנה'
         
-        # Get all categories and tags
-        categories = Category.query.all()
-        uncategorized_tags = Tag.query.filter_by(category_id=None).all()
-        all_tags = Tag.query.all()
         selected_tags = []
 
         if request.method == 'POST':
@@ -373,12 +908,19 @@ def manage_content():
 
                     mishna_id = f"{chapter}_{mishna}"
                     existing_mishna = Mishna.query.filter_by(id=mishna_id).first()
+                    previous_version = fresh_corpus_version()
 
                     if existing_mishna:
                         current_app.logger.info(f'Updating existing Mishna: {mishna_id}')
+                        previous_tag_ids = {tag.id for tag in existing_mishna.tags}
+                        related_changed = (previous_tag_ids != {tag.id for tag in new_tags}
+                                           or existing_mishna.text_pretty != text_pretty)
                         existing_mishna.text_pretty = text_pretty
                         existing_mishna.text_raw = text_raw
+                        existing_mishna.text_normalized = normalize_hebrew(text_raw)
+                        existing_mishna.text_offsets = niqqud_offsets(text_pretty)
                         existing_mishna.tags = new_tags
+                        saved_mishna = existing_mishna
                         mishna_message = "המִשׁנָה עודכנה בהצלחה!"
                     else:
                         current_app.logger.info(f'Creating new Mishna: {mishna_id}')
@@ -389,9 +931,16 @@ def manage_content():
                                             tags=new_tags,
                                             interpretation="")
                         db.session.add(new_mishna)
+                        saved_mishna = new_mishna
+                        previous_tag_ids, related_changed = set(), True
                         mishna_message = "המִשׁנָה הוספה בהצלחה!"
 
                     db.session.commit()
+                    if related_changed:
+                        refresh_related([saved_mishna.id], previous_tag_ids | {tag.id for tag in new_tags})
+                    bump_corpus_version()
+                    refresh_search_indexes([saved_mishna], previous_version)
+                    enqueue_embedding(mishna_ids=[saved_mishna.id])
                     current_app.logger.info('Database transaction completed successfully')
 
                 except SQLAlchemyError as e:
@@ -415,6 +964,7 @@ def manage_content():
                             new_category = Category(name=new_category_name, color=category_color)
                             db.session.add(new_category)
                             db.session.commit()
+                            bump_corpus_version()
                             tag_message = "הקטגוריה הוספה בהצלחה!"
                             current_app.logger.info(f'Successfully added new category: {new_category_name} with color: {category_color}')
                         except SQLAlchemyError as e:
@@ -441,6 +991,8 @@ def manage_content():
                             )
                             db.session.add(new_tag)
                             db.session.commit()
+                            bump_corpus_version()
+                            enqueue_embedding(tag_ids=[new_tag.id])
                             tag_message = "התגית הוספה בהצלחה!"
                             current_app.logger.info(f'Successfully added new tag: {new_tag_name}')
                         except SQLAlchemyError as e:
@@ -473,12 +1025,15 @@ def manage_content():
                                     # Convert '0' to None for uncategorized tags
                                     tag.category_id = None if new_category_id == '0' else int(new_category_id)
                                     db.session.commit()
+                                    bump_corpus_version()
+                                    enqueue_embedding(tag_ids=[tag.id])
                                     tag_message = "הנושא עודכן בהצלחה!"
                                     current_app.logger.info(f'Successfully updated tag ID: {tag_id}')
                             else:
                                 # Only update category
                                 tag.category_id = None if new_category_id == '0' else int(new_category_id)
                                 db.session.commit()
+                                bump_corpus_version()
                                 tag_message = "קטגורית הנושא עודכנה בהצלחה!"
                                 current_app.logger.info(f'Successfully updated tag category ID: {tag_id}')
                         else:
@@ -498,10 +1053,11 @@ def manage_content():
 
                 if tag_id_to_delete:
                     try:
-                        existing_tag = Tag.query.filter_by(id=tag_id_to_delete).first()
-                        if existing_tag:
-                            db.session.delete(existing_tag)
-                            db.session.commit()
+                        tag_ids = [int(tag_id_to_delete)]
+                        affected_ids = tagged_mishna_ids(tag_ids)
+                        previous_version = fresh_corpus_version()
+                        if delete_tags(tag_ids).tags:
+                            _refresh_after_tag_change(affected_ids, tag_ids, previous_version)
                             tag_message = "התגית נמחקה."
                             current_app.logger.info(f'Successfully deleted tag ID: {tag_id_to_delete}')
                         else:
@@ -515,6 +1071,88 @@ def manage_content():
                     current_app.logger.warning('No tag ID provided for deletion')
                     tag_message = "בחר תגית למחיקה."
 
+            elif action in ("merge_tags", "bulk_delete_tags", "recategorize_tags"):
+                try:
+                    tag_ids = _parse_ids(request.form.getlist('bulk_tag_ids'))
+                    merge_target_id = request.form.get('merge_target_id', '').strip()
+                    target_tag_id = int(merge_target_id) if merge_target_id else None
+                except ValueError as e:
+                    current_app.logger.warning(f'Invalid {action} request: {str(e)}')
+                    tag_ids, target_tag_id = None, None
+                current_app.logger.info(f'Attempting {action} on tag IDs: {tag_ids}')
+
+                if tag_ids is None:
+                    tag_message = "מזהי הנושאים אינם תקינים."
+                elif not tag_ids:
+                    current_app.logger.warning(f'No tag IDs provided for {action}')
+                    tag_message = "בחר נושאים."
+                elif action == "merge_tags" and target_tag_id is None:
+                    current_app.logger.warning('No target tag provided for merge_tags')
+                    tag_message = "בחר נושא למיזוג אליו."
+                else:
+                    try:
+                        previous_version = fresh_corpus_version()
+                        if action == "merge_tags":
+                            source_tag_ids = [tag_id for tag_id in tag_ids if tag_id != target_tag_id]
+                            affected_ids = tagged_mishna_ids(source_tag_ids)
+                            counts = merge_tags(source_tag_ids, target_tag_id)
+                            tag_message = f"{counts.tags} נושאים מוזגו, {counts.links} שיוכים הועברו."
+                            changed = counts.tags
+                            touched_tag_ids = source_tag_ids + [target_tag_id]
+                        elif action == "bulk_delete_tags":
+                            affected_ids = tagged_mishna_ids(tag_ids)
+                            counts = delete_tags(tag_ids)
+                            tag_message = f"{counts.tags} נושאים נמחקו."
+                            changed = counts.tags
+                            touched_tag_ids = tag_ids
+                        else:
+                            new_category_id = request.form.get('bulk_category_id')
+                            changed = recategorize_tags(tag_ids, None if new_category_id == '0' else int(new_category_id))
+                            tag_message = f"{changed} נושאים הועברו לקטגוריה."
+                            # Categories are not part of the indexed documents
+                            affected_ids, touched_tag_ids = [], []
+                        if changed:
+                            _refresh_after_tag_change(affected_ids, touched_tag_ids, previous_version)
+                    except (TypeError, ValueError) as e:
+                        current_app.logger.warning(f'Invalid {action} request: {str(e)}')
+                        tag_message = "לא הצלחנו למצוא את הנושא או הקטגוריה במאגר."
+                    except SQLAlchemyError as e:
+                        current_app.logger.error(f'Database error during {action}: {str(e)}', exc_info=True)
+                        tag_message = "אירעה שגיאה בעדכון הנושאים"
+
+            elif action == "bulk_tag":
+                mishna_ids = request.form.getlist('bulk_mishna_ids')
+                current_app.logger.info(f'Attempting bulk tagging of {len(mishna_ids)} mishnayot')
+
+                try:
+                    add_tag_ids = _parse_ids(request.form.getlist('bulk_add_tags'))
+                    remove_tag_ids = _parse_ids(request.form.getlist('bulk_remove_tags'))
+                except ValueError as e:
+                    current_app.logger.warning(f'Invalid bulk tagging request: {str(e)}')
+                    add_tag_ids, remove_tag_ids = None, None
+
+                if add_tag_ids is None:
+                    tag_message = "מזהי הנושאים אינם תקינים."
+                elif not (mishna_ids and (add_tag_ids or remove_tag_ids)):
+                    current_app.logger.warning('Bulk tagging without mishnayot or tags')
+                    tag_message = "בחר משניות ונושאים להוספה או להסרה."
+                else:
+                    try:
+                        counts = _apply_bulk_tagging(mishna_ids, add_tag_ids, remove_tag_ids)
+                        tag_message = f"התיוג עודכן: {counts.added} שיוכים נוספו, {counts.removed} הוסרו."
+                    except ValueError as e:
+                        current_app.logger.warning(f'Invalid bulk tagging request: {str(e)}')
+                        tag_message = "אותו נושא לא יכול להיות גם להוספה וגם להסרה."
+                    except SQLAlchemyError as e:
+                        current_app.logger.error(f'Database error during bulk tagging: {str(e)}', exc_info=True)
+                        tag_message = "אירעה שגיאה בעדכון התיוג"
+
+        # Get all categories and tags, after the action so they reflect its changes
+        categories = Category.query.all()
+        uncategorized_tags = Tag.query.filter_by(category_id=None).all()
+        all_tags = Tag.query.all()
+        all_mishnas = db.session.query(Mishna.id, Mishna.chapter, Mishna.mishna).order_by(Mishna.number).all()
+
         return render_template('manage_content.html',
                                mishna_form=mishna_form,
                                tag_form=tag_form,
@@ -523,6 +1161,7 @@ def manage_content():
                                button_label=button_label,
                                ALLOWED_CHAPTERS=ALLOWED_CHAPTERS,
                                all_tags=all_tags,
+                               all_mishnas=all_mishnas,
                                categories=categories,
                                uncategorized_tags=uncategorized_tags,
                                selected_tags=selected_tags,
@@ -532,3 +1171,86 @@ def manage_content():
     except Exception as e:
         current_app.logger.error(f'Unexpected error in manage_content: {str(e)}', exc_info=True)
         return render_template('error.html', error="An error occurred while managing content")
+
+
+def _parse_ids(values):
+    """Integer ids from form or JSON values, skipping empty ones."""
+    return [int(value) for value in values if str(value).strip()]
+
+
+def _refresh_after_tag_change(mishna_ids, tag_ids, previous_version):
+    """
+    Bring derived data up to date after a committed mishna_tag change.
+
+    Recomputes the related lists the change can affect, invalidates cached
+    results once, and applies the changed mishnayot to this worker's search
+    indexes (tag facets, tag filters, tag completions) in place.
+    """
+    refresh_related(mishna_ids, tag_ids)
+    bump_corpus_version()
+    mishnayot = Mishna.query.options(selectinload(Mishna.tags)).filter(Mishna.id.in_(list(mishna_ids))).all() \
+        if mishna_ids else []
+    refresh_search_indexes(mishnayot, previous_version)
+
+
+def _apply_bulk_tagging(mishna_ids, add_tag_ids, remove_tag_ids):
+    """Apply a bulk tagging change and refresh what depends on it if anything changed."""
+    previous_version = fresh_corpus_version()
+    counts = apply_tag_changes(mishna_ids, add_tag_ids, remove_tag_ids)
+    if counts.added or counts.removed:
+        _refresh_after_tag_change(mishna_ids, add_tag_ids + remove_tag_ids, previous_version)
+    return counts
+
+
+@main.route('/manage/tags/bulk', methods=['POST'])
+@login_is_required
+def bulk_tag_mishnas():
+    """
+    Add and remove tags on many mishnayot in one transaction.
+
+    Expects a JSON body with mishna_ids, add_tag_ids and remove_tag_ids, and
+    the CSRF token in the X-CSRFToken header. Returns the number of links
+    added and removed.
+    """
+    if current_app.config.get('WTF_CSRF_ENABLED', True):
+        try:
+            validate_csrf(request.headers.get('X-CSRFToken'))
+        except ValidationError:
+            return jsonify(error='Invalid CSRF token'), 400
+
+    payload = request.get_json(silent=True) or {}
+    try:
+        mishna_ids = [str(mishna_id) for mishna_id in payload.get('mishna_ids', [])]
+        add_tag_ids = _parse_ids(payload.get('add_tag_ids', []))
+        remove_tag_ids = _parse_ids(payload.get('remove_tag_ids', []))
+        counts = _apply_bulk_tagging(mishna_ids, add_tag_ids, remove_tag_ids)
+    except (TypeError, ValueError) as e:
+        return jsonify(error=str(e)), 400
+    except SQLAlchemyError as e:
+        current_app.logger.error(f'Database error during bulk tagging: {str(e)}', exc_info=True)
+        return jsonify(error='Database error'), 500
+
+    return jsonify(added=counts.added, removed=counts.removed)
+
+
+@main.route('/manage/export.<export_format>')
+@login_is_required
+def export_corpus(export_format):
+    """
+    Stream the corpus with tags and categories as ndjson, csv or columnar.
+
+    The ETag follows the corpus version, so a client holding the current
+    export gets a 304 without the export being generated.
+    """
+    if export_format not in EXPORT_FORMATS:
+        return jsonify(error=f'Unknown export format: {export_format}'), 404
+    mimetype, extension = EXPORT_FORMATS[export_format]
+
+    def render():
+        current_app.logger.info(f'Streaming corpus export as {export_format}')
+        response = Response(stream_with_context(stream_export(export_format)),
+                            content_type=f'{mimetype}; charset=utf-8')
+        response.headers['Content-Disposition'] = f'attachment; filename=pirkei-avot.{extension}'
+        return response
+
+    return corpus_conditional(request.path, render, cache_control='private, no-cache')
@@ -0,0 +1,166 @@
+/**
+ * Client-side corpus search.
+ *
+ * Downloads the versioned corpus bundle once (/bundle/manifest.json points at
+ * the current content-hashed /bundle/corpus.<hash>.json, which browsers cache
+ * forever) and runs number, chapter, tag and exact-text searches locally.
+ *
+ * Usage:
+ *     const corpus = await OfflineSearch.load();
+ *     OfflineSearch.byNumber(42);
+ *     OfflineSearch.byChapter('ג', 'ה');
+ *     OfflineSearch.byTags([3, 7]);
+ *     OfflineSearch.exactText('אֵיזֶהוּ חָכָם');
+ *
+ * Results are objects with number, chapter, mishna, text_pretty, text_raw and
+ * tags ({id, name, category, color}), ordered by mishna number.
+ */
+const OfflineSearch = (() => {
+    const WORD_SEPARATORS = /[\u05BE\u05C0\u05C3]/g;
+    const QUOTE_MARKS = /['"`\u05F3\u05F4\u2018\u2019\u201C\u201D]/g;
+    const FINAL_LETTERS = { 'ך': 'כ', 'ם': 'מ', 'ן': 'נ', 'ף': 'פ', 'ץ': 'צ' };
+    const NIQQUD = /[\u0591-\u05C7]/g;
+    const DEFAULT_COLOR = '#F5F5F5';
+
+    let corpus = null;
+    let loading = null;
+
+    /**
+     * Removes niqqud and cantillation marks (same range as utils/text_utils.remove_niqqud)
+     * @param {string} text - Text to normalize
+     * @returns {string} Text without niqqud
+     */
+    function removeNiqqud(text) {
+        return text.replace(NIQQUD, '');
+    }
+
+    /**
+     * Canonical search form of a text, same pipeline as utils/text_utils.normalize_hebrew:
+     * maqaf/paseq/sof pasuq and punctuation separate words, niqqud and quote marks are
+     * dropped, final letters are folded and vav/yod are ignored inside words.
+     * @param {string} text - Text to normalize
+     * @returns {string} Normalized text
+     */
+    function normalizeHebrew(text) {
+        return text
+            .replace(WORD_SEPARATORS, ' ')
+            .replace(NIQQUD, '')
+            .replace(QUOTE_MARKS, '')
+            .replace(/[\p{P}\p{S}]/gu, ' ')
+            .replace(/[ךםןףץ]/g, char => FINAL_LETTERS[char])
+            .toLowerCase()
+            .split(/\s+/)
+            .filter(Boolean)
+            .map(word => word[0] + word.slice(1).replace(/[וי]/g, ''))
+            .join(' ');
+    }
+
+    /**
+     * Expands the compact bundle into mishna objects with resolved tags
+     * @param {Object} bundle - Parsed bundle JSON
+     * @returns {Object} Indexed corpus
+     */
+    function expand(bundle) {
+        const categories = new Map(bundle.categories.map(([id, name, color]) => [id, { name, color }]));
+        const tags = new Map(bundle.tags.map(([id, name, categoryId]) => {
+            const category = categories.get(categoryId);
+            return [id, {
+                id,
+                name,
+                category: category ? category.name : 'כללי',
+                color: category ? category.color : DEFAULT_COLOR
+            }];
+        }));
+
+        const field = Object.fromEntries(bundle.fields.map((name, index) => [name, index]));
+        const mishnayot = bundle.mishnayot.map(row => ({
+            number: row[field.number],
+            chapter: row[field.chapter],
+            mishna: row[field.mishna],
+            text_pretty: row[field.text_pretty],
+            text_raw: row[field.text_raw],
+            searchText: normalizeHebrew(row[field.text_raw]),
+            tags: row[field.tag_ids].map(id => tags.get(id)).filter(Boolean)
+        }));
+
+        return {
+            version: bundle.version,
+            mishnayot,
+            byNumber: new Map(mishnayot.map(m => [m.number, m]))
+        };
+    }
+
+    /**
+     * Loads the current bundle (only once per page)
+     * @returns {Promise<Object>} The indexed corpus
+     */
+    function load() {
+        if (corpus) {
+            return Promise.resolve(corpus);
+        }
+        if (!loading) {
+            loading = fetch('/bundle/manifest.json')
+                .then(response => response.json())
+                .then(manifest => fetch(manifest.url))
+                .then(response => response.json())
+                .then(bundle => {
+                    corpus = expand(bundle);
+                    return corpus;
+                })
+                .catch(err => {
+                    loading = null;
+                    throw err;
+                });
+        }
+        return loading;
+    }
+
+    function requireCorpus() {
+        if (!corpus) {
+            throw new Error('OfflineSearch.load() must complete before searching');
+        }
+        return corpus;
+    }
+
+    return {
+        load,
+        removeNiqqud,
+        normalizeHebrew,
+
+        get version() {
+            return corpus ? corpus.version : null;
+        },
+
+        /** @param {number} number - Sequential mishna number (1-108) */
+        byNumber(number) {
+            const mishna = requireCorpus().byNumber.get(Number(number));
+            return mishna ? [mishna] : [];
+        },
+
+        /**
+         * @param {string} chapter - Chapter letter
+         * @param {string} [mishna] - Mishna letter, or omitted / 'all' for the whole chapter
+         */
+        byChapter(chapter, mishna) {
+            return requireCorpus().mishnayot.filter(m =>
+                m.chapter === chapter && (!mishna || mishna === 'all' || m.mishna === mishna));
+        },
+
+        /** @param {number[]} tagIds - Mishnayot having any of these tags are returned */
+        byTags(tagIds) {
+            const wanted = new Set(tagIds.map(Number));
+            return requireCorpus().mishnayot.filter(m => m.tags.some(tag => wanted.has(tag.id)));
+        },
+
+        /** @param {string} query - Text to find, compared in normalized form */
+        exactText(query) {
+            const needle = normalizeHebrew(query);
+            if (!needle) {
+                return [];
+            }
+            return requireCorpus().mishnayot.filter(m => m.searchText.includes(needle));
+        }
+    };
+})();
+
+window.OfflineSearch = OfflineSearch;
@@ -0,0 +1,69 @@
+"""
+Shared base for tests that run the routes against a database
+
+Each test gets a fresh application with the main blueprint and an empty
+in-memory SQLite database. The corpus version (a Postgres-only query) is
+patched to a value unique to the test, so the process-wide indexes and
+caches keyed on it are rebuilt from this test's rows.
+"""
+
+import os
+import unittest
+from unittest.mock import patch
+
+from flask import Flask, g
+
+from models import db, Mishna
+from routes import main
+from utils.corpus_version import bump_corpus_version
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class AppTestCase(unittest.TestCase):
+    """Base for tests needing the application, its routes and a database."""
+
+    def flask_options(self):
+        """Extra Flask() arguments, e.g. a static or template folder."""
+        return {}
+
+    def setUp(self):
+        """Set up the application, an empty database and the corpus version."""
+        self.app = Flask(__name__, root_path=ROOT, **self.flask_options())
+        self.app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', SECRET_KEY='test', TESTING=True,
+                               WTF_CSRF_ENABLED=False, RATE_LIMIT_ENABLED=False)
+        db.init_app(self.app)
+        self.app.register_blueprint(main)
+        self.app.teardown_request(self._clear_request_globals)
+        context = self.app.app_context()
+        context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        bump_corpus_version()
+        self.corpus_changes = 0
+        self.compute = patch('utils.corpus_version.CorpusVersion._compute', return_value=f'{self.id()}-0').start()
+        self.addCleanup(bump_corpus_version)
+        self.addCleanup(patch.stopall)
+        self.addCleanup(context.pop)
+        self.addCleanup(db.drop_all)
+        self.addCleanup(db.session.remove)
+
+    @staticmethod
+    def _clear_request_globals(exception):
+        """Requests reuse the test's app context and its g, unlike live requests, so empty g after each."""
+        for name in list(g):
+            g.pop(name)
+
+    def change_corpus_version(self):
+        """Move to a new corpus version, as committing a write through the site does."""
+        self.corpus_changes += 1
+        self.compute.return_value = f'{self.id()}-{self.corpus_changes}'
+        bump_corpus_version()
+
+    def add_mishna(self, chapter, mishna, number, text, tags=()):
+        """Add a mishna with its text as both pretty and raw text."""
+        row = Mishna(chapter=chapter, mishna=mishna, number=number, text_pretty=text, text_raw=text, tags=list(tags))
+        db.session.add(row)
+        return row
@@ -0,0 +1,106 @@
+"""
+Unit tests for the autocomplete index
+
+Covers prefix completion of words, common word pairs and tags, popularity
+boosts from recorded queries and from the query log, and incremental
+document updates, on an index filled without a database.
+"""
+
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+from utils.autocomplete import AutocompleteIndex, Completion
+from utils.corpus_index import MishnaDocument
+
+DOCUMENTS = [
+    MishnaDocument('א_ב', 2, 'א', 'על שלשה דברים העולם עומד, על התורה ועל העבודה', ('תורה', 'עבודה'), (1, 2)),
+    MishnaDocument('א_יח', 18, 'א', 'על שלשה דברים העולם קיים, על הדין ועל האמת', ('דין',), (3,)),
+    MishnaDocument('ד_א', 53, 'ד', 'איזהו חכם, הלומד מכל אדם', ('חכמה',), (4,)),
+]
+
+
+class TestAutocompleteIndex(unittest.TestCase):
+    """Test suite for AutocompleteIndex.complete."""
+
+    def setUp(self):
+        patcher = patch('utils.corpus_index.get_corpus_version', return_value='v1')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.index = AutocompleteIndex()
+        for document in DOCUMENTS:
+            self.index._add(document)
+        self.index._finish()
+        self.index._version, self.index._built = 'v1', True
+        self.index._popularity_seeded = True
+
+    def test_prefix_ranked_by_weight(self):
+        """Frequent words and pairs come first; niqqud in the prefix is ignored."""
+        completions = self.index.complete('שְׁל')
+        self.assertEqual(completions[0].text, 'שלשה')
+        self.assertIn(Completion('שלשה דברים', 'phrase'), completions)
+        self.assertEqual(self.index.complete('זזז'), [])
+
+    def test_rare_pairs_are_not_offered(self):
+        """A pair seen once is not a completion, its words are."""
+        self.assertEqual(self.index.complete('הלומד', ('phrase',)), [])
+        self.assertEqual(self.index.complete('הלומ', ('word',)), [Completion('הלומד', 'word')])
+
+    def test_tags_carry_their_id(self):
+        """Tag completions can be restricted to tags and point at the tag."""
+        self.assertEqual(self.index.complete('חכ', ('tag',)), [Completion('חכמה', 'tag', 4)])
+
+    def test_last_word_completed_after_typed_words(self):
+        """With several words typed, the last one is completed after the others."""
+        completions = self.index.complete('איזהו חכ', ('word',))
+        self.assertEqual(completions, [Completion('איזהו חכם', 'word')])
+
+    def test_popular_queries_rise(self):
+        """Recorded searches outweigh corpus frequency."""
+        self.assertEqual(self.index.complete('הע', ('word',))[0].text, 'העולם')
+        for _ in range(3):
+            self.index.record_query('העבודה')
+        self.assertEqual(self.index.complete('הע', ('word',))[0].text, 'העבודה')
+
+    def test_popularity_seeded_from_query_log(self):
+        """Recent successful smart searches in the query log count like recorded ones."""
+        now = time.time()
+        records = [
+            {'ts': now, 'endpoint': 'results', 'action': 'search_smart', 'params': {'search_query': 'העבודה'},
+             'results': [2]},
+            {'ts': now, 'endpoint': 'results', 'action': 'search_smart', 'params': {'search_query': 'העבודה'},
+             'results': [2]},
+            {'ts': now, 'endpoint': 'results', 'action': 'search_smart', 'params': {'search_query': 'העבודה'},
+             'results': [], 'error': True},
+            {'ts': now - 90 * 86400, 'endpoint': 'results', 'action': 'search_smart',
+             'params': {'search_query': 'האמת'}, 'results': [18]},
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'queries.ndjson')
+            with open(path, 'w', encoding='utf-8') as log_file:
+                log_file.writelines(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+            app = Flask(__name__)
+            app.config.update(QUERY_LOG_FILE=path)
+            with app.app_context():
+                self.index._popularity_seeded = False
+                self.index._ensure_current()
+                completions = self.index.complete('הע', ('word',))
+        self.assertEqual(self.index._popularity['העבדה'], 2)
+        self.assertNotIn('האמת', self.index._popularity)
+        self.assertEqual(completions[0].text, 'העבודה')
+
+    def test_remove_document(self):
+        """Removing a mishna drops its words and tags."""
+        self.index._remove('ד_א')
+        self.index._finish()
+        self.assertEqual(self.index.complete('חכ'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
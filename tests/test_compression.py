@@ -0,0 +1,123 @@
+"""
+Unit tests for response compression middleware
+
+Covers encoding negotiation, the minimum size cut-off and reuse of cached
+compressed bodies for deterministic pages, including whole-chapter search
+pages alongside their /results fragment.
+"""
+
+import gzip
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+from models import db
+from tests.app_case import AppTestCase
+from utils import compression
+from utils.compression import init_compression, cache_compressed, compressed_cache
+
+
+BODY = '<html>' + 'משנה ' * 400 + '</html>'
+
+
+class TestCompression(unittest.TestCase):
+    """Test suite for the compression after_request hook."""
+
+    def setUp(self):
+        """Set up a bare application with a few routes."""
+        compressed_cache.clear()
+        self.app = Flask(__name__)
+        self.app.config['COMPRESSION_MIN_SIZE'] = 500
+        init_compression(self.app)
+
+        @self.app.route('/big')
+        def big():
+            return BODY
+
+        @self.app.route('/small')
+        def small():
+            return 'tiny'
+
+        @self.app.route('/cached')
+        def cached():
+            cache_compressed('page')
+            return BODY
+
+        self.client = self.app.test_client()
+
+    def test_gzip_negotiated(self):
+        """Responses are gzipped when the client only accepts gzip."""
+        response = self.client.get('/big', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(gzip.decompress(response.data).decode('utf-8'), BODY)
+
+    def test_identity_when_not_accepted(self):
+        """Responses stay uncompressed without a matching Accept-Encoding."""
+        response = self.client.get('/big', headers={'Accept-Encoding': 'identity'})
+
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.get_data(as_text=True), BODY)
+
+    def test_small_responses_skipped(self):
+        """Responses under COMPRESSION_MIN_SIZE are sent as-is."""
+        response = self.client.get('/small', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.data, b'tiny')
+
+    @patch('utils.compression.get_corpus_version', return_value='v1')
+    def test_cached_page_compressed_once(self, mock_version):
+        """Deterministic pages reuse the cached compressed bytes."""
+        with patch.object(compression, 'compress_bytes', wraps=compression.compress_bytes) as spy:
+            first = self.client.get('/cached', headers={'Accept-Encoding': 'gzip'})
+            second = self.client.get('/cached', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(gzip.decompress(second.data).decode('utf-8'), BODY)
+
+    @patch('utils.compression.get_corpus_version')
+    def test_cache_keyed_by_corpus_version(self, mock_version):
+        """A new corpus version forces recompression."""
+        with patch.object(compression, 'compress_bytes', wraps=compression.compress_bytes) as spy:
+            mock_version.return_value = 'v1'
+            self.client.get('/cached', headers={'Accept-Encoding': 'gzip'})
+            mock_version.return_value = 'v2'
+            self.client.get('/cached', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(spy.call_count, 2)
+
+
+
+class TestChapterPageCache(AppTestCase):
+    """Test suite for the compressed cache of whole-chapter search pages."""
+
+    def setUp(self):
+        """Set up a chapter of mishnayot and the compression middleware."""
+        super().setUp()
+        compressed_cache.clear()
+        init_compression(self.app)
+        for number, mishna in enumerate(('א', 'ב', 'ג'), start=1):
+            self.add_mishna('א', mishna, number, 'משנה ' * 100)
+        db.session.commit()
+
+    def test_fragment_does_not_evict_page(self):
+        """The /results fragment of a chapter does not replace the full page's cached bytes."""
+        form = {'action': 'search_mishna', 'chapter': 'א', 'mishna': 'all'}
+        headers = {'Accept-Encoding': 'gzip'}
+        with patch.object(compression, 'compress_bytes', wraps=compression.compress_bytes) as spy:
+            first = self.client.post('/', data=form, headers=headers)
+            fragment = self.client.post('/results', data=form, headers=headers)
+            second = self.client.post('/', data=form, headers=headers)
+
+        self.assertEqual(fragment.headers['Content-Encoding'], 'gzip')
+        # The page once and the fragment once; the second page comes from the cache
+        self.assertEqual(spy.call_count, 2)
+        self.assertEqual(first.data, second.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+Unit tests for the corpus bundle
+
+Covers the bundle layout, the content-hashed name following the corpus,
+and the /bundle routes: gzip passthrough or decompressed fallback,
+immutable caching and 304 answers.
+"""
+
+import gzip
+import json
+import unittest
+from unittest.mock import patch
+
+from models import db, Mishna, Tag
+from tests.app_case import AppTestCase
+from utils import corpus_bundle
+from utils.corpus_bundle import MISHNA_FIELDS, build_corpus_bundle, get_corpus_bundle
+
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class TestCorpusBundle(AppTestCase):
+    """Test suite for the corpus bundle and its routes."""
+
+    def setUp(self):
+        """Set up two mishnayot and one tag, with no bundle built yet."""
+        super().setUp()
+        self.add_mishna('א', 'א', 1, 'משנה ראשונה', tags=[Tag(name='חסד')])
+        self.add_mishna('א', 'ב', 2, 'משנה שנייה')
+        db.session.commit()
+        patch.object(corpus_bundle, '_bundle', None).start()
+
+    def change_corpus(self):
+        """Edit a mishna and move to a new corpus version."""
+        db.session.get(Mishna, 'א_ב').text_pretty = 'משנה שנייה מתוקנת'
+        db.session.commit()
+        self.change_corpus_version()
+
+    def bundle_url(self):
+        """The bundle URL the manifest points at."""
+        return self.client.get('/bundle/manifest.json').get_json()['url']
+
+    def test_bundle_layout(self):
+        """The bundle holds the version, tags and mishnayot as compact arrays."""
+        bundle = build_corpus_bundle('bundle-1')
+        payload = json.loads(gzip.decompress(bundle.gzipped))
+
+        self.assertEqual(payload['version'], 'bundle-1')
+        self.assertEqual(payload['fields'], MISHNA_FIELDS)
+        self.assertEqual(payload['tags'], [[1, 'חסד', None]])
+        self.assertEqual(payload['mishnayot'], [[1, 'א', 'א', 'משנה ראשונה', 'משנה ראשונה', [1]],
+                                                [2, 'א', 'ב', 'משנה שנייה', 'משנה שנייה', []]])
+        self.assertEqual(bundle.size, len(gzip.decompress(bundle.gzipped)))
+
+    def test_content_hash_follows_corpus(self):
+        """The same corpus gives the same bytes and name; a change gives a new name."""
+        first = build_corpus_bundle('bundle-1')
+        self.assertEqual(build_corpus_bundle('bundle-1'), first)
+
+        self.change_corpus()
+        changed = get_corpus_bundle()
+
+        self.assertNotEqual(changed.content_hash, first.content_hash)
+        self.assertEqual(changed.filename, f'corpus.{changed.content_hash}.json')
+
+    def test_bundle_rebuilt_on_new_version(self):
+        """The cached bundle is reused until the corpus version changes."""
+        bundle = get_corpus_bundle()
+        self.assertIs(get_corpus_bundle(), bundle)
+
+        self.change_corpus()
+
+        self.assertEqual(get_corpus_bundle().version, self.compute.return_value)
+
+    def test_manifest_points_at_current_bundle(self):
+        """The manifest links the current hashed name, and old names 404 after a change."""
+        old_url = self.bundle_url()
+        self.assertEqual(old_url, f'/bundle/{get_corpus_bundle().filename}')
+
+        self.change_corpus()
+        new_url = self.bundle_url()
+        response = self.client.get(old_url, headers={'Accept-Encoding': 'gzip'})
+
+        self.assertNotEqual(new_url, old_url)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.get_json()['current'], get_corpus_bundle().filename)
+
+    def test_gzip_passthrough(self):
+        """Clients accepting gzip get the stored gzipped body as is."""
+        response = self.client.get(self.bundle_url(), headers={'Accept-Encoding': 'gzip, br'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.data, get_corpus_bundle().gzipped)
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+
+    def test_decompressed_fallback(self):
+        """Clients not accepting gzip get the plain JSON."""
+        response = self.client.get(self.bundle_url(), headers={'Accept-Encoding': 'identity'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.get_json()['version'], self.compute.return_value)
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+
+    def test_immutable_caching(self):
+        """The hashed bundle is cached forever and revalidates without building the bundle."""
+        url = self.bundle_url()
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+        etag = response.get_etag()[0]
+
+        self.assertEqual(response.headers['Cache-Control'], IMMUTABLE)
+        self.assertEqual(etag, get_corpus_bundle().content_hash)
+
+        with patch('routes.get_corpus_bundle') as get_bundle:
+            response = self.client.get(url, headers={'If-None-Match': f'"{etag}"'})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['Cache-Control'], IMMUTABLE)
+        get_bundle.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Unit tests for the corpus export serializers
+
+Covers how one batch of exported rows is written in each format.
+"""
+
+import csv
+import io
+import json
+import unittest
+from collections import namedtuple
+
+from utils.corpus_export import COLUMNAR_FIELDS, _columnar, _csv, _ndjson, stream_export
+
+Row = namedtuple('Row', COLUMNAR_FIELDS)
+BATCH = [
+    Row('א_א', 1, 'א', 'א', 'מֹשֶׁה קִבֵּל', 'משה קבל', '', [1, 2], ['תורה', 'עבודה'], ['לימוד', None]),
+    Row('א_ב', 2, 'א', 'ב', 'שִׁמְעוֹן\nהַצַּדִּיק', 'שמעון\nהצדיק', '', [], [], []),
+]
+
+
+class TestCorpusExport(unittest.TestCase):
+    """Test suite for the ndjson, csv and columnar serializers."""
+
+    def test_ndjson(self):
+        """One object per line, tags paired with their categories."""
+        lines = _ndjson(BATCH).splitlines()
+        self.assertEqual(len(lines), 2)
+        record = json.loads(lines[0])
+        self.assertEqual(record['tags'], [{'id': 1, 'name': 'תורה', 'category': 'לימוד'},
+                                          {'id': 2, 'name': 'עבודה', 'category': None}])
+
+    def test_csv(self):
+        """Multi-line text is quoted and tags are joined in order."""
+        rows = list(csv.reader(io.StringIO(_csv(BATCH))))
+        self.assertEqual(rows[0][-2:], ['תורה|עבודה', 'לימוד|'])
+        self.assertEqual(rows[1][4], 'שִׁמְעוֹן\nהַצַּדִּיק')
+
+    def test_columnar(self):
+        """A batch becomes one row group with a list per column."""
+        group = json.loads(_columnar(BATCH))
+        self.assertEqual(group['count'], 2)
+        self.assertEqual(group['columns']['number'], [1, 2])
+        self.assertEqual(group['columns']['tag_ids'], [[1, 2], []])
+
+    def test_unknown_format(self):
+        """Unknown formats are rejected before any query runs."""
+        with self.assertRaises(ValueError):
+            stream_export('xml')
+
+
+if __name__ == '__main__':
+    unittest.main()
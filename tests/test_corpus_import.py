@@ -0,0 +1,45 @@
+"""
+Unit tests for the raw text importer's parser
+
+Covers Hebrew numeral labels and deriving chapter, mishna and number from
+blank-line separated blocks.
+"""
+
+import unittest
+
+from constants import ALLOWED_CHAPTERS
+from utils.corpus_import import hebrew_numeral, parse_hebrew_numeral, parse_raw_text
+
+RAW_TEXT = '''פרק א משנה א: מֹשֶׁה קִבֵּל תּוֹרָה מִסִּינַי:
+
+משנה ב: שִׁמְעוֹן הַצַּדִּיק
+הָיָה מִשְּׁיָרֵי כְנֶסֶת הַגְּדוֹלָה:
+
+
+אַנְטִיגְנוֹס אִישׁ סוֹכוֹ:
+
+פרק ב׳ משנה א׳: רַבִּי אוֹמֵר:
+'''
+
+
+class TestCorpusImport(unittest.TestCase):
+    """Test suite for the numeral helpers and parse_raw_text."""
+
+    def test_numerals_match_chapter_labels(self):
+        """Labels round-trip and match the ones used across the site."""
+        for labels in ALLOWED_CHAPTERS.values():
+            self.assertEqual([hebrew_numeral(value) for value in range(1, len(labels) + 1)], labels)
+            self.assertEqual([parse_hebrew_numeral(label) for label in labels], list(range(1, len(labels) + 1)))
+        self.assertEqual(parse_hebrew_numeral('ט״ו'), 15)
+        self.assertIsNone(parse_hebrew_numeral('abc'))
+
+    def test_parse_blocks(self):
+        """Headers set chapter and mishna, headerless blocks continue the count."""
+        parsed = list(parse_raw_text(RAW_TEXT.splitlines(keepends=True)))
+        self.assertEqual([(m.id, m.number) for m in parsed], [('א_א', 1), ('א_ב', 2), ('א_ג', 3), ('ב_א', 4)])
+        self.assertEqual(parsed[0].text_pretty, 'מֹשֶׁה קִבֵּל תּוֹרָה מִסִּינַי:')
+        self.assertIn('\n', parsed[1].text_pretty)
+
+
+if __name__ == '__main__':
+    unittest.main()
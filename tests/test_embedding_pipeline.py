@@ -0,0 +1,75 @@
+"""
+Unit tests for the embedding pipeline
+
+Covers the content hashes that decide which rows are re-embedded, and the
+coalescing of ids queued for a background re-embed, without a model or a
+database.
+"""
+
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from flask import Flask
+
+from utils import embedding_pipeline
+from utils.embedding_pipeline import content_hash, enqueue_embedding, stale_rows
+
+
+def row(row_id, content, embedding_hash=None):
+    return SimpleNamespace(id=row_id, content=content, embedding_hash=embedding_hash)
+
+
+class TestStaleRows(unittest.TestCase):
+    """Test suite for content_hash and stale_rows."""
+
+    def test_content_hash(self):
+        """The hash changes with the text and with the model."""
+        self.assertEqual(content_hash('m1', 'תורה'), content_hash('m1', 'תורה'))
+        self.assertNotEqual(content_hash('m1', 'תורה'), content_hash('m1', 'תורה.'))
+        self.assertNotEqual(content_hash('m1', 'תורה'), content_hash('m2', 'תורה'))
+
+    def test_only_changed_rows_are_stale(self):
+        """Rows embedded from their current text by the same model are skipped."""
+        rows = [row(1, 'תורה', content_hash('m1', 'תורה')),
+                row(2, 'עבודה', content_hash('m1', 'עבודה ישנה')),
+                row(3, 'חכמה')]
+        self.assertEqual(stale_rows(rows, 'm1'), [(2, 'עבודה', content_hash('m1', 'עבודה')),
+                                                  (3, 'חכמה', content_hash('m1', 'חכמה'))])
+        self.assertEqual([row_id for row_id, _, _ in stale_rows(rows, 'm2')], [1, 2, 3])
+        self.assertEqual(len(stale_rows(rows, 'm1', full=True)), 3)
+
+
+class TestEnqueueEmbedding(unittest.TestCase):
+    """Test suite for enqueue_embedding and the pending queue."""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        patcher = patch.object(embedding_pipeline, 'get_executor')
+        self.executor = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        embedding_pipeline._take_pending()
+        embedding_pipeline._drain_scheduled = False
+
+    def test_saves_coalesce_into_one_batch(self):
+        """Ids queued before the worker runs are drained together, with one task scheduled."""
+        with self.app.app_context():
+            enqueue_embedding(mishna_ids=['א_ב'])
+            enqueue_embedding(mishna_ids=['א_א', 'א_ב'], tag_ids=[3])
+        self.assertEqual(self.executor.submit.call_count, 1)
+
+        self.assertEqual(embedding_pipeline._take_pending(), {'mishna': ['א_א', 'א_ב'], 'tag': [3]})
+        self.assertEqual(embedding_pipeline._take_pending(), {})
+        self.assertFalse(embedding_pipeline._drain_scheduled)
+
+    def test_disabled(self):
+        """Nothing is queued when EMBEDDING_REFRESH_ON_SAVE is off."""
+        self.app.config['EMBEDDING_REFRESH_ON_SAVE'] = False
+        with self.app.app_context():
+            enqueue_embedding(mishna_ids=['א_א'])
+        self.executor.submit.assert_not_called()
+        self.assertEqual(embedding_pipeline._take_pending(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
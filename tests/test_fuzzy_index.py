@@ -0,0 +1,69 @@
+"""
+Unit tests for the typo-tolerant vocabulary index
+
+Covers the edit distance, symmetric-delete lookups and incremental
+removal of words.
+"""
+
+import unittest
+
+from utils.fuzzy_index import SymSpellIndex, edit_distance, allowed_distance
+
+
+class TestEditDistance(unittest.TestCase):
+    """Test suite for edit_distance."""
+
+    def test_basic_edits(self):
+        """Substitution, insertion, deletion and transposition cost one edit."""
+        self.assertEqual(edit_distance('חכמ', 'חכמ', 2), 0)
+        self.assertEqual(edit_distance('חכמ', 'חחמ', 2), 1)
+        self.assertEqual(edit_distance('חכמ', 'חכממ', 2), 1)
+        self.assertEqual(edit_distance('חכמ', 'חמ', 2), 1)
+        self.assertEqual(edit_distance('חכמ', 'כחמ', 2), 1)
+
+    def test_exceeding_max_distance(self):
+        """Distances above the limit are reported as limit + 1."""
+        self.assertEqual(edit_distance('אנטגנס', 'שמענ', 2), 3)
+
+    def test_allowed_distance_by_length(self):
+        """Short terms are not corrected, long ones tolerate two edits."""
+        self.assertEqual(allowed_distance('מה'), 0)
+        self.assertEqual(allowed_distance('חכמ'), 1)
+        self.assertEqual(allowed_distance('אנטגנס'), 2)
+
+
+class TestSymSpellIndex(unittest.TestCase):
+    """Test suite for SymSpellIndex."""
+
+    def setUp(self):
+        self.index = SymSpellIndex()
+        for word, surface in [('הצדק', 'הצדיק'), ('הצדק', 'הצדיק'), ('הצדק', 'הצדק'),
+                              ('הצחק', 'הצחק'), ('שמענ', 'שמעון')]:
+            self.index.add(word, surface)
+
+    def test_lookup_orders_by_distance_then_frequency(self):
+        """The closest and most frequent word comes first, in its usual spelling."""
+        suggestions = self.index.lookup('הצדג')
+        self.assertEqual(suggestions[0].word, 'הצדק')
+        self.assertEqual(suggestions[0].distance, 1)
+        self.assertEqual(suggestions[0].surface, 'הצדיק')
+
+    def test_lookup_exact_word(self):
+        """A known word is found at distance zero."""
+        self.assertEqual(self.index.lookup('שמענ')[0].distance, 0)
+
+    def test_no_suggestion_for_distant_term(self):
+        """Terms further than the allowed distance find nothing."""
+        self.assertEqual(self.index.lookup('אברהמ'), [])
+
+    def test_remove_word(self):
+        """A word disappears once all its occurrences are removed."""
+        self.index.remove('הצחק', 'הצחק')
+        self.assertNotIn('הצחק', self.index)
+        self.assertEqual([s.word for s in self.index.lookup('הצחג')], [])
+        self.index.remove('הצדק', 'הצדק')
+        self.assertIn('הצדק', self.index)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""
+Unit tests for match highlighting
+
+Covers the niqqud offset map and splitting text_pretty into highlighted
+segments from text_raw spans.
+"""
+
+import unittest
+
+from utils.highlight import highlight_segments
+from utils.text_utils import niqqud_offsets, remove_niqqud
+
+TEXT_PRETTY = 'בֶּן זוֹמָא אוֹמֵר, אֵיזֶהוּ חָכָם'
+
+
+class TestHighlight(unittest.TestCase):
+    """Test suite for niqqud_offsets and highlight_segments."""
+
+    def setUp(self):
+        self.text_raw = remove_niqqud(TEXT_PRETTY)
+        self.offsets = niqqud_offsets(TEXT_PRETTY)
+
+    def test_offsets_map_raw_to_pretty(self):
+        """Every raw character maps to the same character in text_pretty."""
+        self.assertEqual(len(self.offsets), len(self.text_raw) + 1)
+        for index, char in enumerate(self.text_raw):
+            self.assertEqual(TEXT_PRETTY[self.offsets[index]], char)
+        self.assertEqual(self.offsets[-1], len(TEXT_PRETTY))
+
+    def test_segments_keep_niqqud(self):
+        """Highlighted words are taken from text_pretty with their niqqud."""
+        start = self.text_raw.index('חכם')
+        segments = highlight_segments(TEXT_PRETTY, self.offsets, [(start, start + 3)])
+        self.assertEqual(''.join(text for text, _ in segments), TEXT_PRETTY)
+        self.assertEqual([text for text, is_match in segments if is_match], ['חָכָם'])
+
+    def test_overlapping_spans(self):
+        """Overlapping spans are merged into one highlight."""
+        segments = highlight_segments(TEXT_PRETTY, self.offsets, [(0, 2), (1, 2)])
+        self.assertEqual(''.join(text for text, _ in segments), TEXT_PRETTY)
+        self.assertEqual(''.join(text for text, is_match in segments if is_match), 'בֶּן')
+
+    def test_nothing_to_highlight(self):
+        """No spans, a missing map or a map of another text give None."""
+        self.assertIsNone(highlight_segments(TEXT_PRETTY, self.offsets, []))
+        self.assertIsNone(highlight_segments(TEXT_PRETTY, None, [(0, 2)]))
+        self.assertIsNone(highlight_segments(TEXT_PRETTY + 'x', self.offsets, [(0, 2)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+Unit tests for hybrid search
+
+Covers reciprocal-rank fusion and the semantic deadline: a late semantic
+answer falls back to the lexical ranking and is cached once it arrives, and
+an incomplete search without results is not reported as finding nothing.
+"""
+
+import os
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from flask import Flask, render_template
+
+from utils import hybrid_search as hybrid
+from utils.hybrid_search import hybrid_search, reciprocal_rank_fusion
+from utils.lexical_index import LexicalMatch
+from utils.text_utils import query_cache_key
+
+LEXICAL = [LexicalMatch('א_ב', 2, 3.0, ((0, 4),)), LexicalMatch('א_ג', 3, 1.0)]
+
+
+class FakeClient:
+    """Semantic client answering after release() is called."""
+
+    def __init__(self, ranking, wait=True):
+        self.ranking = ranking
+        self.released = threading.Event()
+        if not wait:
+            self.released.set()
+
+    def rank(self, query):
+        self.released.wait(5)
+        return self.ranking
+
+
+class TestHybridSearch(unittest.TestCase):
+    """Test suite for reciprocal_rank_fusion and hybrid_search."""
+
+    def setUp(self):
+        hybrid._fused_cache.clear()
+        self.app = Flask(__name__)
+        self.app.config['HYBRID_SEMANTIC_DEADLINE'] = 0.05
+        for target, value in (('lexical_index.search', LEXICAL), ('get_corpus_version', 'v1')):
+            patcher = patch(f'utils.hybrid_search.{target}', return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_rrf_rewards_agreement(self):
+        """Items ranked by both lists beat items at the top of only one."""
+        fused = reciprocal_rank_fusion([[1, 2, 3], [4, 2, 3]])
+        self.assertEqual([number for number, _ in fused][:2], [2, 3])
+        self.assertAlmostEqual(fused[0][1], 2 / 62)
+
+    def test_fused_ranking(self):
+        """Semantic-only matches are added and lexical spans are kept."""
+        with self.app.app_context():
+            result = hybrid_search('שמעון', FakeClient([(3, 0.9), (50, 0.8)], wait=False))
+        self.assertTrue(result.complete)
+        self.assertEqual([match.number for match in result.matches], [3, 2, 50])
+        self.assertEqual(result.matches[1].spans, ((0, 4),))
+
+    def test_deadline_falls_back_to_lexical(self):
+        """A late semantic leg returns lexical results, then caches the fused ranking."""
+        client = FakeClient([(50, 0.9)])
+        with self.app.app_context():
+            result = hybrid_search('שמעון', client)
+            self.assertFalse(result.complete)
+            self.assertEqual([match.number for match in result.matches], [2, 3])
+
+            client.released.set()
+            for _ in range(100):
+                if hybrid._fused_cache.get((query_cache_key('שמעון'), 'v1')) is not None:
+                    break
+                time.sleep(0.01)
+
+            result = hybrid_search('שמעון', client)
+        self.assertTrue(result.complete)
+        self.assertIn(50, [match.number for match in result.matches])
+
+    def test_semantic_error(self):
+        """A failing semantic leg is reported with the lexical results."""
+        class FailingClient:
+            def rank(self, query):
+                raise ValueError('not configured')
+
+        with self.app.app_context():
+            result = hybrid_search('שמעון', FailingClient())
+        self.assertFalse(result.complete)
+        self.assertIsInstance(result.error, ValueError)
+        self.assertEqual(len(result.matches), 2)
+
+
+
+class TestPartialResultsMessage(unittest.TestCase):
+    """Test suite for the results block of an incomplete hybrid search."""
+
+    def setUp(self):
+        self.app = Flask(__name__, root_path=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    def render(self, **context):
+        with self.app.test_request_context('/results', method='POST'):
+            return render_template('_results.html', results=[], **context)
+
+    def test_incomplete_search_without_results(self):
+        """A late semantic leg with no lexical matches says the search was incomplete."""
+        html = self.render(partial_results=True)
+        self.assertIn('החיפוש לא הושלם', html)
+        self.assertNotIn('לא נמצאו תוצאות', html)
+
+    def test_complete_search_without_results(self):
+        """A complete search with no matches says nothing was found."""
+        html = self.render(partial_results=False)
+        self.assertIn('לא נמצאו תוצאות', html)
+        self.assertNotIn('החיפוש לא הושלם', html)
+
+
+if __name__ == '__main__':
+    unittest.main()
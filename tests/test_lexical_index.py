@@ -0,0 +1,107 @@
+"""
+Unit tests for the BM25 lexical index
+
+Covers prefix-letter variants, conjunctive matching, ranking, the query
+language, sorted-list operations and incremental document updates, on an
+index filled without a database.
+"""
+
+import unittest
+from unittest.mock import patch
+
+from utils.corpus_index import MishnaDocument
+from utils.lexical_index import LexicalIndex, intersect_sorted, word_variants
+
+DOCUMENTS = [
+    MishnaDocument('א_ב', 2, 'א', 'שמעון הצדיק היה משירי כנסת הגדולה. הוא היה אומר, על שלשה דברים העולם עומד',
+                   ('תורה', 'עבודה')),
+    MishnaDocument('א_ג', 3, 'א', 'אנטיגנוס איש סוכו קבל משמעון הצדיק. הוא היה אומר, אל תהיו כעבדים',
+                   ('עבודה',)),
+    MishnaDocument('ד_א', 53, 'ד', 'בן זומא אומר, איזהו חכם, הלומד מכל אדם', ('חכמה', 'ענווה')),
+]
+
+
+def ids(matches):
+    return [match.mishna_id for match in matches]
+
+
+class TestLexicalIndex(unittest.TestCase):
+    """Test suite for LexicalIndex.search."""
+
+    def setUp(self):
+        patcher = patch('utils.corpus_index.get_corpus_version', return_value='v1')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.index = LexicalIndex()
+        for document in DOCUMENTS:
+            self.index._add(document)
+        self.index._finish()
+        self.index._version, self.index._built = 'v1', True
+
+    def test_word_variants_strip_prefixes(self):
+        """Prefix letters are stripped up to two, keeping stems of three letters or more."""
+        self.assertEqual(word_variants('והצדיק', 'והצדק'), ['והצדק', 'הצדק', 'צדק'])
+        self.assertEqual(word_variants('משה', 'משה'), ['משה'])
+
+    def test_all_words_must_match(self):
+        """Only mishnayot containing every query word are returned."""
+        self.assertCountEqual(ids(self.index.search('היה אומר')), ['א_ב', 'א_ג'])
+        self.assertEqual(self.index.search('אומר כנסת אנטיגנוס'), [])
+
+    def test_prefixed_forms_match_stem(self):
+        """A query for a stem finds the word with prefix letters."""
+        self.assertCountEqual(ids(self.index.search('שמעון')), ['א_ב', 'א_ג'])
+
+    def test_ranking(self):
+        """More occurrences in a shorter text rank higher."""
+        matches = self.index.search('היה')
+        self.assertEqual(matches[0].mishna_id, 'א_ב')
+        self.assertGreater(matches[0].score, matches[1].score)
+
+    def test_top_k(self):
+        """At most top_k matches are returned."""
+        self.assertEqual(len(self.index.search('אומר', top_k=2)), 2)
+
+    def test_phrase(self):
+        """Quoted words must be adjacent and in order."""
+        self.assertCountEqual(ids(self.index.search('"היה אומר"')), ['א_ב', 'א_ג'])
+        self.assertEqual(self.index.search('"אומר היה"'), [])
+
+    def test_exclusion_and_or(self):
+        """-term removes matches, OR accepts either term."""
+        self.assertEqual(ids(self.index.search('אומר -כנסת -"תהיו כעבדים"')), ['ד_א'])
+        self.assertCountEqual(ids(self.index.search('חכם OR אנטיגנוס')), ['א_ג', 'ד_א'])
+
+    def test_tag_and_chapter_filters(self):
+        """Filters alone return mishnayot in order, unscored."""
+        matches = self.index.search('tag:עבודה')
+        self.assertEqual(ids(matches), ['א_ב', 'א_ג'])
+        self.assertTrue(all(match.score == 0 for match in matches))
+        self.assertEqual(ids(self.index.search('תגית:ענווה OR פרק:א -tag:תורה')), ['א_ג', 'ד_א'])
+
+    def test_intersect_sorted(self):
+        """Galloping intersection matches a plain set intersection."""
+        a, b = [3, 50, 51, 90], list(range(0, 100, 3))
+        self.assertEqual(intersect_sorted(a, b), sorted(set(a) & set(b)))
+        self.assertEqual(intersect_sorted(b, a), sorted(set(a) & set(b)))
+        self.assertEqual(intersect_sorted([], b), [])
+
+    def test_update_mishna(self):
+        """Updating a mishna replaces its postings."""
+        self.index.update_mishnayot([MishnaDocument('ד_א', 53, 'ד', 'בן זומא היה אומר', ())], 'v1')
+        self.assertEqual(self.index.search('חכם'), [])
+        self.assertEqual(self.index.search('tag:ענווה'), [])
+        self.assertEqual(len(self.index.search('היה אומר')), 3)
+
+    def test_update_after_missed_change_rebuilds(self):
+        """A save on top of a change the index never saw marks it for a rebuild instead of patching."""
+        # Built for v1; another change made it v2 before this save
+        terms = list(self.index._doc_terms[53])
+        self.index.update_mishnayot([MishnaDocument('ד_א', 53, 'ד', 'בן זומא היה אומר', ())], 'v2')
+        self.assertFalse(self.index._built)
+        self.assertEqual(self.index._doc_terms[53], terms)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Unit tests for the traffic replay load generator
+
+Covers turning query log records and a synthetic mix into replay requests,
+the per-action latency, throughput and error rate reports, and that test
+client replays stay out of the query log.
+"""
+
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+from utils import load_replay
+from utils.load_replay import (ReplayResult, SyntheticCorpus, compare_runs, recorded_traffic, run_replay, summarize,
+                               synthetic_traffic)
+from utils.query_log import QueryLogWriter, QueryRecord, begin_search, finish_search
+
+CORPUS = SyntheticCorpus(mishnayot=[(1, 1, 1), (1, 2, 2), (2, 1, 19)],
+                         words=['אמת', 'דרך', 'שלום', 'תורה'],
+                         tag_ids=[1, 2, 3])
+
+
+class TestTraffic(unittest.TestCase):
+    """Test suite for recorded and synthetic traffic."""
+
+    def test_recorded_traffic(self):
+        """Logged searches keep their endpoint and fields, smart searches are split by mode."""
+        records = [
+            QueryRecord(1.0, 'search', 'search_mishna', params={'chapter': '1', 'mishna': '2'}),
+            QueryRecord(2.0, 'results', 'search_smart', params={'search_query': 'תורה', 'exact_match': 'on'}),
+            QueryRecord(3.0, 'results', 'search_smart', params={'search_query': 'דרך ארץ'}),
+            QueryRecord(4.0, 'export', 'export'),
+        ]
+        traffic = recorded_traffic(records)
+        self.assertEqual([request.label for request in traffic],
+                         ['search_mishna', 'search_smart:exact', 'search_smart:semantic'])
+        self.assertEqual(traffic[0].endpoint, 'search')
+        self.assertEqual(traffic[0].form, {'chapter': '1', 'mishna': '2', 'action': 'search_mishna',
+                                           'search_type': 'search_mishna'})
+        self.assertEqual(traffic[2].form, {'search_query': 'דרך ארץ', 'action': 'search_smart'})
+        self.assertEqual([request.label for request in recorded_traffic(records, limit=1)],
+                         ['search_smart:semantic'])
+
+    def test_synthetic_mix_is_repeatable(self):
+        """The mix only draws the weighted actions, and a seed repeats the traffic."""
+        mix = {'navigate_by_number': 1, 'search_by_tags': 1}
+        traffic = synthetic_traffic(CORPUS, 50, mix=mix, seed=7)
+        self.assertEqual(len(traffic), 50)
+        self.assertEqual({request.label for request in traffic}, set(mix))
+        self.assertEqual(traffic, synthetic_traffic(CORPUS, 50, mix=mix, seed=7))
+        for request in traffic:
+            self.assertEqual(request.endpoint, 'results')
+            if request.label == 'navigate_by_number':
+                self.assertIn(request.form['mishna_number'], {'1', '2', '19'})
+            else:
+                self.assertTrue(set(request.form['tags'].split(',')) <= {'1', '2', '3'})
+
+    def test_unknown_action_rejected(self):
+        """A mix naming an unknown action raises ValueError."""
+        with self.assertRaises(ValueError):
+            synthetic_traffic(CORPUS, 10, mix={'search_everything': 1})
+
+
+class TestTestClientTarget(unittest.TestCase):
+    """Test suite for replays through the test client."""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config.update(QUERY_LOG_ENABLED=True)
+
+        @self.app.route('/results', methods=['POST'])
+        def results():
+            begin_search('results', 'search_mishna')
+            finish_search([1])
+            return 'ok'
+
+    def test_replay_leaves_query_log_untouched(self):
+        """Replayed searches are not logged, and the log is enabled again after the run."""
+        traffic = synthetic_traffic(CORPUS, 20, mix={'search_mishna': 1}, seed=1)
+        with patch.object(QueryLogWriter, 'write') as write:
+            report = run_replay(load_replay.TestClientTarget(self.app), traffic, concurrency=2)
+            self.assertEqual(report['actions']['all']['errors'], 0)
+            write.assert_not_called()
+
+            self.app.test_client().post('/results')
+            write.assert_called_once()
+        self.assertTrue(self.app.config['QUERY_LOG_ENABLED'])
+
+
+class TestReports(unittest.TestCase):
+    """Test suite for summarize and compare_runs."""
+
+    def test_summarize(self):
+        """Percentiles, throughput and error rate are reported per action and overall."""
+        results = [ReplayResult('search_mishna', float(ms), ms == 100) for ms in range(1, 101)]
+        results.append(ReplayResult('navigate_by_number', 5.0, False))
+        report = summarize(results, elapsed=2.0)
+
+        row = report['actions']['search_mishna']
+        self.assertEqual(row['requests'], 100)
+        self.assertEqual(row['errors'], 1)
+        self.assertAlmostEqual(row['error_rate'], 0.01)
+        self.assertEqual(row['throughput_rps'], 50.0)
+        self.assertEqual((row['p50_ms'], row['p95_ms'], row['p99_ms']), (51.0, 96.0, 100.0))
+        self.assertEqual(report['actions']['all']['requests'], 101)
+        self.assertEqual(report['actions']['navigate_by_number']['p99_ms'], 5.0)
+
+    def test_compare_runs(self):
+        """Only actions present in both runs are compared, with the relative change."""
+        base = summarize([ReplayResult('search_mishna', 10.0, False),
+                          ReplayResult('search_by_tags', 4.0, False)], elapsed=1.0)
+        new = summarize([ReplayResult('search_mishna', 5.0, False)], elapsed=1.0)
+        rows = {(row['label'], row['metric']): row for row in compare_runs(base, new)}
+        self.assertNotIn(('search_by_tags', 'p50_ms'), rows)
+        self.assertEqual(rows[('search_mishna', 'p50_ms')]['change'], -0.5)
+        self.assertIsNone(rows[('search_mishna', 'error_rate')]['change'])
@@ -0,0 +1,134 @@
+"""
+Unit tests for permalink HTTP caching
+
+Covers the ETag and Cache-Control headers of /mishna, /chapter and /tag
+pages, 304 answers to a matching If-None-Match, new ETags after the corpus
+version or the deployed templates and assets change, and what a
+conditional request costs.
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import routes
+from models import db, Tag
+from tests.app_case import AppTestCase
+from utils.corpus_version import corpus_version
+from utils.http_cache import build_fingerprint
+
+
+class TestPermalinks(AppTestCase):
+    """Test suite for corpus_conditional on the permalink routes."""
+
+    def setUp(self):
+        """Set up two tagged mishnayot."""
+        super().setUp()
+        self.app.config.update(PERMALINK_MAX_AGE=300, PERMALINK_STALE_WHILE_REVALIDATE=86400)
+        tag = Tag(name='חסד')
+        for number, mishna in enumerate(('א', 'ב'), start=1):
+            self.add_mishna('א', mishna, number, f'משנה {number}', tags=[tag])
+        db.session.commit()
+
+    def test_etag_and_cache_control(self):
+        """Permalink pages carry a strong ETag and the public caching policy."""
+        for path, text in (('/mishna/1', 'משנה 1'), ('/chapter/א', 'משנה 2'), ('/chapter/א/ב', 'משנה 2'),
+                           ('/tag/1', 'משנה 1')):
+            with self.subTest(path=path):
+                response = self.client.get(path)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(text, response.get_data(as_text=True))
+                etag, weak = response.get_etag()
+                self.assertTrue(etag)
+                self.assertFalse(weak)
+                self.assertEqual(response.headers['Cache-Control'], 'public, max-age=300, stale-while-revalidate=86400')
+
+    def test_resources_have_distinct_etags(self):
+        """Different permalinks at the same corpus version get different ETags."""
+        first = self.client.get('/mishna/1').get_etag()[0]
+        second = self.client.get('/mishna/2').get_etag()[0]
+
+        self.assertNotEqual(first, second)
+
+    def test_not_modified(self):
+        """A matching If-None-Match is answered with 304 and the same headers."""
+        etag = self.client.get('/mishna/1').get_etag()[0]
+
+        response = self.client.get('/mishna/1', headers={'If-None-Match': f'"{etag}"'})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(response.get_etag()[0], etag)
+        self.assertIn('max-age=300', response.headers['Cache-Control'])
+
+    def test_new_etag_after_bump(self):
+        """A corpus change makes the old ETag stale and the page is rendered again."""
+        etag = self.client.get('/mishna/1').get_etag()[0]
+
+        self.change_corpus_version()
+        response = self.client.get('/mishna/1', headers={'If-None-Match': f'"{etag}"'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.get_etag()[0], etag)
+
+    def test_new_etag_after_deploy(self):
+        """A deploy with other templates or assets makes the old ETag stale at the same corpus version."""
+        etag = self.client.get('/mishna/1').get_etag()[0]
+
+        self.app.extensions['build_fingerprint'] = 'next-deploy'
+        response = self.client.get('/mishna/1', headers={'If-None-Match': f'"{etag}"'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.get_etag()[0], etag)
+
+    def test_build_fingerprint_follows_static_assets(self):
+        """The build fingerprint changes with the content of a static asset."""
+        with tempfile.TemporaryDirectory() as static_dir:
+            self.app.static_folder = static_dir
+            asset = os.path.join(static_dir, 'app.js')
+            fingerprints = []
+            for source in ('let a = 1;', 'let a = 2;'):
+                with open(asset, 'w', encoding='utf-8') as f:
+                    f.write(source)
+                self.app.extensions.pop('build_fingerprint', None)
+                fingerprints.append(build_fingerprint())
+
+        self.assertNotEqual(fingerprints[0], fingerprints[1])
+
+    def test_not_modified_without_database_or_rendering(self):
+        """A 304 from a fresh cached version neither queries nor renders."""
+        etag = self.client.get('/mishna/1').get_etag()[0]
+        computed = self.compute.call_count
+
+        with patch.object(routes, '_query_by_number') as query:
+            response = self.client.get('/mishna/1', headers={'If-None-Match': f'"{etag}"'})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.compute.call_count, computed)
+        query.assert_not_called()
+
+    def test_not_modified_after_ttl_recomputes_version(self):
+        """Once the cached version expired, a 304 costs one fingerprint query but no rendering."""
+        etag = self.client.get('/mishna/1').get_etag()[0]
+        computed = self.compute.call_count
+
+        corpus_version.invalidate()
+        with patch.object(routes, '_query_by_number') as query:
+            response = self.client.get('/mishna/1', headers={'If-None-Match': f'"{etag}"'})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.compute.call_count, computed + 1)
+        query.assert_not_called()
+
+    def test_missing_mishna(self):
+        """A permalink to a missing mishna is a 404 without an ETag."""
+        response = self.client.get('/mishna/99')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(response.get_etag()[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
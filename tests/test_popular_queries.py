@@ -0,0 +1,59 @@
+"""
+Unit tests for popular query mining
+
+Covers counting semantic smart search queries by their cache key, from
+query log records and from application log lines.
+"""
+
+import unittest
+
+from utils.popular_queries import MinedQuery, app_log_queries, mine_popular_queries, semantic_queries
+from utils.query_log import QueryRecord
+
+
+def log_line(query, exact=False):
+    return (f'2026-03-01 10:00:00,000 INFO: Smart search initiated. Query: {query}, '
+            f'Exact Match: {exact} [in /app/routes.py:380]\n')
+
+
+class TestMinePopularQueries(unittest.TestCase):
+    """Test suite for mine_popular_queries."""
+
+    def test_counts_normalized_semantic_queries(self):
+        """Spellings differing in niqqud are counted together and the most frequent is kept."""
+        lines = [log_line('דרך ארץ'), log_line('דֶּרֶךְ אֶרֶץ'), log_line('דרך ארץ'),
+                 log_line('תורה'), log_line('תורה'), log_line('תורה'), log_line('תורה'),
+                 'unrelated line\n']
+        self.assertEqual(mine_popular_queries(app_log_queries(lines), min_count=3), [
+            MinedQuery('תורה', 'תורה', 4),
+            MinedQuery('דרך ארץ', 'דרך ארץ', 3),
+        ])
+
+    def test_different_words_kept_apart(self):
+        """Words that only normalize_hebrew conflates (vav/yod dropped) are different queries."""
+        lines = [log_line('שלום')] * 3 + [log_line('שלם')] * 3 + [log_line('דין  ')] * 3 + [log_line('דן')] * 3
+        self.assertEqual({query.normalized_query for query in mine_popular_queries(app_log_queries(lines))},
+                         {'שלום', 'שלם', 'דין', 'דן'})
+
+    def test_exact_searches_and_rare_queries_ignored(self):
+        """Exact match searches never call the semantic API; rare queries are cut."""
+        lines = [log_line('שלום', exact=True)] * 5 + [log_line('אמת')] * 2
+        self.assertEqual(mine_popular_queries(app_log_queries(lines), min_count=3), [])
+        self.assertEqual(mine_popular_queries(app_log_queries(lines), limit=1, min_count=1),
+                         [MinedQuery('אמת', 'אמת', 2)])
+
+    def test_query_log_records(self):
+        """Only successful semantic smart searches of the query log are counted."""
+        records = [
+            QueryRecord(1.0, 'results', 'search_smart', params={'search_query': 'אמת'}),
+            QueryRecord(2.0, 'search', 'search_smart', params={'search_query': 'אמת'}),
+            QueryRecord(3.0, 'results', 'search_smart', params={'search_query': 'אמת', 'exact_match': 'on'}),
+            QueryRecord(4.0, 'results', 'search_smart', params={'search_query': 'אמת'}, error=True),
+            QueryRecord(5.0, 'results', 'search_by_tags', params={'tags': '1,2'}),
+        ]
+        self.assertEqual(mine_popular_queries(semantic_queries(records), min_count=1),
+                         [MinedQuery('אמת', 'אמת', 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
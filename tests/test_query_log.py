@@ -0,0 +1,83 @@
+"""
+Unit tests for the structured query log
+
+Covers recording a search from a request, batched writes, size rotation,
+the bounded queue and reading the rotated files back in order.
+"""
+
+import os
+import tempfile
+import unittest
+
+from flask import Flask
+
+from utils import query_log
+from utils.query_log import QueryLogWriter, QueryRecord, read_query_log
+
+
+def record(ts, query='אמת'):
+    return QueryRecord(ts, 'results', 'search_smart', query, {'search_query': query}, [1, 2], {'total': 1.5})
+
+
+class TestQueryLog(unittest.TestCase):
+    """Test suite for QueryLogWriter, the request helpers and read_query_log."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'queries.ndjson')
+
+    def test_written_records_read_back(self):
+        """Queued records reach the file on flush and parse back unchanged."""
+        writer = QueryLogWriter(self.path, flush_seconds=60)
+        writer.write(record(1.0))
+        writer.write(record(2.0, 'דרכ ארצ'))
+        self.assertEqual(list(read_query_log(self.path)), [])
+
+        self.assertEqual(writer.flush(), 2)
+        self.assertEqual(list(read_query_log(self.path)), [record(1.0), record(2.0, 'דרכ ארצ')])
+        self.assertEqual([r.ts for r in read_query_log(self.path, since=1.0)], [2.0])
+
+    def test_rotation_keeps_order(self):
+        """Rotated files are read oldest first; the oldest beyond the backup count are gone."""
+        writer = QueryLogWriter(self.path, max_bytes=1, backup_count=2, flush_seconds=60)
+        for ts in range(1, 5):
+            writer.write(record(float(ts)))
+            writer.flush()
+        self.assertEqual([r.ts for r in read_query_log(self.path)], [2.0, 3.0, 4.0])
+
+    def test_full_queue_drops_records(self):
+        """Beyond max_pending records are dropped instead of growing memory."""
+        writer = QueryLogWriter(self.path, max_pending=2, flush_seconds=60)
+        self.assertTrue(writer.write(record(1.0)))
+        self.assertTrue(writer.write(record(2.0)))
+        self.assertFalse(writer.write(record(3.0)))
+        self.assertEqual(writer.dropped, 1)
+        writer.flush()
+        self.assertEqual(writer.dropped, 0)
+        self.assertEqual(len(list(read_query_log(self.path))), 2)
+
+    def test_request_record(self):
+        """Stages, cache hits and result numbers of a request end up in its record."""
+        app = Flask(__name__)
+        writer = QueryLogWriter(self.path, flush_seconds=60)
+        self.addCleanup(setattr, query_log, '_writer', None)
+        query_log._writer = writer
+
+        with app.test_request_context('/results', method='POST'):
+            query_log.begin_search('results', 'search_by_tags', '1 2', {'tags': '2,1'})
+            with query_log.stage('tags'):
+                pass
+            query_log.mark_cache_hit('fragment')
+            query_log.finish_search([14, 2], degraded=True)
+            query_log.finish_search([3])
+        writer.flush()
+
+        logged, = read_query_log(self.path)
+        self.assertEqual((logged.action, logged.query, logged.params), ('search_by_tags', '1 2', {'tags': '2,1'}))
+        self.assertEqual((logged.results, logged.cache, logged.degraded), ([14, 2], 'fragment', True))
+        self.assertEqual(set(logged.stages), {'tags', 'total'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+"""
+Unit tests for related mishnayot
+
+Covers how tag Jaccard and embedding cosine scores are combined and ranked.
+"""
+
+import unittest
+
+from utils.related_mishnayot import combine_scores
+
+
+class TestRelatedMishnayot(unittest.TestCase):
+    """Test suite for combine_scores."""
+
+    def test_tags_only(self):
+        """Without embeddings the Jaccard is the score; ties are ordered by id."""
+        ranked = combine_scores({'ב_א': 0.5, 'א_ב': 0.5, 'ד_א': 1.0}, {}, 0.5, 2)
+        self.assertEqual(ranked, [('ד_א', 1.0), ('א_ב', 0.5)])
+
+    def test_weighted_with_embeddings(self):
+        """Cosine and Jaccard are weighted; unrelated candidates are dropped."""
+        ranked = combine_scores({'א_ב': 1.0}, {'א_ב': 0.5, 'א_ג': 0.8, 'א_ד': -0.2}, 0.25, 5)
+        self.assertEqual([candidate for candidate, _ in ranked], ['א_ב', 'א_ג'])
+        self.assertAlmostEqual(ranked[0][1], 0.25 + 0.375)
+        self.assertAlmostEqual(ranked[1][1], 0.6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+Unit tests for the semantic search engine
+
+Covers the fallback to encoding tag names when the database has no stored
+tag embeddings, with a fake model and database session, and the single-pass
+compromise mode of search_with_compromise on fixed candidate distances.
+"""
+
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from flask import Flask
+from sqlalchemy.exc import ProgrammingError
+
+from utils.semantic_search import SemanticSearchEngine
+
+
+class FakeModel:
+    """Encodes every text as the same unit vector, so every tag is a perfect match."""
+
+    def encode(self, texts, show_progress_bar=False):
+        return [[1.0, 0.0] for _ in texts]
+
+
+class TestSimilarTags(unittest.TestCase):
+    """Test suite for SemanticSearchEngine._find_similar_tags."""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.engine = SemanticSearchEngine(FakeModel())
+
+    @patch('utils.semantic_search.Tag')
+    @patch('utils.semantic_search.db')
+    def test_missing_embedding_column_falls_back(self, mock_db, mock_tag):
+        """A failing stored-embedding query is rolled back and tag names are encoded instead."""
+        mock_db.session.execute.side_effect = ProgrammingError('SELECT', {}, Exception('no column embedding'))
+        mock_tag.query.all.return_value = [SimpleNamespace(id=1, name='תורה'), SimpleNamespace(id=2, name='חכמה')]
+        with self.app.app_context():
+            self.assertEqual(self.engine._find_similar_tags([1.0, 0.0], max_tags=3), [1, 2])
+        mock_db.session.rollback.assert_called_once()
+
+    @patch('utils.semantic_search.Tag')
+    @patch('utils.semantic_search.db')
+    def test_stored_embeddings_used(self, mock_db, mock_tag):
+        """Stored tag embeddings answer without encoding any tag name."""
+        mock_db.session.execute.return_value.all.return_value = [
+            SimpleNamespace(id=3, name='ענווה', distance=0.2), SimpleNamespace(id=4, name='עבודה', distance=0.9)]
+        with self.app.app_context():
+            self.assertEqual(self.engine._find_similar_tags([1.0, 0.0]), [3])
+        mock_tag.query.all.assert_not_called()
+        mock_db.session.rollback.assert_not_called()
+
+
+
+def distance_for(similarity):
+    """Cosine distance that maps to a similarity percentage."""
+    return 0.72 - similarity * 0.22 / 100
+
+
+class TestSearchWithCompromise(unittest.TestCase):
+    """Test suite for SemanticSearchEngine.search_with_compromise."""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.engine = SemanticSearchEngine(FakeModel())
+        self.score_patcher = patch.object(self.engine, '_score_candidates')
+        self.score_candidates = self.score_patcher.start()
+        self.addCleanup(self.score_patcher.stop)
+
+    def search(self, similarities, cutoff_similarity=0):
+        """Run search_with_compromise over candidates with the given similarity percentages."""
+        candidates = [(distance_for(similarity), SimpleNamespace(id=f'א_{n}', text_raw='משנה'))
+                      for n, similarity in enumerate(similarities, start=1)]
+        self.score_candidates.return_value = (candidates, distance_for(cutoff_similarity))
+        with self.app.app_context():
+            results, info = self.engine.search_with_compromise('תורה')
+        return [mishna.id for mishna in results], info
+
+    def test_no_compromise_needed(self):
+        """Results above the initial threshold are all returned without compromise."""
+        ids, info = self.search([97, 92, 88, 86, 60])
+
+        self.assertEqual(ids, ['א_1', 'א_2', 'א_3', 'א_4'])
+        self.assertEqual(info, {'is_active': False, 'initial_threshold': 85, 'current_threshold': 85, 'attempts': 1})
+        self.score_candidates.assert_called_once()
+
+    def test_compromise_lowers_threshold(self):
+        """The threshold drops in steps to the first that finds results, capped at three."""
+        ids, info = self.search([72, 71, 71, 71, 50])
+
+        self.assertEqual(ids, ['א_1', 'א_2', 'א_3'])
+        self.assertEqual(info, {'is_active': True, 'initial_threshold': 85, 'current_threshold': 70, 'attempts': 4})
+        self.score_candidates.assert_called_once()
+
+    def test_compromise_stops_at_minimum(self):
+        """The threshold never drops below COMPROMISE_MIN_SCORE."""
+        ids, info = self.search([20])
+
+        self.assertEqual(ids, [])
+        self.assertEqual(info['current_threshold'], 30)
+        self.assertEqual(info['attempts'], 12)
+        self.assertTrue(info['is_active'])
+
+    def test_no_candidate_within_cutoff(self):
+        """Without candidates inside the cutoff the threshold is not lowered at all."""
+        ids, info = self.search([95, 90], cutoff_similarity=99)
+
+        self.assertEqual(ids, [])
+        self.assertEqual(info, {'is_active': False, 'initial_threshold': 85, 'current_threshold': 85, 'attempts': 1})
+
+    def test_empty_query(self):
+        """An empty query returns nothing without scoring candidates."""
+        with self.app.app_context():
+            self.assertEqual(self.engine.search_with_compromise('  ')[0], [])
+        self.score_candidates.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Unit tests for single-flight coalescing
+
+Covers sharing one in-flight call between concurrent threads, sharing its
+exception, and reusing a result written to the lock file by another worker.
+"""
+
+import tempfile
+import threading
+import time
+import unittest
+
+from flask import Flask
+
+from utils.single_flight import SingleFlight, coalesce
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Test suite for SingleFlight.do and coalesce."""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.lock_dir.cleanup)
+        self.app.config['SINGLE_FLIGHT_LOCK_DIR'] = self.lock_dir.name
+        context = self.app.app_context()
+        context.push()
+        self.addCleanup(context.pop)
+
+    def _run_concurrently(self, flight, key, function, callers=5):
+        outcomes = []
+
+        def caller():
+            with self.app.app_context():
+                try:
+                    outcomes.append(flight.do(key, function))
+                except Exception as e:
+                    outcomes.append(e)
+
+        threads = [threading.Thread(target=caller) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_concurrent_callers_share_one_call(self):
+        """Callers arriving while the call is in flight get its result."""
+        calls = []
+
+        def slow_call():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'results': {'1': 0.9}}
+
+        outcomes = self._run_concurrently(SingleFlight(), 'query', slow_call)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(outcomes, [{'results': {'1': 0.9}}] * 5)
+
+    def test_exception_is_shared(self):
+        """A failing call raises in every waiting caller."""
+        def failing_call():
+            time.sleep(0.2)
+            raise ValueError('boom')
+
+        outcomes = self._run_concurrently(SingleFlight(), 'query', failing_call)
+        self.assertEqual(len(outcomes), 5)
+        self.assertTrue(all(isinstance(outcome, ValueError) for outcome in outcomes))
+
+    def test_result_reused_across_workers(self):
+        """A fresh result written by another worker is reused; other keys are not."""
+        self.assertEqual(coalesce('query', lambda: [1, 2]), [1, 2])
+        self.assertEqual(coalesce('query', lambda: self.fail('called again')), [1, 2])
+        self.assertEqual(coalesce('other query', lambda: [3]), [3])
+
+        self.app.config['SINGLE_FLIGHT_SHARE_SECONDS'] = 0
+        self.assertEqual(coalesce('query', lambda: [4]), [4])
+
+
+if __name__ == '__main__':
+    unittest.main()
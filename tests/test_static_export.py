@@ -0,0 +1,125 @@
+"""
+Unit tests for the static site export
+
+Covers the pages and JSON files written by export_static_site, and that a
+later run skips unchanged pages, re-renders changed ones and removes pages
+that no longer exist.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from models import db, Mishna, Tag
+from tests.app_case import ROOT, AppTestCase
+from utils.static_export import MANIFEST_FILENAME, export_static_site
+
+
+class TestStaticExport(AppTestCase):
+    """Test suite for export_static_site."""
+
+    def flask_options(self):
+        """Serve a small static folder and a copy of the templates, so tests can edit them."""
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.output_dir = os.path.join(temp_dir.name, 'site')
+        static_dir = os.path.join(temp_dir.name, 'static')
+        os.makedirs(static_dir)
+        with open(os.path.join(static_dir, 'style.css'), 'w', encoding='utf-8') as f:
+            f.write('body {}')
+        self.template_dir = os.path.join(temp_dir.name, 'templates')
+        shutil.copytree(os.path.join(ROOT, 'templates'), self.template_dir)
+        return {'static_folder': static_dir, 'template_folder': self.template_dir}
+
+    def setUp(self):
+        """Set up three mishnayot, one of them tagged."""
+        super().setUp()
+        self.add_mishna('א', 'א', 1, 'משנה ראשונה', tags=[Tag(name='חסד')])
+        self.add_mishna('א', 'ב', 2, 'משנה שנייה')
+        self.add_mishna('ב', 'א', 3, 'משנה שלישית')
+        db.session.commit()
+
+    def path(self, *parts):
+        """Path of a file in the export."""
+        return os.path.join(self.output_dir, *parts)
+
+    def test_first_export(self):
+        """Every page is rendered with its JSON data, plus the manifest and static assets."""
+        stats = export_static_site(self.output_dir)
+
+        # Landing page, three mishnayot, two chapters and one tag
+        self.assertEqual(stats, {'rendered': 7, 'skipped': 0, 'removed': 0})
+        for page in ('', 'mishna/1', 'mishna/2', 'mishna/3', 'chapter/א', 'chapter/ב', 'tag/1'):
+            with self.subTest(page=page):
+                self.assertTrue(os.path.exists(self.path(*page.split('/'), 'index.html')))
+                self.assertTrue(os.path.exists(self.path(*page.split('/'), 'index.json')))
+        with open(self.path('mishna', '2', 'index.json'), encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['text_pretty'], 'משנה שנייה')
+        with open(self.path('mishna', '2', 'index.html'), encoding='utf-8') as f:
+            self.assertIn('משנה שנייה', f.read())
+        self.assertTrue(os.path.exists(self.path(MANIFEST_FILENAME)))
+        self.assertTrue(os.path.exists(self.path('static', 'style.css')))
+
+    def test_unchanged_pages_skipped(self):
+        """A second run over the same corpus renders nothing."""
+        export_static_site(self.output_dir)
+
+        self.assertEqual(export_static_site(self.output_dir), {'rendered': 0, 'skipped': 7, 'removed': 0})
+
+    def test_changed_and_stale_pages(self):
+        """Only pages showing a changed mishna are re-rendered, and deleted pages are removed."""
+        export_static_site(self.output_dir)
+
+        db.session.delete(db.session.get(Mishna, 'א_ב'))
+        db.session.get(Mishna, 'ב_א').text_pretty = 'משנה שלישית מתוקנת'
+        db.session.commit()
+        self.change_corpus_version()
+        stats = export_static_site(self.output_dir)
+
+        # chapter/א, mishna/3 and chapter/ב re-rendered; mishna/2 removed
+        self.assertEqual(stats, {'rendered': 3, 'skipped': 3, 'removed': 1})
+        self.assertFalse(os.path.exists(self.path('mishna', '2')))
+        with open(self.path('chapter', 'ב', 'index.html'), encoding='utf-8') as f:
+            self.assertIn('משנה שלישית מתוקנת', f.read())
+
+    def test_related_change_renders_mishna_page(self):
+        """A new related list re-renders only the page of that mishna."""
+        export_static_site(self.output_dir)
+
+        db.session.get(Mishna, 'א_א').related = [{'id': 'ב_א', 'number': 3, 'score': 0.9}]
+        db.session.commit()
+        stats = export_static_site(self.output_dir)
+
+        self.assertEqual(stats, {'rendered': 1, 'skipped': 6, 'removed': 0})
+        with open(self.path('mishna', '1', 'index.json'), encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['related'], [{'id': 'ב_א', 'number': 3, 'score': 0.9}])
+        with open(self.path('mishna', '1', 'index.html'), encoding='utf-8') as f:
+            self.assertIn('/mishna/3', f.read())
+
+    def test_full_export_renders_everything(self):
+        """full=True ignores the manifest."""
+        export_static_site(self.output_dir)
+
+        self.assertEqual(export_static_site(self.output_dir, full=True), {'rendered': 7, 'skipped': 0, 'removed': 0})
+
+    def test_missing_page_rendered_again(self):
+        """A page deleted from the output is rendered again even if unchanged."""
+        export_static_site(self.output_dir)
+        os.remove(self.path('tag', '1', 'index.html'))
+
+        self.assertEqual(export_static_site(self.output_dir), {'rendered': 1, 'skipped': 6, 'removed': 0})
+        self.assertTrue(os.path.exists(self.path('tag', '1', 'index.html')))
+
+    def test_included_template_change_renders_everything(self):
+        """Editing a template the search page includes re-renders every page."""
+        export_static_site(self.output_dir)
+        with open(os.path.join(self.template_dir, '_results.html'), 'a', encoding='utf-8') as f:
+            f.write('<!-- changed -->')
+
+        self.assertEqual(export_static_site(self.output_dir), {'rendered': 7, 'skipped': 0, 'removed': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
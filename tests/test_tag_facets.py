@@ -0,0 +1,71 @@
+"""
+Unit tests for the tag facet index
+
+Covers per-tag counts, the co-occurrence matrix and result-set facets,
+that removing a mishna reverses its additions, and tag changes applied in
+place, on an index filled without a database.
+"""
+
+import unittest
+from unittest.mock import patch
+
+from utils.corpus_index import MishnaDocument
+from utils.tag_facets import TagFacet, TagFacetIndex
+
+DOCUMENTS = [
+    MishnaDocument('א_ב', 2, 'א', 'על שלשה דברים העולם עומד', ('תורה', 'עבודה'), (1, 2)),
+    MishnaDocument('א_ג', 3, 'א', 'אל תהיו כעבדים', ('עבודה',), (2,)),
+    MishnaDocument('ד_א', 53, 'ד', 'איזהו חכם, הלומד מכל אדם', ('חכמה', 'עבודה', 'תורה'), (3, 2, 1)),
+]
+
+
+class TestTagFacetIndex(unittest.TestCase):
+    """Test suite for TagFacetIndex."""
+
+    def setUp(self):
+        patcher = patch('utils.corpus_index.get_corpus_version', return_value='v1')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.index = TagFacetIndex()
+        for document in DOCUMENTS:
+            self.index._add(document)
+        self.index._version, self.index._built = 'v1', True
+
+    def test_counts_and_cooccurrence(self):
+        """Each tag counts its mishnayot; pairs count the mishnayot carrying both."""
+        self.assertEqual(self.index.counts(), {1: 2, 2: 3, 3: 1})
+        self.assertEqual(self.index.cooccurrence(), {
+            1: {2: 2, 3: 1},
+            2: {1: 2, 3: 1},
+            3: {1: 1, 2: 1},
+        })
+
+    def test_result_facets(self):
+        """Only the results are counted, most frequent tag first."""
+        self.assertEqual(self.index.result_facets([3, 53]), [
+            TagFacet(2, 'עבודה', 2), TagFacet(3, 'חכמה', 1), TagFacet(1, 'תורה', 1),
+        ])
+        self.assertEqual(self.index.result_facets([]), [])
+
+    def test_remove_reverses_add(self):
+        """Removing a mishna drops it from counts, pairs and facets."""
+        self.index._remove('ד_א')
+        self.assertEqual(self.index.counts(), {1: 1, 2: 2})
+        self.assertEqual(self.index.cooccurrence(), {1: {2: 1}, 2: {1: 1}})
+        self.assertEqual(self.index.result_facets([53]), [])
+
+    def test_tag_changes_applied_in_place(self):
+        """Re-applying mishnayot after a tag merge moves their counts and pairs without a rebuild."""
+        # Tag 3 merged into tag 1 and tag 2 removed from mishna 3
+        self.index.update_mishnayot([
+            MishnaDocument('א_ג', 3, 'א', 'אל תהיו כעבדים', (), ()),
+            MishnaDocument('ד_א', 53, 'ד', 'איזהו חכם, הלומד מכל אדם', ('עבודה', 'תורה'), (2, 1)),
+        ], 'v1')
+        self.assertTrue(self.index._built)
+        self.assertEqual(self.index.counts(), {1: 2, 2: 2})
+        self.assertEqual(self.index.cooccurrence(), {1: {2: 2}, 2: {1: 2}})
+
+
+if __name__ == '__main__':
+    unittest.main()
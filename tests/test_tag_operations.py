@@ -0,0 +1,110 @@
+"""
+Unit tests for bulk tagging
+
+Covers the argument checks of apply_tag_changes and merge_tags, the link
+counts they return against a database, and the bulk forms of manage_content
+rejecting ids that are not numbers.
+"""
+
+import unittest
+
+from sqlalchemy import select
+
+from models import db, Tag, mishna_tag
+from tests.app_case import AppTestCase
+from utils.tag_operations import TagChangeCounts, TagRemovalCounts, apply_tag_changes, delete_tags, merge_tags
+
+
+class TestTagOperations(unittest.TestCase):
+    """Test suite for apply_tag_changes and merge_tags."""
+
+    def test_conflicting_tags(self):
+        """A tag cannot be added and removed in the same change."""
+        with self.assertRaises(ValueError):
+            apply_tag_changes(['א_א'], add_tag_ids=[1, 2], remove_tag_ids=[2])
+
+    def test_empty_change(self):
+        """Nothing to change returns zero counts without touching the database."""
+        self.assertEqual(apply_tag_changes([], add_tag_ids=[1]), TagChangeCounts(0, 0))
+        self.assertEqual(apply_tag_changes(['א_א']), TagChangeCounts(0, 0))
+
+    def test_merge_into_itself(self):
+        """A tag cannot be merged into itself, and merging nothing is a no-op."""
+        with self.assertRaises(ValueError):
+            merge_tags([1, 2], 2)
+        self.assertEqual(merge_tags([], 2), TagRemovalCounts(0, 0))
+
+
+class TestTagOperationsDatabase(AppTestCase):
+    """Test suite for the link counts of the set-based operations."""
+
+    def setUp(self):
+        """Set up three mishnayot and three tags."""
+        super().setUp()
+        db.session.add_all([Tag(name=name) for name in ('חסד', 'תורה', 'עבודה')])
+        for number, mishna in enumerate(('א', 'ב', 'ג'), start=1):
+            self.add_mishna('א', mishna, number, 'טקסט')
+        db.session.commit()
+        self.mishna_ids = ['א_א', 'א_ב', 'א_ג']
+
+    def links(self):
+        """All mishna_tag rows as (mishna id, tag id)."""
+        return sorted(db.session.execute(select(mishna_tag.c.mishna_id, mishna_tag.c.tag_id)).all())
+
+    def test_change_counts(self):
+        """Only links actually inserted and deleted are counted."""
+        self.assertEqual(apply_tag_changes(self.mishna_ids, add_tag_ids=[1, 2]), TagChangeCounts(6, 0))
+        # Existing links and unknown ids are skipped
+        self.assertEqual(apply_tag_changes(self.mishna_ids + ['ב_א'], add_tag_ids=[1, 99]), TagChangeCounts(0, 0))
+        self.assertEqual(apply_tag_changes(['א_א'], add_tag_ids=[3], remove_tag_ids=[2, 99]),
+                         TagChangeCounts(1, 1))
+        self.assertEqual(len(self.links()), 6)
+
+    def test_merge_dedupes_links(self):
+        """A mishna with the target or several sources ends up with one target link."""
+        apply_tag_changes(['א_א'], add_tag_ids=[1, 2, 3])
+        apply_tag_changes(['א_ב'], add_tag_ids=[2, 3])
+        apply_tag_changes(['א_ג'], add_tag_ids=[3])
+
+        self.assertEqual(merge_tags([2, 3], 1), TagRemovalCounts(2, 2))
+        self.assertEqual(self.links(), [('א_א', 1), ('א_ב', 1), ('א_ג', 1)])
+        self.assertEqual(db.session.execute(select(Tag.id).order_by(Tag.id)).scalars().all(), [1])
+
+    def test_merge_into_missing_tag(self):
+        """Merging into an unknown tag changes nothing."""
+        apply_tag_changes(['א_א'], add_tag_ids=[2])
+
+        with self.assertRaises(ValueError):
+            merge_tags([2], 99)
+        self.assertEqual(self.links(), [('א_א', 2)])
+
+    def test_delete_counts(self):
+        """Deleting tags counts the tags and their links."""
+        apply_tag_changes(self.mishna_ids, add_tag_ids=[1])
+        apply_tag_changes(['א_א'], add_tag_ids=[2])
+
+        self.assertEqual(delete_tags([1, 99]), TagRemovalCounts(1, 3))
+        self.assertEqual(self.links(), [('א_א', 2)])
+
+    def test_forms_reject_invalid_ids(self):
+        """Ids that are not numbers, or a missing merge target, are reported on the page."""
+        with self.client.session_transaction() as session:
+            session['access_token'] = 'test'
+
+        cases = [
+            ({'action': 'bulk_tag', 'bulk_mishna_ids': 'א_א', 'bulk_add_tags': 'חסד'}, 'מזהי הנושאים אינם תקינים.'),
+            ({'action': 'merge_tags', 'bulk_tag_ids': ['1', 'x']}, 'מזהי הנושאים אינם תקינים.'),
+            ({'action': 'merge_tags', 'bulk_tag_ids': ['1', '2']}, 'בחר נושא למיזוג אליו.'),
+        ]
+        for data, message in cases:
+            with self.subTest(data=data):
+                response = self.client.post('/manage', data=data)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(message, response.get_data(as_text=True))
+        self.assertEqual(self.links(), [])
+        self.assertEqual(db.session.execute(select(Tag.id).order_by(Tag.id)).scalars().all(), [1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
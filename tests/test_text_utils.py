@@ -0,0 +1,65 @@
+"""
+Unit tests for Hebrew text normalization
+
+Covers each step of the normalize_hebrew pipeline and that queries and
+stored texts written differently end up with the same canonical form.
+"""
+
+import unittest
+
+from utils.text_utils import normalize_hebrew, remove_niqqud
+
+MAQAF = '\u05BE'
+GERESH = '\u05F3'
+GERSHAYIM = '\u05F4'
+
+
+class TestNormalizeHebrew(unittest.TestCase):
+    """Test suite for normalize_hebrew."""
+
+    def test_removes_niqqud(self):
+        """Niqqud is dropped like remove_niqqud does."""
+        text = 'אֵיזֶהוּ חָכָם'
+        self.assertEqual(normalize_hebrew(text), normalize_hebrew(remove_niqqud(text)))
+        self.assertEqual(normalize_hebrew(text), 'אזה חכמ')
+
+    def test_folds_final_letters(self):
+        """Final letters match their regular forms."""
+        self.assertEqual(normalize_hebrew('שלום'), normalize_hebrew('שלומ'))
+        self.assertEqual(normalize_hebrew('דרך ארץ'), 'דרכ ארצ')
+
+    def test_maqaf_separates_words(self):
+        """Maqaf is treated as a space."""
+        self.assertEqual(normalize_hebrew(f'כל{MAQAF}אדם'), normalize_hebrew('כל אדם'))
+
+    def test_drops_geresh_and_quotes(self):
+        """Abbreviations match with gershayim, a double quote or nothing."""
+        self.assertEqual(normalize_hebrew(f'רשב{GERSHAYIM}ג'), 'רשבג')
+        self.assertEqual(normalize_hebrew('רשב"ג'), 'רשבג')
+        self.assertEqual(normalize_hebrew(f'ר{GERESH} יוסי'), normalize_hebrew("ר' יוסי"))
+
+    def test_punctuation_becomes_space(self):
+        """Punctuation separates words and whitespace is collapsed."""
+        self.assertEqual(normalize_hebrew('אומר,  על שלשה.דברים'), 'אמר על שלשה דברמ')
+
+    def test_ktiv_male_matches_haser(self):
+        """Vav and yod inside a word are ignored, at its start they are kept."""
+        self.assertEqual(normalize_hebrew('שלושה'), normalize_hebrew('שלשה'))
+        self.assertEqual(normalize_hebrew('איזוהי'), normalize_hebrew('איזהי'))
+        self.assertEqual(normalize_hebrew('ויהושע'), 'והשע')
+
+    def test_query_matches_stored_text(self):
+        """A normalized query is a substring of the normalized mishna it comes from."""
+        stored = normalize_hebrew('בֶּן זוֹמָא אוֹמֵר, אֵיזֶהוּ חָכָם, הַלּוֹמֵד מִכָּל אָדָם.')
+        self.assertIn(normalize_hebrew('איזהו חכם הלומד'), stored)
+        self.assertIn(normalize_hebrew(f'מכל{MAQAF}אדם'), stored)
+
+    def test_empty_text(self):
+        """Empty input gives an empty string."""
+        self.assertEqual(normalize_hebrew(''), '')
+        self.assertEqual(normalize_hebrew(None), '')
+        self.assertEqual(normalize_hebrew(' , '), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+"""
+Unit tests for the pgvector ANN indexes
+
+Covers the query-time settings applied per transaction, the CREATE INDEX
+statement for each method with the cosine operator class, and how
+recall_report compares ANN neighbours with the exact ones, with a mocked
+database session.
+"""
+
+import os
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+from utils import vector_index
+from utils.vector_index import (DEFAULT_EF_SEARCH, DEFAULT_PROBES, INDEX_METHODS, apply_search_settings,
+                                create_index, default_lists, index_name, recall_report)
+
+
+class TestSearchSettings(unittest.TestCase):
+    """Test suite for apply_search_settings."""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        patcher = patch.object(vector_index, 'db')
+        self.db = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def applied(self):
+        """The (statement, parameters) of the single set_config query."""
+        self.db.session.execute.assert_called_once()
+        statement, params = self.db.session.execute.call_args.args
+        return statement.text, params
+
+    def test_settings_are_transaction_local(self):
+        """Both settings are set with is_local, so they end with the transaction."""
+        with self.app.app_context():
+            apply_search_settings(ef_search=80, probes=5)
+
+        statement, params = self.applied()
+        self.assertEqual(statement.count(', true)'), 2)
+        self.assertEqual(params, {'ef_name': 'hnsw.ef_search', 'ef_search': '80',
+                                  'probes_name': 'ivfflat.probes', 'probes': '5'})
+
+    def test_config_values(self):
+        """Without arguments the values come from the config."""
+        self.app.config.update(VECTOR_EF_SEARCH=100, VECTOR_IVFFLAT_PROBES=20)
+        with self.app.app_context():
+            apply_search_settings()
+
+        _, params = self.applied()
+        self.assertEqual((params['ef_search'], params['probes']), ('100', '20'))
+
+    def test_defaults_match_config(self):
+        """Without config the module defaults apply, and they match the config defaults."""
+        with patch.dict(os.environ, {'DATABASE_URL': 'postgresql://localhost/test'}):
+            from config import Config
+
+        with self.app.app_context():
+            apply_search_settings()
+
+        _, params = self.applied()
+        self.assertEqual((params['ef_search'], params['probes']), (str(DEFAULT_EF_SEARCH), str(DEFAULT_PROBES)))
+        self.assertEqual((Config.VECTOR_EF_SEARCH, Config.VECTOR_IVFFLAT_PROBES), (DEFAULT_EF_SEARCH, DEFAULT_PROBES))
+
+
+class TestCreateIndex(unittest.TestCase):
+    """Test suite for create_index and default_lists."""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        patcher = patch.object(vector_index, '_autocommit_execute')
+        self.execute = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_hnsw_statement(self):
+        """HNSW is built concurrently on the cosine operator class with m and ef_construction."""
+        with self.app.app_context():
+            statement = create_index('hnsw', m=24, ef_construction=100)
+
+        self.assertEqual(statement, 'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_mishna_embedding_hnsw '
+                                    'ON mishna USING hnsw (embedding vector_cosine_ops) '
+                                    'WITH (m = 24, ef_construction = 100)')
+        self.execute.assert_called_once_with(statement)
+
+    @patch.object(vector_index, 'db')
+    def test_ivfflat_lists_from_row_count(self, mock_db):
+        """Without lists, IVFFlat gets rows / 1000 lists from the embedded row count."""
+        mock_db.session.execute.return_value.scalar.return_value = 25_000
+        with self.app.app_context():
+            statement = create_index('ivfflat', concurrently=False)
+
+        self.assertEqual(statement, 'CREATE INDEX IF NOT EXISTS idx_mishna_embedding_ivfflat '
+                                    'ON mishna USING ivfflat (embedding vector_cosine_ops) WITH (lists = 25)')
+
+    def test_replace_drops_first(self):
+        """replace drops the index of the same method before creating it."""
+        with self.app.app_context():
+            create_index('ivfflat', lists=4, replace=True)
+
+        statements = [call.args[0] for call in self.execute.call_args_list]
+        self.assertEqual(statements[0], 'DROP INDEX CONCURRENTLY IF EXISTS idx_mishna_embedding_ivfflat')
+        self.assertTrue(statements[1].startswith('CREATE INDEX'))
+
+    def test_unknown_method(self):
+        """Only the supported index methods are accepted."""
+        with self.assertRaises(ValueError):
+            create_index('btree')
+        self.execute.assert_not_called()
+
+    def test_default_lists(self):
+        """rows / 1000 (at least one) up to 1M rows, sqrt(rows) above."""
+        self.assertEqual(default_lists(500), 1)
+        self.assertEqual(default_lists(250_000), 250)
+        self.assertEqual(default_lists(4_000_000), 2000)
+
+    def test_index_names(self):
+        """Each method has its own index name."""
+        self.assertEqual([index_name(method) for method in INDEX_METHODS],
+                         ['idx_mishna_embedding_hnsw', 'idx_mishna_embedding_ivfflat'])
+
+
+class TestRecallReport(unittest.TestCase):
+    """Test suite for recall_report on fixed neighbour lists."""
+
+    EXACT = {'א_א': ['א_א', 'א_ב', 'א_ג', 'א_ד'], 'א_ב': ['א_ב', 'א_א', 'א_ג', 'א_ה']}
+
+    def setUp(self):
+        patcher = patch.object(vector_index, 'db')
+        self.db = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.db.session.execute.return_value.scalars.return_value.all.return_value = list(self.EXACT)
+
+        patcher = patch.object(vector_index, '_plan_index',
+                               side_effect=lambda mishna_id, k, settings: 'seq scan' if 'enable_indexscan' in settings
+                               else index_name('hnsw'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def neighbours(self, ann):
+        """A _timed_neighbours fake: exact lists for the exact settings, `ann` per ef_search otherwise."""
+        def timed(mishna_id, k, settings):
+            if 'enable_indexscan' in settings:
+                return self.EXACT[mishna_id], 10.0
+            return ann[settings['hnsw.ef_search']][mishna_id], 2.0
+        return patch.object(vector_index, '_timed_neighbours', side_effect=timed)
+
+    def test_recall_per_setting(self):
+        """Recall is the share of exact neighbours found, averaged over the query rows."""
+        ann = {
+            '10': {'א_א': ['א_א', 'א_ב', 'ב_א', 'ב_ב'], 'א_ב': ['א_ב', 'א_א', 'א_ג', 'ב_א']},
+            '40': self.EXACT,
+        }
+        with self.neighbours(ann):
+            report = recall_report('hnsw', [10, 40], k=4, sample=2)
+
+        self.assertEqual([row['setting'] for row in report], ['exact', 'hnsw.ef_search=10', 'hnsw.ef_search=40'])
+        self.assertEqual([row['index'] for row in report], ['seq scan', index_name('hnsw'), index_name('hnsw')])
+        # 2/4 and 3/4 of the exact neighbours at ef_search=10
+        self.assertEqual([row['recall'] for row in report], [1.0, 0.625, 1.0])
+        self.assertEqual((report[0]['p50_ms'], report[1]['mean_ms']), (10.0, 2.0))
+
+    def test_no_embeddings(self):
+        """Without embedded rows there is nothing to compare."""
+        self.db.session.execute.return_value.scalars.return_value.all.return_value = []
+
+        self.assertEqual(recall_report('ivfflat', [1, 10]), [])
+
+    def test_unknown_method(self):
+        """Only the supported index methods are accepted."""
+        with self.assertRaises(ValueError):
+            recall_report('btree', [10])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,208 @@
+"""
+Type-ahead completions for the smart search box and the tag picker.
+
+A sorted-array prefix index: every completion is stored under its
+normalized form (see normalize_hebrew), and the keys are kept in one sorted
+list, so the completions of a prefix are the contiguous run found with a
+binary search. Completions are
+
+- corpus words, weighted by their number of occurrences,
+- word pairs occurring at least MIN_PHRASE_COUNT times,
+- tag names, weighted by TAG_WEIGHT per mishna carrying the tag.
+
+Each is shown in its most frequent niqqud-free spelling. Searches served by
+this worker add to the weight of the words and pairs they contain
+(record_query), so popular queries rise to the top. Popularity survives
+rebuilds of the index, and a new worker seeds it on its first build from
+the smart searches of the last AUTOCOMPLETE_POPULARITY_DAYS in the query log
+(see utils/query_log.py), so it survives restarts too.
+
+Like the other corpus indexes it is built once per corpus version and
+updated in place when a mishna is saved, so a lookup does not touch the
+database.
+"""
+import heapq
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from flask import current_app
+
+from utils.corpus_index import CorpusIndex, MishnaDocument
+from utils.query_language import is_structured_query
+from utils.query_log import read_query_log
+from utils.text_utils import normalize_hebrew, normalized_tokens
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+MAX_PREFIX_LENGTH = 50
+
+# Word pairs occurring less often are not offered as completions
+MIN_PHRASE_COUNT = 2
+
+# Weight of a tag per mishna carrying it, relative to one word occurrence
+TAG_WEIGHT = 3
+
+# Weight of one recorded search for a word or pair
+POPULARITY_WEIGHT = 2
+
+# Popular words and pairs remembered; the least popular half is dropped beyond this
+MAX_POPULAR_KEYS = 5000
+
+# Days of the query log a new worker seeds popularity from
+DEFAULT_POPULARITY_DAYS = 30
+
+KINDS = ('word', 'phrase', 'tag')
+
+
+class Completion(NamedTuple):
+    """A completion of a typed prefix; tag_id is set for tags."""
+    text: str
+    kind: str
+    tag_id: Optional[int] = None
+
+
+class AutocompleteIndex(CorpusIndex):
+    """Sorted prefix index of corpus words, common word pairs and tag names."""
+
+    name = 'autocomplete'
+
+    def __init__(self):
+        super().__init__()
+        self._popularity: Counter = Counter()
+        self._popularity_seeded = False
+        self._reset()
+
+    def _reset(self) -> None:
+        # (kind, normalized key) -> occurrences / spellings as written
+        self._counts: Counter = Counter()
+        self._surfaces: Dict[Tuple[str, str], Counter] = {}
+        self._tag_ids: Dict[str, int] = {}
+        # mishna id -> the (kind, key, surface) entries it contributed
+        self._documents: Dict[str, List[Tuple[str, str, str]]] = {}
+        # sorted (key, kind) pairs offered as completions
+        self._keys: List[Tuple[str, str]] = []
+
+    def _add(self, document: MishnaDocument) -> None:
+        text_raw = document.text_raw
+        tokens = normalized_tokens(text_raw)
+        entries = [('word', word, text_raw[start:end]) for word, start, end in tokens]
+        entries += [('phrase', f'{first[0]} {second[0]}', text_raw[first[1]:second[2]])
+                    for first, second in zip(tokens, tokens[1:])]
+        for tag_id, name in zip(document.tag_ids, document.tags):
+            key = normalize_hebrew(name)
+            self._tag_ids[key] = tag_id
+            entries.append(('tag', key, name))
+
+        self._documents[document.id] = entries
+        for kind, key, surface in entries:
+            self._counts[kind, key] += 1
+            self._surfaces.setdefault((kind, key), Counter())[surface] += 1
+
+    def _remove(self, mishna_id: str) -> None:
+        for kind, key, surface in self._documents.pop(mishna_id, []):
+            self._counts[kind, key] -= 1
+            surfaces = self._surfaces[kind, key]
+            surfaces[surface] -= 1
+            if surfaces[surface] <= 0:
+                del surfaces[surface]
+            if self._counts[kind, key] <= 0:
+                del self._counts[kind, key], self._surfaces[kind, key]
+                if kind == 'tag':
+                    self._tag_ids.pop(key, None)
+
+    def _finish(self) -> None:
+        self._keys = sorted((key, kind) for kind, key in self._counts
+                            if kind != 'phrase' or self._counts[kind, key] >= MIN_PHRASE_COUNT)
+
+    def _weight(self, key: str, kind: str) -> int:
+        count = self._counts[kind, key]
+        if kind == 'tag':
+            return count * TAG_WEIGHT
+        return count + POPULARITY_WEIGHT * self._popularity[key]
+
+    def _complete(self, prefix: str, kinds: Tuple[str, ...], limit: int) -> List[Tuple[str, str]]:
+        """The heaviest (key, kind) pairs starting with a normalized prefix. Caller holds the lock."""
+        candidates = []
+        for position in range(bisect_left(self._keys, (prefix, '')), len(self._keys)):
+            key, kind = self._keys[position]
+            if not key.startswith(prefix):
+                break
+            if kind in kinds:
+                candidates.append((key, kind))
+        return heapq.nlargest(limit, candidates, key=lambda item: (self._weight(*item), -len(item[0])))
+
+    def _completion(self, key: str, kind: str, head: str = '') -> Completion:
+        surface = self._surfaces[kind, key].most_common(1)[0][0]
+        return Completion(head + surface, kind, self._tag_ids.get(key) if kind == 'tag' else None)
+
+    def complete(self, text: str, kinds: Tuple[str, ...] = KINDS, limit: int = DEFAULT_LIMIT) -> List[Completion]:
+        """
+        Complete the text typed so far.
+
+        A single word is completed against words, pairs and tags. When
+        several words were typed, pairs and tags starting with the whole
+        text come first, followed by completions of the last word appended
+        to the words before it as typed.
+
+        Args:
+            text: Text typed so far, with or without niqqud
+            kinds: Kinds of completions wanted ('word', 'phrase', 'tag')
+            limit: Maximum number of completions
+
+        Returns:
+            Completions ordered by weight, heaviest first
+        """
+        prefix = normalize_hebrew(text[:MAX_PREFIX_LENGTH]).strip()
+        if not prefix:
+            return []
+
+        with self._lock:
+            self._ensure_current()
+            completions = [self._completion(key, kind) for key, kind in self._complete(prefix, kinds, limit)]
+            if ' ' in prefix and 'word' in kinds and len(completions) < limit:
+                head = text[:text.rstrip().rfind(' ') + 1]
+                last_word = prefix.rsplit(' ', 1)[1]
+                completions += [self._completion(key, kind, head)
+                                for key, kind in self._complete(last_word, ('word',), limit - len(completions))]
+        return completions
+
+    def _ensure_current(self) -> None:
+        if not self._popularity_seeded:
+            self._popularity_seeded = True
+            self._seed_popularity()
+        super()._ensure_current()
+
+    def _seed_popularity(self) -> None:
+        """Count the recent successful smart searches of the query log. Caller holds the lock."""
+        days = current_app.config.get('AUTOCOMPLETE_POPULARITY_DAYS', DEFAULT_POPULARITY_DAYS)
+        if days <= 0:
+            return
+        seeded = 0
+        try:
+            for record in read_query_log(since=time.time() - days * 86400):
+                query_text = record.params.get('search_query', '')
+                if (record.action == 'search_smart' and record.results and not record.error
+                        and query_text and not is_structured_query(query_text)):
+                    self._count_query(query_text)
+                    seeded += 1
+        except OSError as e:
+            current_app.logger.warning(f'Could not read the query log for autocomplete popularity: {str(e)}')
+        current_app.logger.info(f'Seeded autocomplete popularity from {seeded} logged searches')
+
+    def _count_query(self, query_text: str) -> None:
+        """Add a search to the popularity counts. Caller holds the lock."""
+        words = [word for word, _, _ in normalized_tokens(query_text or '')]
+        self._popularity.update(words)
+        self._popularity.update(f'{first} {second}' for first, second in zip(words, words[1:]))
+        if len(self._popularity) > MAX_POPULAR_KEYS:
+            self._popularity = Counter(dict(self._popularity.most_common(MAX_POPULAR_KEYS // 2)))
+
+    def record_query(self, query_text: str) -> None:
+        """Count a search towards the popularity of its words and word pairs."""
+        with self._lock:
+            self._count_query(query_text)
+
+
+autocomplete_index = AutocompleteIndex()
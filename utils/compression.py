@@ -0,0 +1,139 @@
+"""
+Response compression for Flask.
+
+Negotiates brotli or gzip from the Accept-Encoding header and compresses
+text responses above a minimum size. Routes that render deterministic pages
+(the landing page, chapter listings) can opt in to caching of the compressed
+bytes with cache_compressed(); those are kept in an LRU keyed by the page,
+the corpus version and the encoding, so identical output is not recompressed
+on every request.
+"""
+import gzip
+import hashlib
+
+from flask import current_app, g, request
+from sqlalchemy.exc import SQLAlchemyError
+
+from utils.corpus_version import get_corpus_version
+from utils.lru_cache import LRUCache
+
+try:
+    import brotli
+except ImportError:  # brotli is optional - fall back to gzip only
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/csv',
+    'application/json',
+    'application/javascript',
+    'application/x-ndjson',
+    'image/svg+xml',
+}
+
+# Compressed bodies of deterministic pages: (cache_key, corpus_version, encoding) -> (digest, bytes)
+compressed_cache = LRUCache(max_entries=64)
+
+
+def init_compression(app):
+    """Register the compression hook on the application."""
+    compressed_cache.max_entries = app.config.get('COMPRESSION_CACHE_SIZE', 64)
+    app.after_request(compress_response)
+    return app
+
+
+def cache_compressed(cache_key):
+    """
+    Mark the current response as deterministic so its compressed body is cached.
+
+    Args:
+        cache_key: Identifies the page (e.g. 'index' or 'chapter:א'); the corpus
+                   version and encoding are added automatically
+    """
+    g.compression_cache_key = cache_key
+
+
+def available_encodings():
+    """Return the supported encodings in order of preference."""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def negotiate_encoding():
+    """Pick the best encoding the client accepts, or None for identity."""
+    return request.accept_encodings.best_match(available_encodings())
+
+
+def compress_bytes(data, encoding):
+    """Compress data with the given encoding ('br' or 'gzip')."""
+    if encoding == 'br':
+        quality = current_app.config.get('COMPRESSION_BROTLI_QUALITY', 5)
+        return brotli.compress(data, quality=quality)
+    level = current_app.config.get('COMPRESSION_LEVEL', 6)
+    # mtime=0 keeps the output byte-identical for identical input
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def compress_response(response):
+    """after_request hook compressing eligible responses."""
+    if not current_app.config.get('COMPRESSION_ENABLED', True):
+        return response
+
+    if (response.direct_passthrough or response.is_streamed
+            or not 200 <= response.status_code < 300 or response.status_code == 204
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    body = response.get_data()
+    if len(body) < current_app.config.get('COMPRESSION_MIN_SIZE', 500):
+        return response
+
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    cache_key = g.get('compression_cache_key')
+    if cache_key is not None:
+        compressed = _cached_compress(cache_key, body, encoding)
+    else:
+        compressed = compress_bytes(body, encoding)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+
+    # Different encodings are different representations, so they need distinct ETags
+    etag, is_weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak=is_weak)
+
+    return response
+
+
+def _cached_compress(cache_key, body, encoding):
+    """
+    Compress body, reusing previously compressed bytes for the same page.
+
+    The digest of the uncompressed body is stored with the entry, so a page
+    that turns out not to be deterministic is simply recompressed instead of
+    serving stale bytes.
+    """
+    try:
+        version = get_corpus_version()
+    except SQLAlchemyError as e:
+        current_app.logger.warning(f'Could not read corpus version for compression cache: {str(e)}')
+        return compress_bytes(body, encoding)
+
+    key = (cache_key, version, encoding)
+    digest = hashlib.blake2b(body, digest_size=16).digest()
+
+    entry = compressed_cache.get(key)
+    if entry is not None and entry[0] == digest:
+        return entry[1]
+
+    compressed = compress_bytes(body, encoding)
+    compressed_cache.set(key, (digest, compressed))
+    return compressed
@@ -0,0 +1,98 @@
+"""
+Compact corpus bundle for client-side search.
+
+The whole corpus is small enough to ship to the browser in one request.
+The bundle is built from the models in a single pass, serialized as compact
+JSON, gzipped once and addressed by a hash of its content, so it can be
+cached forever by browsers and CDNs. It is rebuilt only when the corpus
+version changes.
+
+Bundle layout (arrays instead of objects to keep it small):
+    {
+        "version": "<corpus version>",
+        "categories": [[id, name, color], ...],
+        "tags": [[id, name, category_id or null], ...],
+        "fields": ["number", "chapter", "mishna", "text_pretty", "text_raw", "tag_ids"],
+        "mishnayot": [[number, chapter, mishna, text_pretty, text_raw, [tag_id, ...]], ...]
+    }
+"""
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass
+from threading import Lock
+from typing import Optional
+
+from flask import current_app
+from sqlalchemy.orm import selectinload
+
+from models import Mishna, Tag, Category
+from utils.corpus_version import get_corpus_version
+
+MISHNA_FIELDS = ['number', 'chapter', 'mishna', 'text_pretty', 'text_raw', 'tag_ids']
+
+
+@dataclass(frozen=True)
+class CorpusBundle:
+    """A built bundle: its version, content hash and gzipped JSON body."""
+    version: str
+    content_hash: str
+    gzipped: bytes
+    size: int
+
+    @property
+    def filename(self) -> str:
+        return f'corpus.{self.content_hash}.json'
+
+
+_bundle: Optional[CorpusBundle] = None
+_bundle_lock = Lock()
+
+
+def get_corpus_bundle() -> CorpusBundle:
+    """Return the bundle for the current corpus version, building it if needed."""
+    global _bundle
+    version = get_corpus_version()
+    if _bundle is not None and _bundle.version == version:
+        return _bundle
+
+    with _bundle_lock:
+        if _bundle is None or _bundle.version != version:
+            _bundle = build_corpus_bundle(version)
+    return _bundle
+
+
+def build_corpus_bundle(version: str) -> CorpusBundle:
+    """
+    Build the bundle from the models.
+
+    Args:
+        version: Corpus version recorded in the bundle
+
+    Returns:
+        CorpusBundle with the gzipped compact JSON body
+    """
+    categories = Category.query.order_by(Category.id).all()
+    tags = Tag.query.order_by(Tag.id).all()
+    mishnayot = Mishna.query.options(selectinload(Mishna.tags)).order_by(Mishna.number).all()
+
+    payload = {
+        'version': version,
+        'categories': [[c.id, c.name, c.color] for c in categories],
+        'tags': [[t.id, t.name, t.category_id] for t in tags],
+        'fields': MISHNA_FIELDS,
+        'mishnayot': [
+            [m.number, m.chapter, m.mishna, m.text_pretty, m.text_raw, sorted(t.id for t in m.tags)]
+            for m in mishnayot
+        ],
+    }
+
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    content_hash = hashlib.sha256(body).hexdigest()[:16]
+    gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+
+    current_app.logger.info(
+        f'Built corpus bundle {content_hash}: {len(mishnayot)} mishnayot, '
+        f'{len(body)} bytes ({len(gzipped)} gzipped)'
+    )
+    return CorpusBundle(version=version, content_hash=content_hash, gzipped=gzipped, size=len(body))
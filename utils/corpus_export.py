@@ -0,0 +1,133 @@
+"""
+Streaming export of the corpus with tags and categories.
+
+Mishnayot are read with a server-side cursor in batches of EXPORT_BATCH_SIZE
+rows and serialized batch by batch, so memory stays flat whatever the size
+of the corpus. Each mishna's tags and their categories are aggregated by the
+same query, so one export is a consistent snapshot.
+
+Formats:
+
+- ndjson: one JSON object per mishna and line:
+      {"id": "א_א", "number": 1, ..., "tags": [{"id": 3, "name": "תורה", "category": "לימוד"}]}
+- csv: one row per mishna; tags and their categories are joined with "|"
+  in the same order. Starts with a UTF-8 BOM so spreadsheets detect the
+  encoding of the Hebrew text.
+- columnar: column-oriented row groups, in the spirit of Parquet but plain
+  JSON so it needs no extra dependency and can be streamed. The first line
+  describes the columns, every further line holds one batch:
+      {"format": "columnar", "version": "...", "fields": ["id", "number", ...]}
+      {"count": 500, "columns": {"id": [...], "number": [...], "tags": [[...], ...]}}
+"""
+import codecs
+import csv
+import io
+import json
+from typing import Dict, Iterator, List, Optional
+
+from flask import current_app
+from sqlalchemy import text
+
+from models import db
+from utils.corpus_version import get_corpus_version
+
+DEFAULT_BATCH_SIZE = 500
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+    'columnar': ('application/x-ndjson', 'columnar.ndjson'),
+}
+
+MISHNA_FIELDS = ['id', 'number', 'chapter', 'mishna', 'text_pretty', 'text_raw', 'interpretation']
+CSV_FIELDS = MISHNA_FIELDS + ['tags', 'categories']
+COLUMNAR_FIELDS = MISHNA_FIELDS + ['tag_ids', 'tags', 'categories']
+
+_EXPORT_SQL = text('''
+    SELECT m.id, m.number, m.chapter, m.mishna, m.text_pretty, m.text_raw, m.interpretation,
+           coalesce(array_agg(t.id ORDER BY t.id) FILTER (WHERE t.id IS NOT NULL), '{}') AS tag_ids,
+           coalesce(array_agg(t.name ORDER BY t.id) FILTER (WHERE t.id IS NOT NULL), '{}') AS tags,
+           coalesce(array_agg(c.name ORDER BY t.id) FILTER (WHERE t.id IS NOT NULL), '{}') AS categories
+    FROM mishna m
+    LEFT JOIN mishna_tag mt ON mt.mishna_id = m.id
+    LEFT JOIN tag t ON t.id = mt.tag_id
+    LEFT JOIN categories c ON c.id = t.category_id
+    GROUP BY m.id
+    ORDER BY m.number
+''')
+
+
+def _batches(batch_size: int) -> Iterator[List]:
+    """Rows of the export query, batch_size at a time, from a server-side cursor."""
+    result = db.session.execute(_EXPORT_SQL.execution_options(yield_per=batch_size))
+    try:
+        yield from result.partitions(batch_size)
+    finally:
+        result.close()
+        db.session.rollback()
+
+
+def _ndjson(batch: List) -> str:
+    lines = []
+    for row in batch:
+        record = {field: getattr(row, field) for field in MISHNA_FIELDS}
+        record['tags'] = [{'id': tag_id, 'name': name, 'category': category}
+                          for tag_id, name, category in zip(row.tag_ids, row.tags, row.categories)]
+        lines.append(json.dumps(record, ensure_ascii=False))
+    return '\n'.join(lines) + '\n'
+
+
+def _csv(batch: List) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in batch:
+        writer.writerow([getattr(row, field) for field in MISHNA_FIELDS] +
+                        ['|'.join(row.tags), '|'.join(category or '' for category in row.categories)])
+    return buffer.getvalue()
+
+
+def _columnar(batch: List) -> str:
+    columns: Dict[str, list] = {field: [getattr(row, field) for row in batch] for field in COLUMNAR_FIELDS}
+    return json.dumps({'count': len(batch), 'columns': columns}, ensure_ascii=False) + '\n'
+
+
+def stream_export(export_format: str, batch_size: Optional[int] = None) -> Iterator[str]:
+    """
+    Serialize the corpus in the given format, one chunk per batch.
+
+    Must be consumed inside an application context; for HTTP responses wrap
+    it in stream_with_context.
+
+    Args:
+        export_format: 'ndjson', 'csv' or 'columnar'
+        batch_size: Rows fetched and serialized per chunk,
+                    EXPORT_BATCH_SIZE from the config if None
+
+    Yields:
+        Text chunks of the export
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'Unknown export format: {export_format}')
+    batch_size = batch_size or current_app.config.get('EXPORT_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    return _stream(export_format, batch_size)
+
+
+def _stream(export_format: str, batch_size: int) -> Iterator[str]:
+    if export_format == 'csv':
+        header = io.StringIO()
+        csv.writer(header).writerow(CSV_FIELDS)
+        yield codecs.BOM_UTF8.decode('utf-8') + header.getvalue()
+    elif export_format == 'columnar':
+        yield json.dumps({'format': 'columnar', 'version': get_corpus_version(), 'fields': COLUMNAR_FIELDS},
+                         ensure_ascii=False) + '\n'
+
+    serialize = {'ndjson': _ndjson, 'csv': _csv, 'columnar': _columnar}[export_format]
+    exported = 0
+    for batch in _batches(batch_size):
+        exported += len(batch)
+        yield serialize(batch)
+    current_app.logger.info(f'Exported {exported} mishnayot as {export_format}')
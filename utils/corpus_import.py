@@ -0,0 +1,224 @@
+"""
+Bulk import of mishnayot from the raw source text.
+
+The raw text has one block per mishna, separated by blank lines. A block
+starts with a header ending at the first colon, followed by the vocalized
+text:
+
+    פרק א משנה א: מֹשֶׁה קִבֵּל תּוֹרָה מִסִּינַי...
+
+The file is parsed line by line, so its size does not matter. Chapter and
+mishna come from "פרק" / "משנה" in the header when present; otherwise the
+mishna label continues from the previous block, and number counts blocks
+from 1. text_raw, text_normalized and text_offsets are derived from the text
+exactly as manage_content does.
+
+import_mishnayot() compares the parsed rows with the database and upserts
+only added and changed rows, with multi-row INSERT ... ON CONFLICT (id) DO
+UPDATE statements in a single transaction. Running it twice on the same
+input changes nothing. Mishnayot missing from the input are reported, and
+deleted only when pruning.
+"""
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from flask import current_app
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from models import db, Mishna, mishna_tag
+from utils.text_utils import QUOTE_MARKS, niqqud_offsets, normalize_hebrew, remove_niqqud
+
+# Rows per INSERT statement
+INSERT_CHUNK_SIZE = 500
+
+HEBREW_NUMERALS = [
+    (400, 'ת'), (300, 'ש'), (200, 'ר'), (100, 'ק'), (90, 'צ'), (80, 'פ'), (70, 'ע'), (60, 'ס'),
+    (50, 'נ'), (40, 'מ'), (30, 'ל'), (20, 'כ'), (10, 'י'), (9, 'ט'), (8, 'ח'), (7, 'ז'), (6, 'ו'),
+    (5, 'ה'), (4, 'ד'), (3, 'ג'), (2, 'ב'), (1, 'א'),
+]
+_NUMERAL_VALUES = {letter: value for value, letter in HEBREW_NUMERALS}
+_NUMERAL_VALUES.update({'ך': 20, 'ם': 40, 'ן': 50, 'ף': 80, 'ץ': 90})
+
+_HEADER_FIELD = re.compile(r'(פרק|משנה)\s+([א-ת]+)')
+
+# Columns compared to decide whether a row changed
+COMPARED_FIELDS = ('chapter', 'mishna', 'number', 'text_pretty')
+
+
+class ParsedMishna(NamedTuple):
+    """One mishna read from the raw text."""
+    id: str
+    chapter: str
+    mishna: str
+    number: int
+    text_pretty: str
+
+
+class ImportReport(NamedTuple):
+    """Row-level outcome of an import, by mishna id."""
+    added: List[str]
+    changed: Dict[str, List[str]]  # id -> names of the fields that changed
+    unchanged: int
+    missing: List[str]  # in the database but not in the input; deleted only when pruning
+
+
+def hebrew_numeral(value: int) -> str:
+    """Write a positive number as a Hebrew numeral label (15 -> טו, 16 -> טז)."""
+    letters = []
+    for numeral_value, letter in HEBREW_NUMERALS:
+        while value >= numeral_value:
+            # 15 and 16 are written 9+6 and 9+7
+            if numeral_value == 10 and value in (15, 16):
+                break
+            letters.append(letter)
+            value -= numeral_value
+    return ''.join(letters)
+
+
+def parse_hebrew_numeral(label: str) -> Optional[int]:
+    """Value of a Hebrew numeral label, ignoring geresh and gershayim; None if it is not one."""
+    letters = [char for char in label if char not in QUOTE_MARKS]
+    if not letters or any(char not in _NUMERAL_VALUES for char in letters):
+        return None
+    return sum(_NUMERAL_VALUES[char] for char in letters)
+
+
+def _blocks(lines: Iterable[str]) -> Iterator[str]:
+    """Group lines into blank-line separated blocks."""
+    block = []
+    for line in lines:
+        if line.strip():
+            block.append(line.strip())
+        elif block:
+            yield '\n'.join(block)
+            block = []
+    if block:
+        yield '\n'.join(block)
+
+
+def parse_raw_text(lines: Iterable[str]) -> Iterator[ParsedMishna]:
+    """
+    Parse the raw source text into mishnayot, one block at a time.
+
+    Args:
+        lines: Lines of the raw text, e.g. an open file
+
+    Yields:
+        ParsedMishna for every non-empty block, in order
+    """
+    chapter, mishna_value, number = 1, 0, 0
+    for block in _blocks(lines):
+        header, separator, body = block.partition(':')
+        # No header: the only colon is the one ending the mishna
+        if not separator or (not body.strip() and not _HEADER_FIELD.search(header)):
+            header, body = '', block
+        body = body.strip()
+        if not body:
+            continue
+
+        fields = {name: parse_hebrew_numeral(label) for name, label in _HEADER_FIELD.findall(header)}
+        if fields.get('פרק') and fields['פרק'] != chapter:
+            chapter, mishna_value = fields['פרק'], 0
+        mishna_value = fields.get('משנה') or mishna_value + 1
+        number += 1
+
+        chapter_label, mishna_label = hebrew_numeral(chapter), hebrew_numeral(mishna_value)
+        yield ParsedMishna(f'{chapter_label}_{mishna_label}', chapter_label, mishna_label, number, body)
+
+
+def _row(parsed: ParsedMishna) -> dict:
+    text_raw = remove_niqqud(parsed.text_pretty)
+    return {
+        'id': parsed.id,
+        'chapter': parsed.chapter,
+        'mishna': parsed.mishna,
+        'number': parsed.number,
+        'text_pretty': parsed.text_pretty,
+        'text_raw': text_raw,
+        'text_normalized': normalize_hebrew(text_raw),
+        'text_offsets': niqqud_offsets(parsed.text_pretty),
+        'interpretation': '',
+    }
+
+
+def import_mishnayot(lines: Iterable[str], dry_run: bool = False, prune: bool = False) -> ImportReport:
+    """
+    Upsert the mishnayot of a raw text into the database.
+
+    Must be called inside an application context. Everything is written in
+    one transaction; on a database error nothing is written and the error is
+    raised.
+
+    Args:
+        lines: Lines of the raw text
+        dry_run: Only compute the report
+        prune: Delete mishnayot that are not in the input, with their tag links
+
+    Returns:
+        ImportReport of added, changed, unchanged and missing rows
+
+    Raises:
+        ValueError: If the input yields the same mishna id twice, or assigns
+                    the number of a mishna it does not contain (without prune)
+    """
+    existing = {row.id: row for row in db.session.execute(
+        select(Mishna.id, *(getattr(Mishna, field) for field in COMPARED_FIELDS)))}
+
+    added, changed, unchanged, seen = [], {}, 0, set()
+    pending = []
+    for parsed in parse_raw_text(lines):
+        if parsed.id in seen:
+            raise ValueError(f'Mishna {parsed.id} appears twice in the input (number {parsed.number})')
+        seen.add(parsed.id)
+
+        current = existing.get(parsed.id)
+        if current is None:
+            added.append(parsed.id)
+        else:
+            differences = [field for field in COMPARED_FIELDS if getattr(current, field) != getattr(parsed, field)]
+            if not differences:
+                unchanged += 1
+                continue
+            changed[parsed.id] = differences
+        pending.append(_row(parsed))
+
+    report = ImportReport(added, changed, unchanged, sorted(set(existing) - seen))
+    if not prune:
+        input_numbers = {row['number'] for row in pending}
+        taken = [mishna_id for mishna_id in report.missing if existing[mishna_id].number in input_numbers]
+        if taken:
+            raise ValueError(f'Numbers of {", ".join(taken)} are assigned to other mishnayot in the input; '
+                             f'add them to the input or prune them')
+    if dry_run or not (pending or (prune and report.missing)):
+        db.session.rollback()
+        return report
+
+    try:
+        if prune and report.missing:
+            db.session.execute(delete(mishna_tag).where(mishna_tag.c.mishna_id.in_(report.missing)))
+            db.session.execute(delete(Mishna).where(Mishna.id.in_(report.missing)))
+
+        # number is unique: park renumbered rows on negative numbers so they can swap
+        renumbered = [mishna_id for mishna_id, fields in changed.items() if 'number' in fields]
+        if renumbered:
+            db.session.execute(update(Mishna).where(Mishna.id.in_(renumbered)).values(number=-Mishna.number))
+
+        table = Mishna.__table__
+        for start in range(0, len(pending), INSERT_CHUNK_SIZE):
+            statement = insert(table).values(pending[start:start + INSERT_CHUNK_SIZE])
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.id],
+                # interpretation is edited separately and kept on update
+                set_={column: statement.excluded[column] for column in
+                      ('chapter', 'mishna', 'number', 'text_pretty', 'text_raw', 'text_normalized', 'text_offsets')}
+            )
+            db.session.execute(statement)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    current_app.logger.info(f'Imported mishnayot: {len(added)} added, {len(changed)} changed, '
+                            f'{unchanged} unchanged, {len(report.missing)} missing from input')
+    return report
@@ -0,0 +1,114 @@
+"""
+In-process indexes over the mishna texts.
+
+Search indexes (fuzzy vocabulary, lexical postings, tag facets, ...) are
+built in each worker from the mishna table and kept in step with the corpus
+version: an index built for an older version is rebuilt on its next use, and
+mishnayot changed through manage_content (a saved mishna, bulk tagging, tag
+merges and deletes) are applied in place with refresh_search_indexes() so
+the writing worker does not have to rebuild at all - provided the index was
+current right before the write. Otherwise it missed other changes and is
+rebuilt instead.
+"""
+from threading import Lock
+from typing import Iterable, List, NamedTuple, Tuple
+
+from flask import current_app
+from sqlalchemy.orm import selectinload
+
+from models import Mishna
+from utils.corpus_version import get_corpus_version
+
+_registry: List['CorpusIndex'] = []
+
+
+class MishnaDocument(NamedTuple):
+    """The fields of a mishna that search indexes are built from."""
+    id: str
+    number: int
+    chapter: str
+    text_raw: str
+    tags: Tuple[str, ...]
+    tag_ids: Tuple[int, ...] = ()
+
+    @classmethod
+    def from_mishna(cls, mishna: Mishna) -> 'MishnaDocument':
+        return cls(mishna.id, mishna.number, mishna.chapter, mishna.text_raw,
+                   tuple(tag.name for tag in mishna.tags), tuple(tag.id for tag in mishna.tags))
+
+
+class CorpusIndex:
+    """
+    Base class for an index built from MishnaDocument records.
+
+    Subclasses implement _reset, _add and _remove, and may override _finish
+    to recompute statistics after documents were added or removed. Their
+    query methods hold self._lock and call self._ensure_current() first.
+    """
+
+    name = 'corpus'
+
+    def __init__(self):
+        self._version = None
+        self._built = False
+        self._lock = Lock()
+        _registry.append(self)
+
+    def _reset(self) -> None:
+        raise NotImplementedError
+
+    def _add(self, document: MishnaDocument) -> None:
+        raise NotImplementedError
+
+    def _remove(self, mishna_id: str) -> None:
+        raise NotImplementedError
+
+    def _finish(self) -> None:
+        pass
+
+    def _ensure_current(self) -> None:
+        """Rebuild the index if it was built for another corpus version. Caller holds the lock."""
+        version = get_corpus_version()
+        if self._built and self._version == version:
+            return
+
+        self._reset()
+        mishnayot = Mishna.query.options(selectinload(Mishna.tags)).all()
+        for mishna in mishnayot:
+            self._add(MishnaDocument.from_mishna(mishna))
+        self._finish()
+        self._version, self._built = version, True
+        current_app.logger.info(f'Built {self.name} index from {len(mishnayot)} mishnayot')
+
+    def update_mishnayot(self, documents: List[MishnaDocument], previous_version: str) -> None:
+        """
+        Replace the entries of changed mishnayot, e.g. after a save or a tag change.
+
+        Call after the write was committed and the corpus version bumped.
+        Does nothing if the index was never built; it is then built on first
+        use. If it was built for another version than previous_version, other
+        changes were made since and never applied here, so it is marked for
+        a rebuild instead.
+
+        Args:
+            documents: The changed mishnayot, as stored now
+            previous_version: Corpus version right before the write (fresh_corpus_version())
+        """
+        with self._lock:
+            if not self._built:
+                return
+            if self._version != previous_version:
+                self._built = False
+                return
+            for document in documents:
+                self._remove(document.id)
+                self._add(document)
+            self._finish()
+            self._version = get_corpus_version()
+
+
+def refresh_search_indexes(mishnayot: Iterable[Mishna], previous_version: str) -> None:
+    """Apply changed mishnayot to every search index of this worker, see CorpusIndex.update_mishnayot."""
+    documents = [MishnaDocument.from_mishna(mishna) for mishna in mishnayot]
+    for index in _registry:
+        index.update_mishnayot(documents, previous_version)
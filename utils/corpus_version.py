@@ -0,0 +1,110 @@
+"""
+Corpus version tracking.
+
+The corpus (mishnayot, tags, categories and the mishna_tag associations)
+changes rarely, so anything derived from it - compressed pages, ETags,
+rendered fragments, in-memory indexes - can be cached and keyed by a short
+fingerprint of its contents.
+
+The fingerprint is computed in the database with a single aggregate query
+and cached in-process for CORPUS_VERSION_TTL seconds. Writes made through
+manage_content call bump_corpus_version() so the writing worker sees the new
+version immediately; other workers pick it up once their TTL expires.
+"""
+from threading import Lock
+from time import time
+from typing import Optional
+
+from flask import current_app
+from sqlalchemy import text
+
+from models import db
+
+# Default number of seconds a computed version is trusted before re-checking
+DEFAULT_TTL_SECONDS = 30
+
+_FINGERPRINT_SQL = text('''
+    SELECT md5(
+        coalesce((SELECT string_agg(id || ':' || number || ':' || md5(text_pretty) || ':' ||
+                                    md5(coalesce(related::text, '')), ',' ORDER BY id)
+                  FROM mishna), '') || '|' ||
+        coalesce((SELECT string_agg(mishna_id || ':' || tag_id, ',' ORDER BY mishna_id, tag_id)
+                  FROM mishna_tag), '') || '|' ||
+        coalesce((SELECT string_agg(id || ':' || name || ':' || coalesce(category_id::text, ''), ',' ORDER BY id)
+                  FROM tag), '') || '|' ||
+        coalesce((SELECT string_agg(id || ':' || name || ':' || color, ',' ORDER BY id)
+                  FROM categories), '')
+    ) AS fingerprint
+''')
+
+
+class CorpusVersion:
+    """Caches the corpus fingerprint and recomputes it when the TTL expires."""
+
+    def __init__(self):
+        self._version = None
+        self._expires_at = 0.0
+        self._lock = Lock()
+
+    def get(self) -> str:
+        """
+        Return the current corpus version, computing it if the cached one expired.
+
+        Returns:
+            A 16 character hex fingerprint of the corpus contents
+        """
+        version = self.peek()
+        if version is not None:
+            return version
+
+        with self._lock:
+            version = self.peek()
+            if version is None:
+                version = self._compute()
+                ttl = current_app.config.get('CORPUS_VERSION_TTL', DEFAULT_TTL_SECONDS)
+                self._version = version
+                self._expires_at = time() + ttl
+        return version
+
+    def peek(self) -> Optional[str]:
+        """Return the cached version without touching the database, or None if it expired."""
+        if self._version is not None and time() < self._expires_at:
+            return self._version
+        return None
+
+    def invalidate(self) -> None:
+        """Forget the cached version so the next get() recomputes it."""
+        with self._lock:
+            self._version = None
+            self._expires_at = 0.0
+
+    def _compute(self) -> str:
+        fingerprint = db.session.execute(_FINGERPRINT_SQL).scalar()
+        version = (fingerprint or '')[:16]
+        current_app.logger.info(f'Corpus version computed: {version}')
+        return version
+
+
+# Global corpus version instance
+corpus_version = CorpusVersion()
+
+
+def get_corpus_version() -> str:
+    """Return the current corpus version."""
+    return corpus_version.get()
+
+
+def fresh_corpus_version() -> str:
+    """
+    Recompute the corpus version now, ignoring the cached one.
+
+    Used right before a write that in-memory indexes apply in place, so
+    writes made meanwhile by other workers are not mistaken for applied.
+    """
+    corpus_version.invalidate()
+    return corpus_version.get()
+
+
+def bump_corpus_version() -> None:
+    """Invalidate the cached version after a write to the corpus."""
+    corpus_version.invalidate()
@@ -0,0 +1,217 @@
+"""
+Embedding ingestion for semantic search.
+
+Fills mishna.embedding (text_raw) and tag.embedding (name) with vectors from
+the sentence-transformers model in EMBEDDING_MODEL. Rows are read in
+keyset-paginated batches, encoded EMBEDDING_BATCH_SIZE texts at a time and
+written back with one executemany UPDATE per batch.
+
+Each row stores embedding_hash, a SHA-256 of the model name and the embedded
+text. A run only encodes rows whose hash differs, so re-running after edits
+(or after switching models) re-embeds exactly the rows that changed.
+
+manage_content does not wait for the model: it calls enqueue_embedding(),
+which hands the saved ids to a single background thread. Ids queued while a
+batch is running are coalesced into the next one. Re-embedded mishnayot then
+get their related mishnayot recomputed (see utils/related_mishnayot.py).
+
+The vector and hash columns live outside the ORM, like the rest of the
+pgvector access; see scripts/create_db_sql.
+"""
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Set
+
+from flask import current_app
+from sqlalchemy import text
+
+from models import db
+from utils.corpus_version import bump_corpus_version
+from utils.related_mishnayot import refresh_related
+
+DEFAULT_MODEL = 'imvladikon/sentence-transformers-alephbert'
+DEFAULT_BATCH_SIZE = 32
+
+# table -> column holding the text that is embedded
+EMBEDDED_TABLES = {'mishna': 'text_raw', 'tag': 'name'}
+
+_model = None
+_model_lock = Lock()
+_executor = None
+_pending: Dict[str, Set] = {table: set() for table in EMBEDDED_TABLES}
+_pending_lock = Lock()
+_drain_scheduled = False
+
+
+def get_embedding_model():
+    """
+    Lazy-load the sentence-transformers model.
+
+    Raises:
+        ImportError: If sentence-transformers is not installed
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                model_name = current_app.config.get('EMBEDDING_MODEL', DEFAULT_MODEL)
+                current_app.logger.info(f'Loading embedding model {model_name}...')
+                _model = SentenceTransformer(model_name)
+    return _model
+
+
+def content_hash(model_name: str, content: str) -> str:
+    """Hash identifying an embedding of content by a model."""
+    return hashlib.sha256(f'{model_name}\n{content}'.encode('utf-8')).hexdigest()
+
+
+def stale_rows(rows, model_name: str, full: bool = False) -> List[tuple]:
+    """
+    Select the rows whose stored embedding does not match their content.
+
+    Args:
+        rows: Rows with id, content and embedding_hash
+        model_name: The model the embeddings should come from
+        full: Select every row
+
+    Returns:
+        (id, content, new hash) of each row to embed
+    """
+    stale = []
+    for row in rows:
+        row_hash = content_hash(model_name, row.content)
+        if full or row.embedding_hash != row_hash:
+            stale.append((row.id, row.content, row_hash))
+    return stale
+
+
+def _vector_literal(vector) -> str:
+    return '[' + ','.join(repr(float(value)) for value in vector) + ']'
+
+
+def embed_table(table: str, ids: Optional[Iterable] = None, batch_size: Optional[int] = None,
+                full: bool = False) -> int:
+    """
+    Embed the rows of a table whose text changed since they were last embedded.
+
+    Args:
+        table: 'mishna' or 'tag'
+        ids: Only consider these row ids, all rows if None
+        batch_size: Rows read, encoded and written per transaction,
+                    EMBEDDING_BATCH_SIZE from the config if None
+        full: Re-embed every row, ignoring the stored hashes
+
+    Returns:
+        Number of rows embedded
+    """
+    text_column = EMBEDDED_TABLES[table]
+    model_name = current_app.config.get('EMBEDDING_MODEL', DEFAULT_MODEL)
+    batch_size = batch_size or current_app.config.get('EMBEDDING_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    ids = list(ids) if ids is not None else None
+    if ids == []:
+        return 0
+
+    embedded = 0
+    last_id = None
+    while True:
+        conditions, params = [], {'limit': batch_size}
+        if last_id is not None:
+            conditions.append('id > :last_id')
+            params['last_id'] = last_id
+        if ids is not None:
+            conditions.append('id = ANY(:ids)')
+            params['ids'] = ids
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        rows = db.session.execute(text(
+            f'SELECT id, {text_column} AS content, embedding_hash FROM {table} {where} ORDER BY id LIMIT :limit'
+        ), params).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        stale = stale_rows(rows, model_name, full)
+        if not stale:
+            db.session.rollback()
+            continue
+
+        vectors = get_embedding_model().encode([content for _, content, _ in stale],
+                                               batch_size=batch_size, show_progress_bar=False)
+        db.session.execute(
+            text(f'UPDATE {table} SET embedding = CAST(:embedding AS vector), embedding_hash = :hash WHERE id = :id'),
+            [{'id': row_id, 'embedding': _vector_literal(vector), 'hash': row_hash}
+             for (row_id, _, row_hash), vector in zip(stale, vectors)]
+        )
+        db.session.commit()
+        embedded += len(stale)
+        current_app.logger.info(f'Embedded {len(stale)} of {len(rows)} {table} rows in batch')
+
+    return embedded
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Lazy-load the single thread that runs queued re-embeds."""
+    global _executor
+    if _executor is None:
+        with _pending_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='embedding')
+    return _executor
+
+
+def enqueue_embedding(mishna_ids: Iterable[str] = (), tag_ids: Iterable[int] = ()) -> None:
+    """
+    Re-embed rows in the background after they were saved.
+
+    Does nothing when EMBEDDING_REFRESH_ON_SAVE is off. Failures are logged
+    by the worker; the rows keep their old hash and are picked up by the next
+    run of `flask embed`.
+    """
+    global _drain_scheduled
+    if not current_app.config.get('EMBEDDING_REFRESH_ON_SAVE', True):
+        return
+
+    with _pending_lock:
+        _pending['mishna'].update(mishna_ids)
+        _pending['tag'].update(tag_ids)
+        schedule = not _drain_scheduled
+        _drain_scheduled = True
+    if schedule:
+        get_executor().submit(_drain_pending, current_app._get_current_object())
+
+
+def _take_pending() -> Dict[str, List]:
+    global _drain_scheduled
+    with _pending_lock:
+        batch = {table: sorted(ids) for table, ids in _pending.items() if ids}
+        for ids in _pending.values():
+            ids.clear()
+        if not batch:
+            _drain_scheduled = False
+        return batch
+
+
+def _drain_pending(app) -> None:
+    """Embed queued ids until the queue is empty."""
+    with app.app_context():
+        while True:
+            batch = _take_pending()
+            if not batch:
+                return
+            for table, ids in batch.items():
+                try:
+                    count = embed_table(table, ids)
+                    app.logger.info(f'Background re-embed: {count} of {len(ids)} queued {table} rows changed')
+                    if table == 'mishna' and count:
+                        # The new vectors move these mishnayot's related lists
+                        if refresh_related(ids):
+                            bump_corpus_version()
+                except ImportError:
+                    app.logger.warning(f'sentence-transformers is not installed, {table} {ids} keep their '
+                                       f'old embeddings until `flask embed` runs')
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.error(f'Background re-embed of {table} {ids} failed: {str(e)}', exc_info=True)
+                finally:
+                    db.session.remove()
@@ -0,0 +1,220 @@
+"""
+Typo-tolerant term lookup over the corpus vocabulary.
+
+A SymSpell-style index: every vocabulary word is stored under each of its
+variants with up to MAX_EDIT_DISTANCE characters deleted. Looking up the
+deletes of a query term in the same table finds every word within that edit
+distance with a few dictionary lookups, and the candidates are verified with
+an optimal string alignment (Damerau-Levenshtein) distance.
+
+Words are indexed in their normalized form (see normalize_hebrew), so
+niqqud, final letters and ktiv male never count as typos. For each word the
+niqqud-free spellings seen in the corpus are kept to show corrections the
+way they are written in the text.
+
+The index is built from the database once per corpus version and updated
+in place when a mishna is saved through manage_content (see corpus_index).
+"""
+from collections import Counter
+from itertools import combinations
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from utils.corpus_index import CorpusIndex, MishnaDocument
+from utils.text_utils import normalized_tokens
+
+MAX_EDIT_DISTANCE = 2
+
+# Shorter terms are too ambiguous to correct
+MIN_CORRECTABLE_LENGTH = 3
+
+
+class Suggestion(NamedTuple):
+    """A vocabulary word close to a looked up term."""
+    word: str
+    distance: int
+    count: int
+    surface: str
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Optimal string alignment distance between two words.
+
+    Returns:
+        The distance, or max_distance + 1 if it exceeds max_distance
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= max_distance else max_distance + 1
+
+
+def allowed_distance(term: str, max_distance: int = MAX_EDIT_DISTANCE) -> int:
+    """Number of edits tolerated for a term of this length."""
+    if len(term) < MIN_CORRECTABLE_LENGTH:
+        return 0
+    return min(max_distance, 1 if len(term) <= 4 else 2)
+
+
+class SymSpellIndex:
+    """Vocabulary with word counts and a symmetric-delete lookup table."""
+
+    def __init__(self, max_distance: int = MAX_EDIT_DISTANCE):
+        self.max_distance = max_distance
+        self._counts: Counter = Counter()
+        self._surfaces: Dict[str, Counter] = {}
+        self._deletes: Dict[str, Set[str]] = {}
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, word):
+        return word in self._counts
+
+    def _variants(self, word: str, max_distance: int) -> Set[str]:
+        """The word with every combination of up to max_distance characters deleted."""
+        variants = {word}
+        for distance in range(1, min(max_distance, len(word)) + 1):
+            for positions in combinations(range(len(word)), distance):
+                variants.add(''.join(char for i, char in enumerate(word) if i not in positions))
+        return variants
+
+    def add(self, word: str, surface: str) -> None:
+        """Count one occurrence of a word, written as surface in the text."""
+        if word not in self._counts:
+            for variant in self._variants(word, self.max_distance):
+                self._deletes.setdefault(variant, set()).add(word)
+        self._counts[word] += 1
+        self._surfaces.setdefault(word, Counter())[surface] += 1
+
+    def remove(self, word: str, surface: str) -> None:
+        """Forget one occurrence of a word; the word leaves the index at zero."""
+        if word not in self._counts:
+            return
+        self._counts[word] -= 1
+        surfaces = self._surfaces[word]
+        surfaces[surface] -= 1
+        if surfaces[surface] <= 0:
+            del surfaces[surface]
+        if self._counts[word] > 0:
+            return
+
+        del self._counts[word]
+        del self._surfaces[word]
+        for variant in self._variants(word, self.max_distance):
+            words = self._deletes.get(variant)
+            if words is not None:
+                words.discard(word)
+                if not words:
+                    del self._deletes[variant]
+
+    def surface(self, word: str) -> str:
+        """Most frequent spelling of a word in the corpus."""
+        surfaces = self._surfaces.get(word)
+        return surfaces.most_common(1)[0][0] if surfaces else word
+
+    def lookup(self, term: str, max_distance: Optional[int] = None) -> List[Suggestion]:
+        """
+        Find vocabulary words within an edit distance of a normalized term.
+
+        Args:
+            term: Normalized word
+            max_distance: Edits tolerated, defaults to allowed_distance(term)
+
+        Returns:
+            Suggestions ordered by distance, then by corpus frequency
+        """
+        if max_distance is None:
+            max_distance = allowed_distance(term, self.max_distance)
+        max_distance = min(max_distance, self.max_distance)
+
+        candidates = set()
+        for variant in self._variants(term, max_distance):
+            candidates.update(self._deletes.get(variant, ()))
+
+        suggestions = []
+        for word in candidates:
+            distance = edit_distance(term, word, max_distance)
+            if distance <= max_distance:
+                suggestions.append(Suggestion(word, distance, self._counts[word], self.surface(word)))
+        suggestions.sort(key=lambda s: (s.distance, -s.count, s.word))
+        return suggestions
+
+
+class CorpusFuzzyIndex(CorpusIndex):
+    """The corpus vocabulary index, kept in step with the corpus version."""
+
+    name = 'fuzzy'
+
+    def __init__(self):
+        super().__init__()
+        self._index = SymSpellIndex()
+        self._documents: Dict[str, list] = {}
+
+    def _reset(self) -> None:
+        self._index = SymSpellIndex()
+        self._documents = {}
+
+    def _add(self, document: MishnaDocument) -> None:
+        text_raw = document.text_raw
+        words = [(word, text_raw[start:end]) for word, start, end in normalized_tokens(text_raw)]
+        self._documents[document.id] = words
+        for word, surface in words:
+            self._index.add(word, surface)
+
+    def _remove(self, mishna_id: str) -> None:
+        for word, surface in self._documents.pop(mishna_id, []):
+            self._index.remove(word, surface)
+
+    def suggest(self, query_text: str) -> Optional[str]:
+        """
+        Correct the words of a query that do not occur in the corpus.
+
+        Args:
+            query_text: Query as typed by the user
+
+        Returns:
+            The corrected query in corpus spelling, or None if every word is
+            known or no close enough word was found
+        """
+        tokens = normalized_tokens(query_text)
+        if not tokens:
+            return None
+
+        with self._lock:
+            self._ensure_current()
+            index = self._index
+            corrected = []
+            changed = False
+            for word, start, end in tokens:
+                if word in index:
+                    corrected.append(query_text[start:end])
+                    continue
+                suggestions = index.lookup(word)
+                if not suggestions:
+                    corrected.append(query_text[start:end])
+                    continue
+                corrected.append(suggestions[0].surface)
+                changed = True
+
+        return ' '.join(corrected) if changed else None
+
+
+fuzzy_index = CorpusFuzzyIndex()
+
+
+def suggest_correction(query_text: str) -> Optional[str]:
+    """Return a "did you mean" correction for a query, or None."""
+    return fuzzy_index.suggest(query_text)
@@ -0,0 +1,48 @@
+"""
+Match highlighting for search results.
+
+Search engines report matches as spans of the niqqud-free text_raw. The
+offset map saved with each mishna (mishna.text_offsets, see
+utils.text_utils.niqqud_offsets) translates them to text_pretty, which is
+split into plain and highlighted segments for the results template.
+"""
+from typing import Iterable, List, Optional, Tuple
+
+
+def highlight_segments(text_pretty: str, offsets: Optional[List[int]],
+                       raw_spans: Iterable[Tuple[int, int]]) -> Optional[List[Tuple[str, bool]]]:
+    """
+    Split text_pretty into segments, marking the ones covered by raw_spans.
+
+    Args:
+        text_pretty: Text as displayed, with niqqud
+        offsets: The mishna's text_offsets map
+        raw_spans: [start, end) spans of text_raw to highlight
+
+    Returns:
+        List of (text, is_match) segments covering text_pretty, or None when
+        there is nothing to highlight or the offset map does not fit the text
+    """
+    spans = sorted(raw_spans)
+    if not spans or not offsets or offsets[-1] != len(text_pretty):
+        return None
+
+    raw_length = len(offsets) - 1
+    segments = []
+    cursor = 0
+    for start, end in spans:
+        if start < 0 or end > raw_length or start >= end:
+            return None
+        # Extending to the next raw character's offset keeps the last letter's niqqud
+        pretty_start, pretty_end = offsets[start], offsets[end]
+        if pretty_end <= cursor:
+            continue
+        pretty_start = max(pretty_start, cursor)
+        if pretty_start > cursor:
+            segments.append((text_pretty[cursor:pretty_start], False))
+        segments.append((text_pretty[pretty_start:pretty_end], True))
+        cursor = pretty_end
+
+    if cursor < len(text_pretty):
+        segments.append((text_pretty[cursor:], False))
+    return segments
@@ -0,0 +1,149 @@
+"""
+HTTP caching helpers for pages derived from the corpus.
+
+ETags are strong and derived from the corpus version, a fingerprint of the
+deployed templates and static assets, and a resource key, so a conditional request can be answered with 304 from the cached corpus
+version alone, before any template rendering or database access. Once the
+cached version is older than CORPUS_VERSION_TTL, the first conditional
+request in the worker recomputes it (one fingerprint query) before the 304;
+a current client copy is never rendered again.
+"""
+import hashlib
+import os
+from typing import Callable, Optional
+
+from flask import current_app, request, make_response
+
+from utils.compression import available_encodings
+from utils.corpus_version import corpus_version, get_corpus_version
+
+
+def build_fingerprint() -> str:
+    """
+    Hash the application's templates and static assets.
+
+    Computed once per application and cached in app.extensions, so a deploy
+    that changes the HTML, JS or CSS gets new ETags while the corpus is
+    unchanged.
+    """
+    fingerprint = current_app.extensions.get('build_fingerprint')
+    if fingerprint is not None:
+        return fingerprint
+
+    digest = hashlib.sha1()
+    env = current_app.jinja_env
+    for name in sorted(env.loader.list_templates()):
+        digest.update(name.encode('utf-8'))
+        digest.update(env.loader.get_source(env, name)[0].encode('utf-8'))
+    static_folder = current_app.static_folder
+    if static_folder and os.path.isdir(static_folder):
+        for root, dirs, files in os.walk(static_folder):
+            dirs.sort()
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                digest.update(os.path.relpath(path, static_folder).encode('utf-8'))
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+
+    fingerprint = digest.hexdigest()[:12]
+    current_app.extensions['build_fingerprint'] = fingerprint
+    return fingerprint
+
+
+def corpus_etag(version: str, resource_key: str) -> str:
+    """
+    Build a strong ETag for a resource at a given corpus version and build.
+
+    Args:
+        version: The corpus version the representation was rendered from
+        resource_key: Identifies the resource (usually the request path)
+
+    Returns:
+        Opaque ETag value (without quotes)
+    """
+    digest = hashlib.sha1(f'{version}:{build_fingerprint()}:{resource_key}'.encode('utf-8')).hexdigest()
+    return digest[:20]
+
+
+def etag_matches(etag: str) -> bool:
+    """
+    Check whether the request's If-None-Match covers the given ETag.
+
+    The compression middleware suffixes ETags with the content encoding,
+    so those variants are accepted as well.
+    """
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return False
+    candidates = [etag] + [f'{etag}-{encoding}' for encoding in available_encodings()]
+    return any(if_none_match.contains(candidate) for candidate in candidates) or if_none_match.star_tag
+
+
+def cache_control_value() -> str:
+    """Cache-Control header value for public corpus pages."""
+    max_age = current_app.config.get('PERMALINK_MAX_AGE', 300)
+    stale = current_app.config.get('PERMALINK_STALE_WHILE_REVALIDATE', 86400)
+    return f'public, max-age={max_age}, stale-while-revalidate={stale}'
+
+
+def not_modified_response(etag: str, cache_control: Optional[str] = None):
+    """Build a 304 response carrying the ETag and caching headers."""
+    response = make_response('', 304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control or cache_control_value()
+    return response
+
+
+def not_modified_if_fresh(resource_key: str, cache_control: Optional[str] = None):
+    """
+    Answer a conditional request from the cached corpus version.
+
+    Does not touch the database: if this worker has no fresh corpus version
+    cached, None is returned and the caller has to check the version itself
+    (see corpus_conditional).
+
+    Returns:
+        A 304 response if the client's copy is current, otherwise None
+    """
+    version = corpus_version.peek()
+    if version is None:
+        return None
+
+    etag = corpus_etag(version, resource_key)
+    if not etag_matches(etag):
+        return None
+    return not_modified_response(etag, cache_control)
+
+
+def corpus_conditional(resource_key: str, render: Callable, cache_control: Optional[str] = None):
+    """
+    Serve a corpus-derived resource with ETag/Cache-Control and 304 support.
+
+    A current client copy gets a 304 without rendering. That costs no
+    database access while the worker's cached corpus version is fresh, and
+    one fingerprint query when it has expired.
+
+    Args:
+        resource_key: Identifies the resource (usually the request path)
+        render: Zero-argument callable producing the response body or response;
+                only called when the client's copy is missing or stale
+        cache_control: Cache-Control value, the public permalink policy if None
+                       (pass e.g. 'private, no-cache' for authenticated resources)
+
+    Returns:
+        Flask response
+    """
+    response = not_modified_if_fresh(resource_key, cache_control)
+    if response is not None:
+        return response
+
+    version = get_corpus_version()
+    etag = corpus_etag(version, resource_key)
+    if etag_matches(etag):
+        return not_modified_response(etag, cache_control)
+
+    response = make_response(render())
+    if response.status_code == 200:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control or cache_control_value()
+    return response
@@ -0,0 +1,154 @@
+"""
+Hybrid lexical + semantic search.
+
+The local BM25 search and the AWS semantic call run concurrently: the
+semantic request goes to a small thread pool while the lexical search runs
+in the request thread. The two rankings are merged with reciprocal-rank
+fusion (RRF), which only looks at ranks, so BM25 scores and semantic
+similarities never have to be put on the same scale.
+
+The semantic leg gets HYBRID_SEMANTIC_DEADLINE seconds. If it is late, the
+lexical ranking is returned on its own and the semantic answer, when it
+arrives, is fused in the background and cached, so repeating the query gets
+the full ranking. Complete fused rankings are cached per query (niqqud and
+spacing ignored, see query_cache_key) and corpus version.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from threading import Lock
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from flask import current_app
+
+from utils.corpus_version import get_corpus_version
+from utils.lexical_index import lexical_index
+from utils.lru_cache import LRUCache
+from utils.query_log import mark_cache_hit
+from utils.text_utils import query_cache_key
+
+# Rank offset of reciprocal-rank fusion; 60 is the value from the original paper
+RRF_K = 60
+
+_executor = None
+_executor_lock = Lock()
+_fused_cache = LRUCache(max_entries=256)
+
+
+class FusedMatch(NamedTuple):
+    """A mishna in the fused ranking, with the text_raw spans the lexical leg matched."""
+    number: int
+    score: float
+    spans: Tuple[Tuple[int, int], ...] = ()
+
+
+class HybridResult(NamedTuple):
+    """
+    Fused matches, best first.
+
+    complete is False when the semantic leg was late or failed; error holds
+    the semantic leg's exception in the latter case.
+    """
+    matches: List[FusedMatch]
+    complete: bool
+    error: Optional[Exception] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Lazy-load the thread pool that runs semantic calls."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('HYBRID_MAX_WORKERS', 4),
+                    thread_name_prefix='hybrid-search')
+    return _executor
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = RRF_K) -> List[Tuple[int, float]]:
+    """
+    Merge rankings by summing 1 / (k + rank) over the rankings each item appears in.
+
+    Args:
+        rankings: Lists of mishna numbers, best first
+        k: Rank offset; larger values flatten the difference between top ranks
+
+    Returns:
+        (number, fused score) tuples, best first
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, number in enumerate(ranking, 1):
+            scores[number] = scores.get(number, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def _fuse(lexical_matches, semantic_ranking=None) -> List[FusedMatch]:
+    rankings = [[match.number for match in lexical_matches]]
+    if semantic_ranking:
+        rankings.append([number for number, _ in semantic_ranking])
+    spans = {match.number: match.spans for match in lexical_matches}
+    return [FusedMatch(number, score, spans.get(number, ()))
+            for number, score in reciprocal_rank_fusion(rankings)]
+
+
+def _semantic_leg(app, client, query_text):
+    with app.app_context():
+        return client.rank(query_text)
+
+
+def hybrid_search(query_text: str, semantic_client=None) -> HybridResult:
+    """
+    Run lexical and semantic search concurrently and fuse the rankings.
+
+    Args:
+        query_text: Query as typed by the user
+        semantic_client: Object with rank(query) -> [(number, score)], e.g.
+                         AWSSemanticSearchClient; lexical only if None
+
+    Returns:
+        HybridResult with the fused ranking
+    """
+    app = current_app._get_current_object()
+    _fused_cache.max_entries = app.config.get('HYBRID_CACHE_SIZE', 256)
+    cache_key = (query_cache_key(query_text), get_corpus_version())
+    cached = _fused_cache.get(cache_key)
+    if cached is not None:
+        app.logger.info('Hybrid search cache hit')
+        mark_cache_hit('hybrid')
+        return HybridResult(cached, True)
+
+    started = time.monotonic()
+    deadline = app.config.get('HYBRID_SEMANTIC_DEADLINE', 3.0)
+    future = get_executor().submit(_semantic_leg, app, semantic_client, query_text) if semantic_client else None
+
+    lexical_matches = lexical_index.search(query_text, top_k=app.config.get('LEXICAL_TOP_K', 30))
+    if future is None:
+        return HybridResult(_fuse(lexical_matches), False)
+
+    try:
+        semantic_ranking = future.result(timeout=max(0.0, deadline - (time.monotonic() - started)))
+    except FutureTimeoutError:
+        app.logger.warning(f'Semantic search missed its {deadline}s deadline, returning lexical results')
+        if not future.cancel():
+            future.add_done_callback(lambda done: _cache_late_result(app, done, cache_key, lexical_matches))
+        return HybridResult(_fuse(lexical_matches), False)
+    except Exception as e:
+        app.logger.error(f'Semantic leg of hybrid search failed: {str(e)}')
+        return HybridResult(_fuse(lexical_matches), False, e)
+
+    matches = _fuse(lexical_matches, semantic_ranking)
+    _fused_cache.set(cache_key, matches)
+    app.logger.info(
+        f'Hybrid search: {len(lexical_matches)} lexical + {len(semantic_ranking)} semantic -> '
+        f'{len(matches)} fused in {(time.monotonic() - started) * 1000:.0f}ms'
+    )
+    return HybridResult(matches, True)
+
+
+def _cache_late_result(app, future, cache_key, lexical_matches) -> None:
+    """Fuse a semantic answer that arrived after the deadline, for the next identical query."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    _fused_cache.set(cache_key, _fuse(lexical_matches, future.result()))
+    app.logger.info('Cached late semantic result for hybrid search')
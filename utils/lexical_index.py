@@ -0,0 +1,282 @@
+"""
+BM25-ranked lexical search over the mishna texts.
+
+An inverted index from normalized words (see normalize_hebrew) to the
+mishnayot and word positions they occur at. Document lengths, the average
+length and each term's IDF are computed when the index is built or updated,
+so a query only walks the postings of its own terms.
+
+Hebrew attaches prepositions and conjunctions to the following word
+(והצדיק, בתורה, שהיא), so each word is also indexed with up to two of the
+prefix letters ו ה ב כ ל מ ש stripped, at the same position. A query for
+צדיק then finds הצדיק and והצדיק, while the full form still matches itself.
+
+Queries use the syntax of utils/query_language (phrases, exclusion, OR,
+tag: and chapter: filters). Tags and chapters are indexed as terms too, so
+every clause compiles to intersections, unions and differences of postings
+lists sorted by mishna number. Intersections gallop through the longer list,
+which keeps them cheap when a rare term meets a frequent one.
+"""
+import heapq
+import math
+from bisect import bisect_left
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from utils.corpus_index import CorpusIndex, MishnaDocument
+from utils.query_language import Clause, QueryTerm, field_term, parse_query
+from utils.text_utils import normalize_hebrew, normalized_tokens
+
+# BM25 parameters: term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+HEBREW_PREFIXES = set('והבכלמש')
+MAX_PREFIX_LETTERS = 2
+MIN_STEM_LENGTH = 3
+
+
+class LexicalMatch(NamedTuple):
+    """
+    A mishna matching a lexical query, its BM25 score and the [start, end)
+    spans of text_raw holding the matched words.
+    """
+    mishna_id: str
+    number: int
+    score: float
+    spans: Tuple[Tuple[int, int], ...] = ()
+
+
+def word_variants(surface: str, word: str) -> List[str]:
+    """
+    Index terms for one word of the text.
+
+    Args:
+        surface: The word as written in text_raw
+        word: Its normalized form
+
+    Returns:
+        The normalized word followed by its forms without prefix letters
+    """
+    variants = [word]
+    for length in range(1, MAX_PREFIX_LETTERS + 1):
+        if len(surface) <= length or surface[length - 1] not in HEBREW_PREFIXES:
+            break
+        stem = normalize_hebrew(surface[length:])
+        if len(stem) < MIN_STEM_LENGTH or ' ' in stem:
+            break
+        if stem not in variants:
+            variants.append(stem)
+    return variants
+
+
+def intersect_sorted(a: List[int], b: List[int]) -> List[int]:
+    """Intersect two sorted lists, galloping through the longer one."""
+    if len(a) > len(b):
+        a, b = b, a
+    result = []
+    low, size = 0, len(b)
+    for value in a:
+        bound = 1
+        while low + bound < size and b[low + bound] < value:
+            bound *= 2
+        low = bisect_left(b, value, low, min(low + bound + 1, size))
+        if low == size:
+            break
+        if b[low] == value:
+            result.append(value)
+            low += 1
+    return result
+
+
+def union_sorted(lists: Iterable[List[int]]) -> List[int]:
+    """Merge sorted lists into one sorted list without duplicates."""
+    result = []
+    for value in heapq.merge(*lists):
+        if not result or result[-1] != value:
+            result.append(value)
+    return result
+
+
+def difference_sorted(a: List[int], b: List[int]) -> List[int]:
+    """Values of sorted list a that are not in b."""
+    excluded = set(b)
+    return [value for value in a if value not in excluded]
+
+
+class LexicalIndex(CorpusIndex):
+    """Positional inverted index with precomputed BM25 statistics."""
+
+    name = 'lexical'
+
+    def __init__(self):
+        super().__init__()
+        self._reset()
+
+    def _reset(self) -> None:
+        # term -> {mishna number: [positions]}
+        self._postings: Dict[str, Dict[int, List[int]]] = {}
+        self._sorted: Dict[str, List[int]] = {}
+        self._ids: Dict[int, str] = {}
+        self._numbers: Dict[str, int] = {}
+        self._doc_lengths: Dict[int, int] = {}
+        self._doc_terms: Dict[int, List[str]] = {}
+        # mishna number -> text_raw span of the word at each position
+        self._spans: Dict[int, List[Tuple[int, int]]] = {}
+        self._idf: Dict[str, float] = {}
+        self._avg_doc_length = 0.0
+
+    def _add(self, document: MishnaDocument) -> None:
+        number, text_raw = document.number, document.text_raw
+        terms = set()
+        tokens = normalized_tokens(text_raw)
+        for position, (word, start, end) in enumerate(tokens):
+            for term in word_variants(text_raw[start:end], word):
+                self._postings.setdefault(term, {}).setdefault(number, []).append(position)
+                terms.add(term)
+
+        fields = [field_term('chapter', document.chapter)]
+        fields += [field_term('tag', normalize_hebrew(tag)) for tag in document.tags]
+        for term in fields:
+            self._postings.setdefault(term, {}).setdefault(number, [])
+            terms.add(term)
+
+        self._ids[number] = document.id
+        self._numbers[document.id] = number
+        self._doc_lengths[number] = len(tokens)
+        self._doc_terms[number] = list(terms)
+        self._spans[number] = [(start, end) for _, start, end in tokens]
+
+    def _remove(self, mishna_id: str) -> None:
+        number = self._numbers.pop(mishna_id, None)
+        if number is None:
+            return
+        for term in self._doc_terms.pop(number, []):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(number, None)
+            if not postings:
+                del self._postings[term]
+        self._ids.pop(number, None)
+        self._doc_lengths.pop(number, None)
+        self._spans.pop(number, None)
+
+    def _finish(self) -> None:
+        count = len(self._doc_lengths)
+        self._avg_doc_length = sum(self._doc_lengths.values()) / count if count else 0.0
+        self._idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+        self._sorted = {}
+
+    def _docs(self, term: str) -> List[int]:
+        """Sorted mishna numbers containing a term."""
+        docs = self._sorted.get(term)
+        if docs is None:
+            docs = self._sorted[term] = sorted(self._postings.get(term, ()))
+        return docs
+
+    def _phrase_docs(self, words: List[str]) -> List[int]:
+        """Mishnayot where the words occur consecutively."""
+        candidates = self._docs(words[0])
+        for word in words[1:]:
+            candidates = intersect_sorted(candidates, self._docs(word))
+            if not candidates:
+                return []
+
+        matches = []
+        for number in candidates:
+            following = [set(self._postings[word][number]) for word in words[1:]]
+            if any(all(start + offset in positions for offset, positions in enumerate(following, 1))
+                   for start in self._postings[words[0]][number]):
+                matches.append(number)
+        return matches
+
+    def _term_docs(self, term: QueryTerm) -> List[int]:
+        if term.kind == 'phrase':
+            return self._phrase_docs(term.value.split(' '))
+        if term.kind in ('tag', 'chapter'):
+            return self._docs(field_term(term.kind, term.value))
+        return self._docs(term.value)
+
+    def _clause_docs(self, clause: Clause) -> List[int]:
+        if len(clause.alternatives) == 1:
+            return self._term_docs(clause.alternatives[0])
+        return union_sorted(self._term_docs(term) for term in clause.alternatives)
+
+    def _evaluate(self, clauses: List[Clause]) -> List[int]:
+        """Mishna numbers satisfying every clause."""
+        positive = [self._clause_docs(clause) for clause in clauses if not clause.negated]
+        if positive:
+            positive.sort(key=len)
+            docs = positive[0]
+            for other in positive[1:]:
+                if not docs:
+                    break
+                docs = intersect_sorted(docs, other)
+        else:
+            docs = sorted(self._ids)
+
+        for clause in clauses:
+            if clause.negated and docs:
+                docs = difference_sorted(docs, self._clause_docs(clause))
+        return docs
+
+    def _bm25(self, number: int, terms: List[str]) -> float:
+        length_norm = 1 - BM25_B + BM25_B * self._doc_lengths[number] / (self._avg_doc_length or 1)
+        score = 0.0
+        for term in terms:
+            positions = self._postings.get(term, {}).get(number)
+            if not positions:
+                continue
+            frequency = len(positions)
+            score += self._idf[term] * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+        return score
+
+    def _match_spans(self, number: int, terms: List[str]) -> Tuple[Tuple[int, int], ...]:
+        """text_raw spans of every occurrence of the terms in a mishna."""
+        positions = set()
+        for term in terms:
+            positions.update(self._postings.get(term, {}).get(number, ()))
+        spans = self._spans[number]
+        return tuple(spans[position] for position in sorted(positions))
+
+    def search(self, query_text: str, top_k: Optional[int] = None) -> List[LexicalMatch]:
+        """
+        Find the mishnayot matching a query and rank them by BM25.
+
+        Plain words must all occur; see utils/query_language for phrases,
+        exclusion, OR and tag/chapter filters. Only the words of positive
+        clauses are scored, so a query of filters alone scores 0 everywhere
+        and returns mishnayot in order.
+
+        Args:
+            query_text: Query as typed by the user
+            top_k: Maximum number of matches, all matches if None
+
+        Returns:
+            Matches ordered by descending score, then by mishna number, with
+            the spans of the matched words for highlighting
+        """
+        clauses = parse_query(query_text)
+        if not clauses:
+            return []
+
+        scoring_terms = list(dict.fromkeys(
+            word
+            for clause in clauses if not clause.negated
+            for term in clause.alternatives if term.kind in ('word', 'phrase')
+            for word in term.value.split(' ')
+        ))
+
+        with self._lock:
+            self._ensure_current()
+            scored = [(self._bm25(number, scoring_terms), number) for number in self._evaluate(clauses)]
+            key = lambda item: (item[0], -item[1])
+            ranked = sorted(scored, key=key, reverse=True) if top_k is None else heapq.nlargest(top_k, scored, key=key)
+            return [LexicalMatch(self._ids[number], number, score, self._match_spans(number, scoring_terms))
+                    for score, number in ranked]
+
+
+lexical_index = LexicalIndex()
@@ -0,0 +1,335 @@
+"""
+Traffic replay load generator for the search endpoints.
+
+Replays search traffic against the app and reports throughput, latency
+percentiles and error rates per action, so deployment settings (worker
+class, pool size, cache sizes, ...) can be compared run against run.
+
+Traffic is either
+
+- recorded: the searches of the query log (see utils/query_log.py), sent to
+  the endpoint they were made on with the fields as submitted, or
+- synthetic: a weighted mix of the search form's actions with parameters
+  drawn from the corpus (DEFAULT_MIX, overridable per action label).
+
+Actions are labelled with their form action, smart searches split into
+search_smart:exact and search_smart:semantic.
+
+Targets are the Flask test client, in process, or a running server over
+HTTP. Test client requests come from `clients` simulated client addresses,
+so the per-address rate limiter sees realistic users, and are kept out of
+the query log so replays are never mined as real traffic. A server under
+test over HTTP sees a single address and logs what it serves; run it with
+RATE_LIMIT_ENABLED=false and QUERY_LOG_ENABLED=false.
+
+With a rate, arrivals are open-loop (Poisson, `rate` per second on average)
+and latency is measured from the scheduled arrival, so time spent waiting
+for one of the `concurrency` senders counts too. Without a rate, each
+sender issues its next request as soon as the previous one finished.
+
+A request counts as an error if it fails, returns a status >= 400, or
+renders the error page or error fragment (SearchError and rate limiting
+answer with status 200).
+"""
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import requests
+
+from models import Mishna, Tag
+from utils.query_log import QueryRecord
+
+# Path of each logged endpoint (see routes.search_mishna and routes.search_results_fragment)
+ENDPOINT_PATHS = {'search': '/', 'results': '/results'}
+
+DEFAULT_MIX = {
+    'search_mishna': 0.3,
+    'navigate_by_number': 0.15,
+    'search_by_tags': 0.2,
+    'search_smart:exact': 0.2,
+    'search_smart:semantic': 0.15,
+}
+
+# Rendered by error.html and by _results.html for a failed search
+ERROR_MARKERS = ('<title>שגיאה', '<!-- Search Error Message')
+
+REPORT_METRICS = ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'error_rate')
+
+
+class ReplayRequest(NamedTuple):
+    """A search to send: the action label, endpoint ('search' or 'results') and form fields."""
+    label: str
+    endpoint: str
+    form: Dict[str, str]
+
+
+class ReplayResult(NamedTuple):
+    """Outcome of one sent request."""
+    label: str
+    latency_ms: float
+    error: bool
+
+
+def action_label(action: Optional[str], form: Dict[str, str]) -> str:
+    """Report label of a search: its action, with smart searches split by mode."""
+    if action == 'search_smart':
+        return 'search_smart:exact' if form.get('exact_match') else 'search_smart:semantic'
+    return action or 'unknown'
+
+
+def recorded_traffic(records: Iterable[QueryRecord], limit: Optional[int] = None) -> List[ReplayRequest]:
+    """
+    Searches of the query log, in recorded order.
+
+    Args:
+        records: Query log records, e.g. from read_query_log()
+        limit: Keep only the most recent searches
+
+    Returns:
+        One ReplayRequest per logged search on a replayable endpoint
+    """
+    traffic = []
+    for record in records:
+        if record.endpoint not in ENDPOINT_PATHS or not record.action:
+            continue
+        form = dict(record.params, action=record.action)
+        if record.endpoint == 'search':
+            form['search_type'] = record.action
+        traffic.append(ReplayRequest(action_label(record.action, form), record.endpoint, form))
+    return traffic[-limit:] if limit else traffic
+
+
+class SyntheticCorpus(NamedTuple):
+    """What synthetic searches are drawn from."""
+    mishnayot: List[tuple]  # (chapter, mishna, number)
+    words: List[str]
+    tag_ids: List[int]
+
+
+def load_synthetic_corpus() -> SyntheticCorpus:
+    """Read the mishnayot, their words and the tag ids from the database."""
+    rows = Mishna.query.with_entities(Mishna.chapter, Mishna.mishna, Mishna.number, Mishna.text_raw).all()
+    words = sorted({word for row in rows for word in row.text_raw.split() if len(word) >= 3 and word.isalpha()})
+    tag_ids = [tag_id for tag_id, in Tag.query.with_entities(Tag.id).all()]
+    return SyntheticCorpus([(row.chapter, row.mishna, row.number) for row in rows], words, tag_ids)
+
+
+def synthetic_traffic(corpus: SyntheticCorpus, count: int, mix: Optional[Dict[str, float]] = None,
+                      seed: Optional[int] = None) -> List[ReplayRequest]:
+    """
+    Draw a mix of searches over the corpus.
+
+    Args:
+        corpus: Mishnayot, words and tags to draw parameters from
+        count: Number of searches
+        mix: Relative weight per action label, DEFAULT_MIX if None
+        seed: Random seed, for repeatable runs
+
+    Returns:
+        count ReplayRequests for the results endpoint
+
+    Raises:
+        ValueError: If the mix names an unknown label or the corpus is empty
+    """
+    mix = mix or DEFAULT_MIX
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown:
+        raise ValueError(f'Unknown actions in mix: {sorted(unknown)}')
+    if not corpus.mishnayot or not corpus.words:
+        raise ValueError('The corpus is empty')
+
+    rng = random.Random(seed)
+    labels = [label for label in mix if mix[label] > 0]
+    labels = rng.choices(labels, weights=[mix[label] for label in labels], k=count)
+    traffic = []
+    for label in labels:
+        chapter, mishna, number = rng.choice(corpus.mishnayot)
+        if label == 'search_mishna':
+            form = {'chapter': chapter, 'mishna': 'all' if rng.random() < 0.2 else mishna}
+        elif label == 'navigate_by_number':
+            form = {'mishna_number': str(number)}
+        elif label == 'search_by_tags' and corpus.tag_ids:
+            tag_ids = rng.sample(corpus.tag_ids, min(len(corpus.tag_ids), rng.randint(1, 2)))
+            form = {'tags': ','.join(map(str, tag_ids))}
+        else:
+            label = label if label != 'search_by_tags' else 'search_smart:exact'
+            form = {'search_query': ' '.join(rng.choices(corpus.words, k=rng.randint(1, 3)))}
+            if label == 'search_smart:exact':
+                form['exact_match'] = 'on'
+        action = label.split(':')[0]
+        traffic.append(ReplayRequest(label, 'results', dict(form, action=action)))
+    return traffic
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~ Targets ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _is_error(status: int, body: str) -> bool:
+    return status >= 400 or any(marker in body for marker in ERROR_MARKERS)
+
+
+class TestClientTarget:
+    """Sends requests through the app's test client, one client per sender thread."""
+
+    def __init__(self, app, clients: int = 200):
+        self.app = app
+        self.clients = max(1, clients)
+        self._local = threading.local()
+
+    def __str__(self):
+        return 'test-client'
+
+    @contextmanager
+    def running(self):
+        """Turn the query log off for the duration of a run."""
+        query_log_enabled = self.app.config.get('QUERY_LOG_ENABLED', True)
+        self.app.config['QUERY_LOG_ENABLED'] = False
+        try:
+            yield
+        finally:
+            self.app.config['QUERY_LOG_ENABLED'] = query_log_enabled
+
+    def send(self, request: ReplayRequest, sequence: int) -> bool:
+        """Send a request as one of the simulated clients; True if it failed."""
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        address = sequence % self.clients
+        response = client.post(ENDPOINT_PATHS[request.endpoint], data=request.form,
+                               environ_base={'REMOTE_ADDR': f'10.{address // 65536 % 256}.{address // 256 % 256}.{address % 256}'})
+        return _is_error(response.status_code, response.get_data(as_text=True))
+
+
+class HttpTarget:
+    """Sends requests to a running server, one HTTP session per sender thread."""
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __str__(self):
+        return self.base_url
+
+    def running(self):
+        """Nothing to set up; the server's own config applies."""
+        return nullcontext()
+
+    def send(self, request: ReplayRequest, sequence: int) -> bool:
+        """Send a request; True if it failed."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        response = session.post(self.base_url + ENDPOINT_PATHS[request.endpoint], data=request.form,
+                                timeout=self.timeout)
+        return _is_error(response.status_code, response.text)
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~ Running ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _send(target, request: ReplayRequest, sequence: int, scheduled: Optional[float]) -> ReplayResult:
+    started = time.perf_counter()
+    try:
+        error = target.send(request, sequence)
+    except Exception:
+        error = True
+    latency = (time.perf_counter() - (scheduled if scheduled is not None else started)) * 1000
+    return ReplayResult(request.label, latency, error)
+
+
+def run_replay(target, traffic: List[ReplayRequest], concurrency: int = 4, rate: Optional[float] = None,
+               seed: Optional[int] = None) -> Dict:
+    """
+    Send the traffic to a target and summarize the outcome.
+
+    Args:
+        target: TestClientTarget or HttpTarget
+        traffic: Requests, sent in order
+        concurrency: Number of sender threads
+        rate: Mean arrivals per second (Poisson), or None to send back to back
+        seed: Random seed of the arrival times
+
+    Returns:
+        Run report, see summarize()
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    with target.running(), ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='replay') as executor:
+        futures = []
+        arrival = started
+        for sequence, request in enumerate(traffic):
+            scheduled = None
+            if rate:
+                arrival += rng.expovariate(rate)
+                time.sleep(max(0.0, arrival - time.perf_counter()))
+                scheduled = arrival
+            futures.append(executor.submit(_send, target, request, sequence, scheduled))
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    report = summarize(results, elapsed)
+    report.update(target=str(target), concurrency=concurrency, rate=rate)
+    return report
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _summary_row(results: List[ReplayResult], elapsed: float) -> Dict:
+    latencies = [result.latency_ms for result in results]
+    errors = sum(result.error for result in results)
+    return {
+        'requests': len(results),
+        'errors': errors,
+        'error_rate': errors / len(results),
+        'throughput_rps': len(results) / elapsed if elapsed > 0 else 0.0,
+        'p50_ms': _percentile(latencies, 0.5),
+        'p95_ms': _percentile(latencies, 0.95),
+        'p99_ms': _percentile(latencies, 0.99),
+        'mean_ms': statistics.mean(latencies),
+    }
+
+
+def summarize(results: List[ReplayResult], elapsed: float) -> Dict:
+    """
+    Throughput, latency percentiles and error rate per action label and overall.
+
+    Returns:
+        {'elapsed_s': ..., 'actions': {label: row, ..., 'all': row}}, where a
+        row holds requests, errors, error_rate, throughput_rps (over the
+        whole run) and p50/p95/p99/mean latency in ms
+    """
+    by_label: Dict[str, List[ReplayResult]] = {}
+    for result in results:
+        by_label.setdefault(result.label, []).append(result)
+    actions = {label: _summary_row(by_label[label], elapsed) for label in sorted(by_label)}
+    if results:
+        actions['all'] = _summary_row(results, elapsed)
+    return {'elapsed_s': elapsed, 'actions': actions}
+
+
+def compare_runs(base: Dict, new: Dict) -> List[Dict]:
+    """
+    Diff two run reports, action by action.
+
+    Returns:
+        One dict per action label present in both runs and metric in
+        REPORT_METRICS: label, metric, base, new and relative change
+        (None when the base value is 0)
+    """
+    rows = []
+    for label, base_row in base['actions'].items():
+        new_row = new['actions'].get(label)
+        if new_row is None:
+            continue
+        for metric in REPORT_METRICS:
+            before, after = base_row[metric], new_row[metric]
+            rows.append({'label': label, 'metric': metric, 'base': before, 'new': after,
+                         'change': (after - before) / before if before else None})
+    return rows
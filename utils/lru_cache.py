@@ -0,0 +1,49 @@
+"""Small thread-safe LRU cache for in-process caching of rendered output."""
+from collections import OrderedDict
+from threading import Lock
+
+
+class LRUCache:
+    """
+    Bounded least-recently-used cache.
+
+    Used for caching values that are cheap to store but expensive to produce
+    (compressed page bodies, rendered fragments, fused result lists).
+    Safe to share between the threads of a single worker.
+    """
+
+    def __init__(self, max_entries=128):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of entries kept before the least
+                         recently used entry is evicted
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value for key (marking it as recently used), or default."""
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        """Store value under key, evicting the least recently used entry if needed."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
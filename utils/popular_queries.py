@@ -0,0 +1,226 @@
+"""
+Precomputed semantic rankings for popular smart search queries.
+
+Most semantic searches repeat a long tail of the same study topics. `flask
+popular-queries` mines the most frequent semantic smart search queries from
+the query log, runs them through the AWS endpoint at POPULAR_QUERIES_RATE
+calls per second and stores each ranking ({mishna number: score}) in the
+popular_query table together with the corpus version.
+
+Queries come from the structured query log (see utils/query_log.py), or,
+for history from before it existed, from the "Smart search initiated" lines
+of the application log. They are counted by their cache key (niqqud and
+spacing ignored, see query_cache_key) and sent in their most frequent
+spelling.
+
+A search whose query has a row for the current corpus version is
+served from it through PrecomputedSearchClient, with no outbound call. Rows
+from an older corpus version are not served; the next run of the job
+recomputes them first, and drops rows that are no longer popular.
+"""
+import re
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from api.aws_search_client import AWSSearchError
+from models import db, Mishna, PopularQuery
+from utils.corpus_version import get_corpus_version
+from utils.query_log import QueryRecord, mark_cache_hit, query_log_files
+from utils.text_utils import query_cache_key
+
+DEFAULT_LIMIT = 200
+DEFAULT_MIN_COUNT = 3
+DEFAULT_RATE = 1.0  # AWS calls per second
+MAX_QUERY_LENGTH = 500
+
+# Log line of a semantic smart search, see routes._perform_search
+_QUERY_LINE = re.compile(r'Smart search initiated\. Query: (?P<query>.*), Exact Match: False \[in ')
+
+
+class MinedQuery(NamedTuple):
+    """A query from the log: its cache key, most frequent spelling and number of searches."""
+    normalized_query: str
+    query_text: str
+    hits: int
+
+
+class PrecomputeStats(NamedTuple):
+    """Rows computed by a run, left as they were, failed, and removed as no longer popular."""
+    refreshed: int
+    unchanged: int
+    failed: int
+    removed: int
+
+
+def semantic_queries(records: Iterable[QueryRecord]) -> Iterator[str]:
+    """Queries of the successful semantic smart searches in query log records, as typed."""
+    for record in records:
+        if record.action == 'search_smart' and not record.error and not record.params.get('exact_match'):
+            query_text = record.params.get('search_query', '')
+            if query_text:
+                yield query_text
+
+
+def app_log_queries(lines: Iterable[str]) -> Iterator[str]:
+    """Queries of the semantic smart searches in application log lines, as typed."""
+    for line in lines:
+        match = _QUERY_LINE.search(line)
+        if match:
+            yield match.group('query')
+
+
+def mine_popular_queries(queries: Iterable[str], limit: int = DEFAULT_LIMIT,
+                         min_count: int = DEFAULT_MIN_COUNT) -> List[MinedQuery]:
+    """
+    Count searched queries by their cache key.
+
+    Args:
+        queries: One query as typed per search
+        limit: Maximum number of queries returned
+        min_count: Queries searched fewer times are left out
+
+    Returns:
+        The most searched queries, most frequent first
+    """
+    hits: Counter = Counter()
+    spellings: Dict[str, Counter] = {}
+    for query_text in queries:
+        query_text = query_text.strip()
+        normalized = query_cache_key(query_text)
+        if not normalized or len(query_text) > MAX_QUERY_LENGTH:
+            continue
+        hits[normalized] += 1
+        spellings.setdefault(normalized, Counter())[query_text] += 1
+
+    return [MinedQuery(normalized, spellings[normalized].most_common(1)[0][0], count)
+            for normalized, count in sorted(hits.items(), key=lambda item: (-item[1], item[0]))
+            if count >= min_count][:limit]
+
+
+def app_log_lines(log_path: str) -> Iterator[str]:
+    """Lines of an application log and its rotated backups, read one at a time."""
+    for path in query_log_files(log_path):
+        with open(path, encoding='utf-8', errors='replace') as log_file:
+            yield from log_file
+
+
+def precompute_popular_queries(client, queries: Iterable[str], limit: int = DEFAULT_LIMIT,
+                               min_count: int = DEFAULT_MIN_COUNT, rate: float = DEFAULT_RATE,
+                               full: bool = False) -> PrecomputeStats:
+    """
+    Compute and store the semantic rankings of the most popular queries.
+
+    Each ranking is committed on its own, so an interrupted run keeps what
+    it computed.
+
+    Args:
+        client: Semantic search client with rank(query) -> [(number, score)]
+        queries: One query as typed per logged search
+        limit: Number of popular queries kept
+        min_count: Queries searched fewer times are not precomputed
+        rate: Maximum API calls per second
+        full: Recompute rows that are current as well
+
+    Returns:
+        PrecomputeStats of the run
+    """
+    version = get_corpus_version()
+    mined = mine_popular_queries(queries, limit, min_count)
+    stored = {row.normalized_query: row for row in PopularQuery.query.all()}
+
+    refreshed = unchanged = failed = 0
+    interval = 1.0 / rate if rate > 0 else 0.0
+    next_call = time.monotonic()
+    for query in mined:
+        row = stored.pop(query.normalized_query, None)
+        if row is not None and row.corpus_version == version and not full:
+            row.hits = query.hits
+            db.session.commit()
+            unchanged += 1
+            continue
+
+        time.sleep(max(0.0, next_call - time.monotonic()))
+        next_call = time.monotonic() + interval
+        try:
+            ranking = client.rank(query.query_text)
+        except AWSSearchError as e:
+            current_app.logger.warning(f'Precomputing popular query {query.query_text!r} failed: {str(e)}')
+            failed += 1
+            continue
+
+        values = {
+            'normalized_query': query.normalized_query,
+            'query_text': query.query_text,
+            'hits': query.hits,
+            'results': {str(number): score for number, score in ranking},
+            'corpus_version': version,
+            'refreshed_at': datetime.utcnow(),
+        }
+        db.session.execute(insert(PopularQuery).values(values).on_conflict_do_update(
+            index_elements=[PopularQuery.normalized_query], set_=values))
+        db.session.commit()
+        refreshed += 1
+
+    removed = 0
+    if stored:
+        removed = db.session.execute(
+            delete(PopularQuery).where(PopularQuery.normalized_query.in_(list(stored)))).rowcount
+        db.session.commit()
+
+    current_app.logger.info(f'Popular queries: {refreshed} computed, {unchanged} current, '
+                            f'{failed} failed, {removed} removed')
+    return PrecomputeStats(refreshed, unchanged, failed, removed)
+
+
+class PrecomputedSearchClient:
+    """
+    Serves one query's stored ranking through the semantic client interface
+    (search and rank), so the search routes need no outbound call.
+    """
+
+    def __init__(self, ranking: List[Tuple[int, float]]):
+        self.ranking = ranking
+
+    def rank(self, query: str) -> List[Tuple[int, float]]:
+        return list(self.ranking)
+
+    def search(self, query: str, min_score: float = 0.0) -> List[Mishna]:
+        scores = {number: score for number, score in self.ranking if score >= min_score}
+        results = Mishna.query.filter(Mishna.number.in_(list(scores))).all()
+        for mishna in results:
+            mishna.similarity_score = scores[mishna.number]
+        results.sort(key=lambda mishna: mishna.similarity_score, reverse=True)
+        return results
+
+
+def precomputed_client(query_text: str) -> Optional[PrecomputedSearchClient]:
+    """
+    Look up the stored ranking of a query.
+
+    Returns:
+        A client serving the ranking, or None if the query was not
+        precomputed for the current corpus version
+    """
+    normalized = query_cache_key(query_text)
+    if not normalized or len(normalized) > MAX_QUERY_LENGTH:
+        return None
+    try:
+        row = db.session.get(PopularQuery, normalized)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.warning(f'Popular query lookup failed: {str(e)}')
+        return None
+    if row is None or row.corpus_version != get_corpus_version():
+        return None
+
+    current_app.logger.info(f'Serving precomputed semantic ranking ({row.hits} searches logged)')
+    mark_cache_hit('precomputed')
+    ranking = sorted(((int(number), score) for number, score in row.results.items()), key=lambda item: -item[1])
+    return PrecomputedSearchClient(ranking)
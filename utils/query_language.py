@@ -0,0 +1,125 @@
+"""
+Query syntax for exact search.
+
+    שמעון הצדיק               every word, in any order
+    "היה אומר"                the words next to each other, in this order
+    -עולם   -"על מנת"         exclude mishnayot with the word or phrase
+    חכם OR גבור               either term; OR joins the terms next to it
+    tag:ענווה  תגית:ענווה     mishnayot with the tag (tag:"גמילות חסדים" for longer names)
+    chapter:ב  פרק:ב          mishnayot of the chapter
+
+Clauses are combined with AND. parse_query() turns the text into clauses of
+normalized terms, which the lexical index evaluates on its postings lists.
+"""
+import re
+from typing import List, NamedTuple, Tuple
+
+from utils.text_utils import QUOTE_MARKS, normalize_hebrew, normalized_tokens
+
+FIELD_ALIASES = {
+    'tag': 'tag',
+    'תגית': 'tag',
+    'chapter': 'chapter',
+    'פרק': 'chapter',
+}
+
+OR_OPERATOR = 'OR'
+
+# Optional "-", optional "field:", then a quoted phrase or a bare token
+_TOKEN = re.compile(r'(-)?(?:([^\s:"]+):)?(?:"([^"]*)"|(\S+))')
+
+
+class QueryTerm(NamedTuple):
+    """
+    One searchable unit of a query.
+
+    kind is 'word', 'phrase', 'tag' or 'chapter'. value is the normalized
+    word, the normalized phrase words separated by spaces, the normalized
+    tag name or the chapter letter.
+    """
+    kind: str
+    value: str
+
+
+class Clause(NamedTuple):
+    """Alternatives joined by OR, optionally negated."""
+    alternatives: Tuple[QueryTerm, ...]
+    negated: bool
+
+
+def field_term(kind: str, value: str) -> str:
+    """Index term under which a tag or chapter is stored."""
+    return f'{kind}:{value}'
+
+
+def _field_value(kind: str, value: str) -> str:
+    if kind == 'tag':
+        return normalize_hebrew(value)
+    return ''.join(char for char in value.strip() if char not in QUOTE_MARKS)
+
+
+def _text_term(text: str):
+    words = [word for word, _, _ in normalized_tokens(text)]
+    if not words:
+        return None
+    return QueryTerm('word' if len(words) == 1 else 'phrase', ' '.join(words))
+
+
+def _parse_terms(text: str):
+    """Yield (negated, QueryTerm) pairs and OR_OPERATOR markers."""
+    for match in _TOKEN.finditer(text):
+        minus, field, quoted, bare = match.groups()
+        if not minus and not field and bare == OR_OPERATOR:
+            yield OR_OPERATOR
+            continue
+
+        kind = FIELD_ALIASES.get(field) if field else None
+        if kind:
+            value = _field_value(kind, quoted if quoted is not None else bare)
+            term = QueryTerm(kind, value) if value else None
+        elif field:
+            # Not a known field: the colon is ordinary punctuation
+            term = _text_term(match.group(0)[len(minus or ''):])
+        elif quoted is not None:
+            term = _text_term(quoted)
+            if term is not None:
+                term = QueryTerm('phrase', term.value)
+        else:
+            term = _text_term(bare)
+
+        if term is not None:
+            yield bool(minus), term
+
+
+def parse_query(text: str) -> List[Clause]:
+    """
+    Parse a query into clauses.
+
+    Args:
+        text: Query as typed by the user
+
+    Returns:
+        List of clauses, all of which must hold for a mishna to match
+    """
+    clauses = []
+    pending_or = False
+    for item in _parse_terms(text or ''):
+        if item == OR_OPERATOR:
+            pending_or = bool(clauses) and not clauses[-1].negated
+            continue
+        negated, term = item
+        if pending_or and not negated:
+            clauses[-1] = Clause(clauses[-1].alternatives + (term,), False)
+        else:
+            clauses.append(Clause((term,), negated))
+        pending_or = False
+    return clauses
+
+
+def is_structured_query(text: str) -> bool:
+    """Whether a query uses any operator (quotes, -, OR or a field) beyond plain words."""
+    for match in _TOKEN.finditer(text or ''):
+        minus, field, quoted, bare = match.groups()
+        if minus or quoted is not None or field in FIELD_ALIASES or bare == OR_OPERATOR:
+            return True
+    return False
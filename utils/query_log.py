@@ -0,0 +1,311 @@
+"""
+Structured, append-only log of the searches served.
+
+One compact NDJSON record per search, separate from the application log:
+
+    {"ts": 1767225600.123, "endpoint": "results", "action": "search_smart",
+     "query": "דרכ ארצ", "params": {"search_query": "דרך ארץ"}, "results": [14, 2],
+     "stages": {"semantic": 412.5, "facets": 0.2, "search": 415.1, "render": 3.8, "total": 419.3},
+     "cache": null, "degraded": false, "error": false}
+
+- query: the normalized query (normalize_hebrew for text searches, the
+  sorted tag ids, chapter and mishna, ...), params: the submitted search
+  fields as typed, so a search can be replayed.
+- results: mishna numbers in result order.
+- stages: milliseconds spent per stage (lexical, fuzzy, semantic, hybrid,
+  tags, facets, search, render) and in total.
+- cache: the cache that answered the search ('fragment', 'hybrid' or
+  'precomputed'), null on a miss.
+- degraded: the results are partial, e.g. the semantic leg missed its deadline.
+
+Requests only append the record to an in-memory queue. A background thread
+writes the queue in batches of QUERY_LOG_BATCH_SIZE, at least every
+QUERY_LOG_FLUSH_SECONDS, with one write per batch. At most
+QUERY_LOG_MAX_PENDING records wait; further records are dropped and counted
+rather than letting memory grow when the disk stalls. The file is rotated
+like RotatingFileHandler at QUERY_LOG_MAX_BYTES, keeping
+QUERY_LOG_BACKUP_COUNT backups; Gunicorn workers share it under an flock.
+
+read_query_log() iterates over the records of all files, oldest first.
+"""
+import atexit
+import json
+import os
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from threading import Event, Lock, Thread
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from flask import current_app, g, has_request_context
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows - workers then rely on O_APPEND only
+    fcntl = None
+
+DEFAULT_PATH = 'logs/queries.ndjson'
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 10
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_SECONDS = 2.0
+DEFAULT_MAX_PENDING = 10000
+
+# Longest logged query or form value; longer ones are truncated
+MAX_VALUE_LENGTH = 500
+
+
+class QueryRecord(NamedTuple):
+    """A logged search, see the module docstring for the fields."""
+    ts: float
+    endpoint: str
+    action: Optional[str]
+    query: str = ''
+    params: Dict[str, str] = {}
+    results: List[int] = []
+    stages: Dict[str, float] = {}
+    cache: Optional[str] = None
+    degraded: bool = False
+    error: bool = False
+
+
+class QueryLogWriter:
+    """Batches records in memory and appends them to a size-rotated NDJSON file from a background thread."""
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES, backup_count: int = DEFAULT_BACKUP_COUNT,
+                 batch_size: int = DEFAULT_BATCH_SIZE, flush_seconds: float = DEFAULT_FLUSH_SECONDS,
+                 max_pending: int = DEFAULT_MAX_PENDING, logger=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.logger = logger
+        self.dropped = 0
+        self._pending = deque()
+        self._lock = Lock()
+        self._write_lock = Lock()
+        self._wakeup = Event()
+        self._thread = None
+
+    def write(self, record: QueryRecord) -> bool:
+        """
+        Queue a record for the next batch.
+
+        Returns:
+            False if the queue was full and the record was dropped
+        """
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._pending.append(record)
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name='query-log', daemon=True)
+                self._thread.start()
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wakeup.set()
+        return True
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_seconds)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                if self.logger is not None:
+                    self.logger.error(f'Writing the query log failed: {str(e)}', exc_info=True)
+
+    def flush(self) -> int:
+        """
+        Write every queued record now.
+
+        Returns:
+            Number of records written
+        """
+        with self._lock:
+            batch = list(self._pending)
+            self._pending.clear()
+            dropped, self.dropped = self.dropped, 0
+        if dropped and self.logger is not None:
+            self.logger.warning(f'Query log queue full, dropped {dropped} records')
+        if not batch:
+            return 0
+
+        data = ''.join(json.dumps(record._asdict(), ensure_ascii=False, separators=(',', ':')) + '\n'
+                       for record in batch).encode('utf-8')
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._write_lock, open(f'{self.path}.lock', 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.max_bytes:
+                    self._rotate()
+                with open(self.path, 'ab') as log_file:
+                    log_file.write(data)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return len(batch)
+
+    def _rotate(self) -> None:
+        """Shift path.N-1 -> path.N, ..., path -> path.1. Caller holds the file lock."""
+        if self.backup_count <= 0:
+            os.remove(self.path)
+            return
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f'{self.path}.{index}'
+            if os.path.exists(source):
+                os.replace(source, f'{self.path}.{index + 1}')
+        os.replace(self.path, f'{self.path}.1')
+
+
+_writer = None
+_writer_lock = Lock()
+
+
+def get_query_log_writer() -> Optional[QueryLogWriter]:
+    """Lazy-load the query log writer from the app config; None if the log is disabled."""
+    global _writer
+    if not current_app.config.get('QUERY_LOG_ENABLED', True):
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                config = current_app.config
+                _writer = QueryLogWriter(
+                    config.get('QUERY_LOG_FILE', DEFAULT_PATH),
+                    max_bytes=config.get('QUERY_LOG_MAX_BYTES', DEFAULT_MAX_BYTES),
+                    backup_count=config.get('QUERY_LOG_BACKUP_COUNT', DEFAULT_BACKUP_COUNT),
+                    batch_size=config.get('QUERY_LOG_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+                    flush_seconds=config.get('QUERY_LOG_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS),
+                    max_pending=config.get('QUERY_LOG_MAX_PENDING', DEFAULT_MAX_PENDING),
+                    logger=current_app.logger)
+                atexit.register(_writer.flush)
+    return _writer
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~ Recording a request ~~~~~~~~~~~~~~~~~~~~~~~~
+# The record being built lives on flask.g, so search helpers can time their
+# stages and report cache hits without passing it around. Outside a request
+# started with begin_search() these calls do nothing.
+
+def _current() -> Optional[dict]:
+    return g.get('query_log_record') if has_request_context() else None
+
+
+def begin_search(endpoint: str, action: Optional[str], query: str = '', params: Optional[Dict[str, str]] = None) -> None:
+    """Start recording the search handled by the current request."""
+    g.query_log_record = {
+        'started': time.perf_counter(),
+        'endpoint': endpoint,
+        'action': action,
+        'query': (query or '')[:MAX_VALUE_LENGTH],
+        'params': {key: str(value)[:MAX_VALUE_LENGTH] for key, value in (params or {}).items()},
+        'stages': {},
+        'cache': None,
+    }
+
+
+@contextmanager
+def stage(name: str):
+    """Add the time spent in the block to a stage of the current search."""
+    record = _current()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if record is not None:
+            elapsed = (time.perf_counter() - started) * 1000
+            record['stages'][name] = round(record['stages'].get(name, 0.0) + elapsed, 2)
+
+
+def mark_cache_hit(cache: str) -> None:
+    """Note that a cache answered the current search."""
+    record = _current()
+    if record is not None:
+        record['cache'] = cache
+
+
+def finish_search(results=(), degraded: bool = False, error: bool = False) -> None:
+    """
+    Queue the record of the current search for writing.
+
+    Args:
+        results: Mishna objects (or mishna numbers) in result order
+        degraded: The results are partial
+        error: The search failed
+    """
+    record = _current()
+    writer = get_query_log_writer() if record is not None else None
+    if writer is None:
+        return
+    g.pop('query_log_record', None)
+
+    stages = record['stages']
+    stages['total'] = round((time.perf_counter() - record['started']) * 1000, 2)
+    writer.write(QueryRecord(
+        ts=round(time.time(), 3),
+        endpoint=record['endpoint'],
+        action=record['action'],
+        query=record['query'],
+        params=record['params'],
+        results=[getattr(result, 'number', result) for result in results],
+        stages=stages,
+        cache=record['cache'],
+        degraded=bool(degraded),
+        error=bool(error),
+    ))
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~ Reading ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def query_log_files(path: str) -> List[str]:
+    """The log file and its rotated backups, oldest first."""
+    backups = []
+    pattern = re.compile(re.escape(os.path.basename(path)) + r'\.(\d+)$')
+    directory = os.path.dirname(path) or '.'
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            match = pattern.match(name)
+            if match:
+                backups.append((int(match.group(1)), os.path.join(directory, name)))
+    files = [file_path for _, file_path in sorted(backups, reverse=True)]
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_query_log(path: Optional[str] = None, since: Optional[float] = None) -> Iterator[QueryRecord]:
+    """
+    Iterate over the logged searches, oldest first, one line at a time.
+
+    Lines that do not parse (e.g. a batch still being written) are skipped.
+
+    Args:
+        path: The log file, QUERY_LOG_FILE from the config if None
+        since: Only records with a later timestamp (seconds since the epoch)
+
+    Yields:
+        QueryRecord per search
+    """
+    path = path or current_app.config.get('QUERY_LOG_FILE', DEFAULT_PATH)
+    fields = set(QueryRecord._fields)
+    for file_path in query_log_files(path):
+        # Rotated files last written before since hold no later record
+        if since is not None and os.path.getmtime(file_path) <= since:
+            continue
+        with open(file_path, encoding='utf-8', errors='replace') as log_file:
+            for line in log_file:
+                try:
+                    record = QueryRecord(**{key: value for key, value in json.loads(line).items() if key in fields})
+                except (ValueError, TypeError):
+                    continue
+                if since is None or record.ts > since:
+                    yield record
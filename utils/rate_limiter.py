@@ -46,19 +46,27 @@ class RateLimiter:
 rate_limiter = RateLimiter()
 
 
-def rate_limit(max_requests=20, window_seconds=60):
+def rate_limit(max_requests=20, window_seconds=60, scope=None):
     """
     Decorator to rate limit a Flask route.
     
     Args:
         max_requests: Maximum number of requests allowed
         window_seconds: Time window in seconds
+        scope: Optional bucket name - routes with different scopes are limited
+               independently (default: shared per-IP bucket)
     """
     def decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
+            # Disabled e.g. on a server under load test (see utils/load_replay.py)
+            if not current_app.config.get('RATE_LIMIT_ENABLED', True):
+                return f(*args, **kwargs)
+
             # Use IP address as the key
             key = request.remote_addr or 'unknown'
+            if scope:
+                key = f'{key}_{scope}'
             
             if not rate_limiter.is_allowed(key, max_requests, window_seconds):
                 current_app.logger.warning(f'Rate limit exceeded for {key}')
@@ -0,0 +1,209 @@
+"""
+Precomputed "related mishnayot" for every mishna.
+
+Each mishna stores its RELATED_TOP_K most related mishnayot in
+mishna.related, a JSON list of {"id", "number", "score"} ordered by score,
+so results carry them with no extra query.
+
+Relatedness combines two signals:
+
+- Tag Jaccard: shared tags / tags of either mishna, computed in SQL over
+  mishna_tag.
+- Embedding cosine similarity, when both mishnayot have an embedding (see
+  utils/embedding_pipeline.py). Nearest neighbours come from the ANN index.
+
+With both, score = RELATED_TAG_WEIGHT * jaccard + (1 - weight) * cosine;
+otherwise the Jaccard alone.
+
+`flask related` computes every row. After a save, refresh_related()
+recomputes only the rows whose lists can change: the saved mishnayot, those
+sharing one of their old or new tags, and those listing them as related.
+Embedding changes elsewhere in the corpus are picked up by the next full run.
+"""
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from flask import current_app
+from sqlalchemy import select, text, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, Mishna
+from utils.vector_index import apply_search_settings
+
+DEFAULT_TOP_K = 5
+DEFAULT_TAG_WEIGHT = 0.5
+DEFAULT_BATCH_SIZE = 200
+
+# Nearest embeddings fetched per mishna, as a multiple of the top k
+EMBEDDING_CANDIDATES_FACTOR = 4
+
+_JACCARD_SQL = text('''
+    WITH tag_counts AS (SELECT mishna_id, count(*) AS tags FROM mishna_tag GROUP BY mishna_id)
+    SELECT a.mishna_id AS source, b.mishna_id AS target,
+           count(*)::float / (sa.tags + sb.tags - count(*)) AS jaccard
+    FROM mishna_tag a
+    JOIN mishna_tag b ON b.tag_id = a.tag_id AND b.mishna_id <> a.mishna_id
+    JOIN tag_counts sa ON sa.mishna_id = a.mishna_id
+    JOIN tag_counts sb ON sb.mishna_id = b.mishna_id
+    WHERE a.mishna_id = ANY(:ids)
+    GROUP BY a.mishna_id, b.mishna_id, sa.tags, sb.tags
+''')
+
+_NEAREST_SQL = text('''
+    SELECT id, 1 - (embedding <=> (SELECT embedding FROM mishna WHERE id = :id)) AS cosine
+    FROM mishna
+    WHERE embedding IS NOT NULL AND id <> :id
+    ORDER BY embedding <=> (SELECT embedding FROM mishna WHERE id = :id)
+    LIMIT :limit
+''')
+
+_COSINE_SQL = text('''
+    SELECT id, 1 - (embedding <=> (SELECT embedding FROM mishna WHERE id = :id)) AS cosine
+    FROM mishna
+    WHERE embedding IS NOT NULL AND id = ANY(:candidates)
+''')
+
+_HAS_EMBEDDINGS_SQL = text('''
+    SELECT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_name = 'mishna' AND column_name = 'embedding')
+''')
+
+_AFFECTED_SQL = text('''
+    SELECT mishna_id FROM mishna_tag WHERE tag_id = ANY(:tag_ids)
+    UNION
+    SELECT id FROM mishna
+    WHERE related IS NOT NULL
+      AND EXISTS (SELECT 1 FROM json_array_elements(related) item WHERE item->>'id' = ANY(:mishna_ids))
+''')
+
+
+def _cosines(mishna_id: str, candidates: Set[str], limit: int) -> Dict[str, float]:
+    """Cosine similarity to the nearest embeddings and to the given candidates."""
+    cosines = {row.id: row.cosine for row in db.session.execute(_NEAREST_SQL, {'id': mishna_id, 'limit': limit})
+               if row.cosine is not None}
+    missing = [candidate for candidate in candidates if candidate not in cosines]
+    if cosines and missing:
+        cosines.update((row.id, row.cosine) for row in db.session.execute(
+            _COSINE_SQL, {'id': mishna_id, 'candidates': missing}) if row.cosine is not None)
+    return cosines
+
+
+def combine_scores(tag_scores: Dict[str, float], cosines: Dict[str, float], tag_weight: float,
+                   top_k: int) -> List[Tuple[str, float]]:
+    """
+    Rank candidates by their combined tag and embedding scores.
+
+    Args:
+        tag_scores: Tag Jaccard per candidate, for candidates sharing a tag
+        cosines: Embedding cosine similarity per candidate, empty without embeddings
+        tag_weight: Weight of the Jaccard when a cosine is known
+        top_k: Number of candidates kept
+
+    Returns:
+        Up to top_k (candidate, score) pairs with a positive score, best first
+    """
+    scores = {
+        candidate: (tag_weight * tag_scores.get(candidate, 0.0) + (1 - tag_weight) * cosines[candidate]
+                    if candidate in cosines else tag_scores[candidate])
+        for candidate in set(tag_scores) | set(cosines)
+    }
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return [(candidate, score) for candidate, score in ranked if score > 0][:top_k]
+
+
+def compute_related(mishna_ids: List[str], top_k: Optional[int] = None) -> Dict[str, List[dict]]:
+    """
+    Compute the related mishnayot of the given mishnayot.
+
+    Args:
+        mishna_ids: Ids of the mishnayot to compute
+        top_k: Related mishnayot kept per mishna, RELATED_TOP_K from the config if None
+
+    Returns:
+        Mapping of mishna id to its related list, best first
+    """
+    top_k = top_k or current_app.config.get('RELATED_TOP_K', DEFAULT_TOP_K)
+    tag_weight = current_app.config.get('RELATED_TAG_WEIGHT', DEFAULT_TAG_WEIGHT)
+
+    jaccards: Dict[str, Dict[str, float]] = {mishna_id: {} for mishna_id in mishna_ids}
+    for row in db.session.execute(_JACCARD_SQL, {'ids': list(mishna_ids)}):
+        jaccards[row.source][row.target] = row.jaccard
+
+    use_embeddings = db.session.execute(_HAS_EMBEDDINGS_SQL).scalar()
+    if use_embeddings:
+        apply_search_settings()
+
+    top = {}
+    for mishna_id in mishna_ids:
+        tag_scores = jaccards[mishna_id]
+        cosines = _cosines(mishna_id, set(tag_scores), top_k * EMBEDDING_CANDIDATES_FACTOR) if use_embeddings else {}
+        top[mishna_id] = combine_scores(tag_scores, cosines, tag_weight, top_k)
+
+    numbers = dict(db.session.execute(select(Mishna.id, Mishna.number).where(
+        Mishna.id.in_({candidate for items in top.values() for candidate, _ in items}))).all())
+    return {
+        mishna_id: [{'id': candidate, 'number': numbers[candidate], 'score': round(score, 4)}
+                    for candidate, score in items if candidate in numbers]
+        for mishna_id, items in top.items()
+    }
+
+
+def _store(mishna_ids: List[str]) -> None:
+    """Compute and save the related lists of a batch of mishnayot in one transaction."""
+    related = compute_related(mishna_ids)
+    db.session.execute(update(Mishna), [{'id': mishna_id, 'related': items} for mishna_id, items in related.items()])
+    db.session.commit()
+
+
+def rebuild_related(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Recompute the related mishnayot of every mishna, one batch per transaction.
+
+    Returns:
+        Number of mishnayot updated
+    """
+    updated = 0
+    last_id = ''
+    while True:
+        mishna_ids = db.session.execute(
+            select(Mishna.id).where(Mishna.id > last_id).order_by(Mishna.id).limit(batch_size)).scalars().all()
+        if not mishna_ids:
+            break
+        _store(mishna_ids)
+        updated += len(mishna_ids)
+        last_id = mishna_ids[-1]
+    return updated
+
+
+def refresh_related(mishna_ids: Iterable[str], tag_ids: Iterable[int] = ()) -> int:
+    """
+    Recompute the related lists affected by a change to some mishnayot.
+
+    Call after the change was committed. Failures are logged and rolled
+    back; the affected lists are fixed by the next `flask related` run.
+
+    Args:
+        mishna_ids: Mishnayot whose text, number or tags changed, or that were deleted
+        tag_ids: Tags they had before or after the change
+
+    Returns:
+        Number of mishnayot recomputed
+    """
+    mishna_ids, tag_ids = sorted(set(mishna_ids)), sorted(set(tag_ids))
+    if not mishna_ids:
+        return 0
+
+    try:
+        affected = set(mishna_ids) | set(db.session.execute(
+            _AFFECTED_SQL, {'tag_ids': tag_ids, 'mishna_ids': mishna_ids}).scalars())
+        # Deleted mishnayot have no list of their own, only entries in other lists
+        affected = db.session.execute(
+            select(Mishna.id).where(Mishna.id.in_(affected)).order_by(Mishna.id)).scalars().all()
+        for start in range(0, len(affected), DEFAULT_BATCH_SIZE):
+            _store(affected[start:start + DEFAULT_BATCH_SIZE])
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f'Failed to refresh related mishnayot of {mishna_ids}: {str(e)}', exc_info=True)
+        return 0
+
+    current_app.logger.info(f'Refreshed related mishnayot of {len(affected)} mishnayot after changes to {mishna_ids}')
+    return len(affected)
@@ -32,10 +32,11 @@ Key Components:
 from typing import List, Tuple, Optional
 from flask import current_app
 from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 # from sentence_transformers import SentenceTransformer  # COMMENTED OUT - not in use
 
 from models import db, Mishna, Tag
-# from utils.compromise_mode import search_with_compromise  # COMMENTED OUT - not in use
+from utils.vector_index import apply_search_settings
 
 
 class SemanticSearchEngine:
@@ -56,7 +57,12 @@ class SemanticSearchEngine:
     # Minimum similarity score threshold (0-100%)
     MIN_SIMILARITY_SCORE = 85
     
-    def __init__(self, model: SentenceTransformer):
+    # Compromise mode: lower the threshold in steps until something matches
+    COMPROMISE_STEP = 5
+    COMPROMISE_MIN_SCORE = 30
+    COMPROMISE_MAX_RESULTS = 3
+    
+    def __init__(self, model: 'SentenceTransformer'):
         """
         Initialize the semantic search engine.
         
@@ -89,22 +95,9 @@ class SemanticSearchEngine:
             min_similarity_score = self.MIN_SIMILARITY_SCORE
         
         try:
-            # Step 1: Encode query to vector
-            query_vector = self._encode_query(query_text)
-            
-            # Step 2: Find similar tags
-            similar_tags = self._find_similar_tags(query_vector)
-            
-            # Step 3: Retrieve candidates from database
-            candidates, all_distances = self._retrieve_candidates(query_vector, max_candidates)
-            
-            # Step 4: Apply tag-based boosting
-            boosted_candidates = self._apply_tag_boost(candidates, similar_tags)
+            boosted_candidates, cutoff_distance = self._score_candidates(query_text, max_candidates)
             
-            # Step 5: Calculate adaptive threshold (using original distances)
-            cutoff_distance = self._calculate_threshold(all_distances)
-            
-            # Step 6: Filter and return results (using boosted scores)
+            # Filter and return results (using boosted scores)
             results = self._filter_results(boosted_candidates, cutoff_distance, min_similarity_score)
             
             current_app.logger.info(f'Returned {len(results)} results (threshold: {cutoff_distance:.4f})')
@@ -122,8 +115,16 @@ class SemanticSearchEngine:
         this method automatically reduces the threshold by 5% increments until
         results are found or the threshold reaches 30%.
         
+        Candidates are encoded, retrieved and boosted once; the thresholds are
+        then tried against the scored list in memory, so compromise mode costs
+        no more model or database work than a single search.
+        
         In compromise mode, results are limited to a maximum of 3 items.
         
+        When no candidate falls within the adaptive cutoff distance, no
+        threshold can find anything, so the threshold is not lowered at all:
+        the results are empty, attempts stays 1 and is_active stays False.
+        
         Args:
             query_text: The search query in natural language
             max_candidates: Maximum number of candidates to retrieve from database
@@ -133,12 +134,82 @@ class SemanticSearchEngine:
             - results: List of Mishna objects with similarity_score attribute
             - compromise_info: Dictionary with compromise mode status information
         """
-        return search_with_compromise(
-            search_function=self.search,
-            query_text=query_text,
-            initial_threshold=self.MIN_SIMILARITY_SCORE,
-            max_candidates=max_candidates
-        )
+        compromise_info = {
+            'is_active': False,
+            'initial_threshold': self.MIN_SIMILARITY_SCORE,
+            'current_threshold': self.MIN_SIMILARITY_SCORE,
+            'attempts': 1,
+        }
+        
+        if not query_text or not query_text.strip():
+            current_app.logger.info('Empty semantic query, returning no results')
+            return [], compromise_info
+        
+        try:
+            boosted_candidates, cutoff_distance = self._score_candidates(query_text, max_candidates)
+            
+            # Best similarity within the cutoff: every threshold at or below it
+            # finds results, every threshold above it finds none
+            best_similarity = max(
+                (self._similarity_percentage(distance)
+                 for distance, _ in boosted_candidates if distance <= cutoff_distance),
+                default=None
+            )
+            
+            threshold = self.MIN_SIMILARITY_SCORE
+            while (best_similarity is not None and best_similarity < threshold
+                   and threshold - self.COMPROMISE_STEP >= self.COMPROMISE_MIN_SCORE):
+                threshold -= self.COMPROMISE_STEP
+                compromise_info['attempts'] += 1
+            
+            compromise_info['current_threshold'] = threshold
+            compromise_info['is_active'] = threshold < self.MIN_SIMILARITY_SCORE
+            
+            results = self._filter_results(boosted_candidates, cutoff_distance, threshold)
+            if compromise_info['is_active']:
+                results = results[:self.COMPROMISE_MAX_RESULTS]
+            
+            current_app.logger.info(
+                f'Returned {len(results)} results (threshold: {cutoff_distance:.4f}, '
+                f'min similarity: {threshold}%, attempts: {compromise_info["attempts"]})'
+            )
+            return results, compromise_info
+            
+        except Exception as e:
+            current_app.logger.error(f'Error in semantic search: {str(e)}', exc_info=True)
+            return [], compromise_info
+    
+    def _score_candidates(
+        self, 
+        query_text: str, 
+        max_candidates: int
+    ) -> Tuple[List[Tuple[float, Mishna]], float]:
+        """
+        Retrieve the candidates for a query and score them.
+        
+        Args:
+            query_text: The search query in natural language
+            max_candidates: Maximum number of candidates to retrieve from database
+            
+        Returns:
+            Tuple of (boosted (distance, Mishna) candidates, cutoff distance)
+        """
+        # Step 1: Encode query to vector
+        query_vector = self._encode_query(query_text)
+        
+        # Step 2: Find similar tags
+        similar_tags = self._find_similar_tags(query_vector)
+        
+        # Step 3: Retrieve candidates from database
+        candidates, all_distances = self._retrieve_candidates(query_vector, max_candidates)
+        
+        # Step 4: Apply tag-based boosting
+        boosted_candidates = self._apply_tag_boost(candidates, similar_tags)
+        
+        # Step 5: Calculate adaptive threshold (using original distances)
+        cutoff_distance = self._calculate_threshold(all_distances)
+        
+        return boosted_candidates, cutoff_distance
     
     def _encode_query(self, query_text: str) -> list:
         """
@@ -181,6 +252,11 @@ class SemanticSearchEngine:
             List of tag IDs that are similar to the query
         """
         try:
+            # Tags embedded by utils/embedding_pipeline are compared in the database
+            stored = self._find_similar_stored_tags(query_vector, max_tags)
+            if stored is not None:
+                return stored
+            
             # Get all tags with their names
             all_tags = Tag.query.all()
             
@@ -228,6 +304,42 @@ class SemanticSearchEngine:
             current_app.logger.error(f'Error finding similar tags: {str(e)}', exc_info=True)
             return []
     
+    def _find_similar_stored_tags(self, query_vector: list, max_tags: int) -> Optional[List[int]]:
+        """
+        Find similar tags using the stored tag embeddings.
+        
+        Args:
+            query_vector: The encoded query vector
+            max_tags: Maximum number of similar tags to return
+            
+        Returns:
+            List of similar tag IDs, or None if no tag has an embedding yet or
+            the database has no tag.embedding column (see scripts/create_db_sql)
+        """
+        try:
+            rows = db.session.execute(text('''
+                SELECT id, name, (embedding <=> (:query_vector)::vector) AS distance
+                FROM tag
+                WHERE embedding IS NOT NULL
+                ORDER BY distance
+                LIMIT :limit
+            '''), {"query_vector": query_vector, "limit": max_tags}).all()
+        except SQLAlchemyError as e:
+            # Roll back so the aborted transaction does not fail the candidate query too
+            db.session.rollback()
+            current_app.logger.warning(f'Stored tag embeddings unavailable, encoding tag names: {str(e)}')
+            return None
+        
+        if not rows:
+            return None
+        
+        similar = [(row.id, row.name, row.distance) for row in rows if row.distance < 0.7]
+        if similar:
+            current_app.logger.info(f'Found {len(similar)} similar tags: {[(name, dist) for _, name, dist in similar]}')
+        else:
+            current_app.logger.info('No sufficiently similar tags found')
+        return [tag_id for tag_id, _, _ in similar]
+    
     def _apply_tag_boost(
         self, 
         candidates: List[Tuple[float, Mishna]], 
@@ -304,6 +416,9 @@ class SemanticSearchEngine:
             LIMIT :limit
         ''')
         
+        # ef_search / probes for the HNSW or IVFFlat index, if one exists
+        apply_search_settings()
+        
         result_proxy = db.session.execute(
             sql, 
             {"query_vector": query_vector, "limit": max_candidates}
@@ -416,9 +531,7 @@ class SemanticSearchEngine:
             # Using the same formula as in index.html: ((0.72 - distance) / 0.22 * 100)
             # This maps distance range [0.5, 0.72] to percentage range [100%, 0%]
             # Lower distance = higher similarity percentage
-            similarity_percentage = ((0.72 - distance) / 0.22 * 100)
-            # Clamp to 0-100 range
-            similarity_percentage = max(0, min(100, similarity_percentage))
+            similarity_percentage = self._similarity_percentage(distance)
             
             # Apply both cutoff_distance (upper bound) and min_similarity_score (lower bound)
             if distance <= cutoff_distance:
@@ -439,6 +552,11 @@ class SemanticSearchEngine:
         
         return results
     
+    @staticmethod
+    def _similarity_percentage(distance: float) -> float:
+        """Map a cosine distance to a similarity percentage, clamped to 0-100%."""
+        return max(0, min(100, (0.72 - distance) / 0.22 * 100))
+    
     def _log_rejected_candidates(
         self, 
         candidates: List[Tuple[float, Mishna]], 
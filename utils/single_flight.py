@@ -0,0 +1,149 @@
+"""
+Single-flight coalescing of identical concurrent calls.
+
+When a shared link makes many users run the same semantic query at once,
+each request would spend a worker on the same AWS round trip. coalesce()
+lets concurrent callers with the same key wait for one in-flight call and
+share its outcome:
+
+- Within a worker, the first caller (the leader) runs the call and the
+  threads arriving while it is in flight wait on an Event and receive its
+  result or exception.
+- Across Gunicorn workers on the same host, the leader of each worker takes
+  an exclusive flock on a lock file chosen by the key's hash. The first one
+  runs the call and writes the JSON result into the file; the others get
+  the lock when it is done and reuse the result if it is younger than
+  SINGLE_FLIGHT_SHARE_SECONDS. Failures are not shared across workers, the
+  next worker simply tries again. Keys are spread over a fixed number of
+  lock files, so the directory never grows; two keys sharing a file only
+  wait for each other.
+
+Without fcntl (e.g. on Windows) or with SINGLE_FLIGHT_LOCK_DIR unset, calls
+are coalesced within a worker only.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from threading import Event, Lock
+from typing import Any, Callable, Dict, Optional
+
+from flask import current_app
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows - coalesce within the worker only
+    fcntl = None
+
+LOCK_STRIPES = 64
+DEFAULT_LOCK_DIR = os.path.join(tempfile.gettempdir(), 'pirkei-avot-single-flight')
+DEFAULT_SHARE_SECONDS = 5.0
+
+
+class _Call:
+    """An in-flight call and, once done, its outcome."""
+
+    def __init__(self):
+        self.done = Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key within this process."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, function: Callable[[], Any]) -> Any:
+        """
+        Run function once for all concurrent callers with the same key.
+
+        Returns:
+            The result of the call, shared by every waiting caller
+
+        Raises:
+            Whatever the call raised, in every waiting caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.followers += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+            if call.followers:
+                current_app.logger.info(f'Single-flight call shared with {call.followers} waiting requests')
+        return call.result
+
+
+_in_process = SingleFlight()
+
+
+def _lock_path(lock_dir: str, key: str) -> str:
+    stripe = int(hashlib.sha1(key.encode('utf-8')).hexdigest(), 16) % LOCK_STRIPES
+    return os.path.join(lock_dir, f'{stripe:02d}.lock')
+
+
+def _across_workers(key: str, function: Callable[[], Any]) -> Any:
+    """Run function under the key's lock file, reusing a fresh result another worker wrote there."""
+    lock_dir = current_app.config.get('SINGLE_FLIGHT_LOCK_DIR', DEFAULT_LOCK_DIR)
+    if fcntl is None or not lock_dir:
+        return function()
+    share_seconds = current_app.config.get('SINGLE_FLIGHT_SHARE_SECONDS', DEFAULT_SHARE_SECONDS)
+
+    os.makedirs(lock_dir, exist_ok=True)
+    with open(_lock_path(lock_dir, key), 'a+', encoding='utf-8') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            lock_file.seek(0)
+            try:
+                entry = json.loads(lock_file.read() or 'null')
+            except ValueError:
+                entry = None
+            if entry and entry.get('key') == key and time.time() - entry.get('at', 0) <= share_seconds:
+                current_app.logger.info('Single-flight result reused from another worker')
+                return entry['result']
+
+            result = function()
+            lock_file.seek(0)
+            lock_file.truncate()
+            json.dump({'key': key, 'at': time.time(), 'result': result}, lock_file, ensure_ascii=False)
+            lock_file.flush()
+            return result
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def coalesce(key: str, function: Callable[[], Any]) -> Any:
+    """
+    Run function once for all concurrent callers with the same key, in this
+    worker and across the workers of the host.
+
+    Args:
+        key: Identifies identical calls, e.g. a normalized query
+        function: Zero-argument call returning a JSON-serializable result
+
+    Returns:
+        The result of function, possibly computed by another caller
+    """
+    return _in_process.do(key, lambda: _across_workers(key, function))
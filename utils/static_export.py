@@ -0,0 +1,265 @@
+"""
+Static site export of the corpus.
+
+Renders the landing page and every mishna, chapter and tag page with the
+same templates the live site uses, plus a JSON file with the page's data,
+so the read side can be served from any static host or CDN.
+
+Layout of the output directory:
+    index.html, index.json                  landing page and tag catalog
+    mishna/<number>/index.html|json         single mishna with its related mishnayot
+    chapter/<chapter>/index.html|json       all mishnayot of a chapter
+    tag/<id>/index.html|json                all mishnayot with a tag
+    static/...                              copy of the application's static assets
+
+Every file is written atomically (temp file + rename). A manifest stores a
+fingerprint of the data each page was rendered from, so later runs only
+re-render pages whose mishnayot, tags or templates changed and remove pages
+that no longer exist.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict, List
+
+from flask import current_app
+from jinja2 import meta
+from sqlalchemy.orm import joinedload, selectinload
+
+from forms import MishnaForm
+from models import Mishna, Tag
+from routes import load_tag_catalog, render_search_page
+
+MANIFEST_FILENAME = '.export-manifest.json'
+
+# Template every exported page is rendered with; the templates it includes are found from its source
+EXPORTED_TEMPLATE = 'index.html'
+
+
+def export_static_site(output_dir: str, full: bool = False) -> Dict[str, int]:
+    """
+    Export the corpus to static HTML and JSON files.
+
+    Must be called inside an application context.
+
+    Args:
+        output_dir: Directory to write into (created if missing)
+        full: Re-render every page, ignoring the previous manifest
+
+    Returns:
+        Dictionary with 'rendered', 'skipped' and 'removed' page counts
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    previous = {} if full else _read_manifest(output_dir)
+
+    mishnayot = (Mishna.query
+                 .options(selectinload(Mishna.tags).joinedload(Tag.category))
+                 .order_by(Mishna.number)
+                 .all())
+    tags = Tag.query.options(joinedload(Tag.category)).order_by(Tag.id).all()
+    catalog = load_tag_catalog()
+
+    pages = _plan_pages(mishnayot, tags, catalog)
+
+    manifest = {}
+    stats = {'rendered': 0, 'skipped': 0, 'removed': 0}
+
+    for page_path, page in pages.items():
+        manifest[page_path] = page['fingerprint']
+        if previous.get(page_path) == page['fingerprint'] and _page_exists(output_dir, page_path):
+            stats['skipped'] += 1
+            continue
+
+        html = _render_page(page_path, page, catalog)
+        data = json.dumps(page['data'], ensure_ascii=False, separators=(',', ':'))
+        _write_atomic(_page_file(output_dir, page_path, 'index.html'), html.encode('utf-8'))
+        _write_atomic(_page_file(output_dir, page_path, 'index.json'), data.encode('utf-8'))
+        stats['rendered'] += 1
+
+    for page_path in set(previous) - set(pages):
+        _remove_page(output_dir, page_path)
+        stats['removed'] += 1
+
+    _sync_static_assets(os.path.join(output_dir, 'static'))
+    _write_atomic(os.path.join(output_dir, MANIFEST_FILENAME),
+                  json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True).encode('utf-8'))
+
+    current_app.logger.info(
+        f"Static export to {output_dir}: rendered={stats['rendered']}, "
+        f"skipped={stats['skipped']}, removed={stats['removed']}"
+    )
+    return stats
+
+
+def serialize_mishna(mishna: Mishna) -> dict:
+    """Serialize a mishna with its tags for the JSON exports."""
+    return {
+        'id': mishna.id,
+        'number': mishna.number,
+        'chapter': mishna.chapter,
+        'mishna': mishna.mishna,
+        'text_pretty': mishna.text_pretty,
+        'text_raw': mishna.text_raw,
+        'tags': [
+            {
+                'id': tag.id,
+                'name': tag.name,
+                'category': tag.category_name,
+                'color': tag.category.color if tag.category else '#F5F5F5',
+            }
+            for tag in mishna.tags
+        ],
+    }
+
+
+def _plan_pages(mishnayot: List[Mishna], tags: List[Tag], catalog) -> Dict[str, dict]:
+    """
+    Build the list of pages with their results, template context, JSON data and fingerprint.
+
+    Every page embeds the tag catalog, so its fingerprint is part of every
+    page fingerprint; otherwise a page only depends on the mishnayot it shows
+    and, for a single mishna, its related list.
+    """
+    base_fingerprint = _fingerprint([catalog, _templates_fingerprint()])
+    serialized = {m.id: serialize_mishna(m) for m in mishnayot}
+
+    def page(results, data, **context):
+        return {
+            'results': results,
+            'context': context,
+            'data': data,
+            'fingerprint': _fingerprint([base_fingerprint, data]),
+        }
+
+    pages = {'': page([], {'tags': catalog[0], 'categories': catalog[1]})}
+
+    for mishna in mishnayot:
+        # Only single-mishna pages show the related list
+        pages[f'mishna/{mishna.number}'] = page(
+            [mishna], {**serialized[mishna.id], 'related': mishna.related or []},
+            selected_chapter=mishna.chapter, selected_mishna=mishna.mishna)
+
+    chapters = {}
+    for mishna in mishnayot:
+        chapters.setdefault(mishna.chapter, []).append(mishna)
+    for chapter, results in chapters.items():
+        pages[f'chapter/{chapter}'] = page(
+            results, {'chapter': chapter, 'mishnayot': [serialized[m.id] for m in results]},
+            selected_chapter=chapter, selected_mishna='all')
+
+    for tag in tags:
+        results = [m for m in mishnayot if tag in m.tags]
+        if not results:
+            continue
+        pages[f'tag/{tag.id}'] = page(
+            results,
+            {'tag': {'id': tag.id, 'name': tag.name, 'category': tag.category_name},
+             'mishnayot': [serialized[m.id] for m in results]},
+            searchType='search_by_tags', selected_tags=[tag.id])
+
+    return pages
+
+
+def _render_page(page_path: str, page: dict, catalog) -> str:
+    """Render one page with the live search page template."""
+    with current_app.test_request_context(f'/{page_path}'):
+        form = MishnaForm(meta={'csrf': False})
+        return render_search_page(form, page['results'], catalog=catalog, **page['context'])
+
+
+def _fingerprint(parts) -> str:
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _exported_templates() -> List[str]:
+    """Names of the exported page template and every template it includes, extends or imports."""
+    env = current_app.jinja_env
+    names, pending = set(), [EXPORTED_TEMPLATE]
+    while pending:
+        name = pending.pop()
+        if name in names:
+            continue
+        names.add(name)
+        source = env.loader.get_source(env, name)[0]
+        # Names built at render time come back as None and cannot be followed
+        pending.extend(ref for ref in meta.find_referenced_templates(env.parse(source)) if ref)
+    return sorted(names)
+
+
+def _templates_fingerprint() -> str:
+    """Hash the exported templates so template edits trigger a full re-render."""
+    env = current_app.jinja_env
+    digest = hashlib.sha1()
+    for name in _exported_templates():
+        digest.update(name.encode('utf-8'))
+        digest.update(env.loader.get_source(env, name)[0].encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _page_file(output_dir: str, page_path: str, filename: str) -> str:
+    return os.path.join(output_dir, *page_path.split('/'), filename) if page_path else os.path.join(output_dir, filename)
+
+
+def _page_exists(output_dir: str, page_path: str) -> bool:
+    return (os.path.exists(_page_file(output_dir, page_path, 'index.html'))
+            and os.path.exists(_page_file(output_dir, page_path, 'index.json')))
+
+
+def _remove_page(output_dir: str, page_path: str) -> None:
+    for filename in ('index.html', 'index.json'):
+        path = _page_file(output_dir, page_path, filename)
+        if os.path.exists(path):
+            os.remove(path)
+    page_dir = os.path.dirname(_page_file(output_dir, page_path, 'index.html'))
+    if page_path and os.path.isdir(page_dir) and not os.listdir(page_dir):
+        os.rmdir(page_dir)
+
+
+def _read_manifest(output_dir: str) -> Dict[str, str]:
+    path = os.path.join(output_dir, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        current_app.logger.warning(f'Ignoring unreadable export manifest {path}: {str(e)}')
+        return {}
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """Write data to path via a temp file in the same directory and an atomic rename."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _sync_static_assets(target_dir: str) -> None:
+    """Copy static assets that are missing or differ from the exported copy."""
+    source_dir = current_app.static_folder
+    for root, _, files in os.walk(source_dir):
+        for filename in files:
+            source = os.path.join(root, filename)
+            target = os.path.join(target_dir, os.path.relpath(source, source_dir))
+            if os.path.exists(target) and os.path.getsize(target) == os.path.getsize(source):
+                with open(source, 'rb') as a, open(target, 'rb') as b:
+                    if a.read() == b.read():
+                        continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp_target = f'{target}.tmp'
+            shutil.copyfile(source, tmp_target)
+            os.replace(tmp_target, target)
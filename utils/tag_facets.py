@@ -0,0 +1,109 @@
+"""
+Tag facet counts and tag co-occurrence.
+
+For every tag the index keeps the number of mishnayot carrying it, a bitset
+of those mishnayot (bit n set for mishna number n) and, for every other tag,
+the number of mishnayot carrying both. Adding or removing a mishna adjusts
+only the entries of its own tags, so a saved mishna and every other
+mishna_tag change (bulk tagging, tag merges and deletes) are applied in
+place as the delta of the changed mishnayot, and nothing is counted with
+GROUP BY per request.
+
+Counting the tags of a result set intersects the result bitset with each
+tag's bitset, which costs one big-integer AND per tag whatever the number of
+results.
+"""
+from collections import Counter
+from itertools import permutations
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from utils.corpus_index import CorpusIndex, MishnaDocument
+
+
+class TagFacet(NamedTuple):
+    """A tag and the number of mishnayot carrying it within a result set."""
+    tag_id: int
+    name: str
+    count: int
+
+
+class TagFacetIndex(CorpusIndex):
+    """Per-tag counts, bitsets and co-occurrence counts over the mishnayot."""
+
+    name = 'tag facets'
+
+    def __init__(self):
+        super().__init__()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._counts: Counter = Counter()
+        # tag id -> bitset of mishna numbers
+        self._bitsets: Dict[int, int] = {}
+        # tag id -> {other tag id: mishnayot carrying both}
+        self._cooccurrence: Dict[int, Counter] = {}
+        self._documents: Dict[str, Tuple[int, Tuple[int, ...]]] = {}
+        self._names: Dict[int, str] = {}
+
+    def _add(self, document: MishnaDocument) -> None:
+        self._names.update(zip(document.tag_ids, document.tags))
+        tag_ids = tuple(set(document.tag_ids))
+        self._documents[document.id] = (document.number, tag_ids)
+        bit = 1 << document.number
+        for tag_id in tag_ids:
+            self._counts[tag_id] += 1
+            self._bitsets[tag_id] = self._bitsets.get(tag_id, 0) | bit
+        for tag_id, other_id in permutations(tag_ids, 2):
+            self._cooccurrence.setdefault(tag_id, Counter())[other_id] += 1
+
+    def _remove(self, mishna_id: str) -> None:
+        entry = self._documents.pop(mishna_id, None)
+        if entry is None:
+            return
+        number, tag_ids = entry
+        for tag_id in tag_ids:
+            self._counts[tag_id] -= 1
+            self._bitsets[tag_id] &= ~(1 << number)
+            if not self._counts[tag_id]:
+                del self._counts[tag_id], self._bitsets[tag_id], self._names[tag_id]
+        for tag_id, other_id in permutations(tag_ids, 2):
+            pairs = self._cooccurrence[tag_id]
+            pairs[other_id] -= 1
+            if not pairs[other_id]:
+                del pairs[other_id]
+                if not pairs:
+                    del self._cooccurrence[tag_id]
+
+    def counts(self) -> Dict[int, int]:
+        """Number of mishnayot per tag, for tags on at least one mishna."""
+        with self._lock:
+            self._ensure_current()
+            return dict(self._counts)
+
+    def cooccurrence(self) -> Dict[int, Dict[int, int]]:
+        """Sparse tag x tag matrix: mishnayot carrying both tags, for pairs that occur."""
+        with self._lock:
+            self._ensure_current()
+            return {tag_id: dict(pairs) for tag_id, pairs in self._cooccurrence.items()}
+
+    def result_facets(self, numbers: Iterable[int]) -> List[TagFacet]:
+        """
+        Number of mishnayot per tag within a result set.
+
+        Args:
+            numbers: Mishna numbers of the results
+
+        Returns:
+            TagFacet for every tag occurring in the results, most frequent first
+        """
+        result_bits = 0
+        for number in numbers:
+            result_bits |= 1 << number
+        with self._lock:
+            self._ensure_current()
+            facets = [TagFacet(tag_id, self._names[tag_id], (bits & result_bits).bit_count())
+                      for tag_id, bits in self._bitsets.items()]
+        return sorted((facet for facet in facets if facet.count), key=lambda facet: (-facet.count, facet.name))
+
+
+tag_facets = TagFacetIndex()
@@ -0,0 +1,207 @@
+"""
+Set-based tagging operations on mishna_tag, tag and categories.
+
+Tagging through the ORM loads each mishna and replaces its tags collection,
+one transaction per mishna, and deleting a Tag loads its mishnaiot to clear
+the association rows one by one. The functions here work on whole sets of
+ids with a few SQL statements in a single transaction, without loading any
+ORM objects, so their cost does not grow with the number of links.
+
+They commit but do not bump the corpus version; the caller does that once
+per request, after the commit.
+"""
+from typing import Iterable, List, NamedTuple, Optional
+
+from flask import current_app
+from sqlalchemy import delete, literal, select, true, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, Category, Mishna, Tag, mishna_tag
+
+
+class TagChangeCounts(NamedTuple):
+    """Number of mishna_tag rows inserted and deleted."""
+    added: int
+    removed: int
+
+
+class TagRemovalCounts(NamedTuple):
+    """Number of tags deleted, and of mishna_tag rows moved to the merge target or deleted."""
+    tags: int
+    links: int
+
+
+def tagged_mishna_ids(tag_ids: Iterable[int]) -> List[str]:
+    """Ids of the mishnayot carrying any of the tags, e.g. to refresh them after the tags are removed."""
+    tag_ids = sorted(set(tag_ids))
+    if not tag_ids:
+        return []
+    return list(db.session.execute(
+        select(mishna_tag.c.mishna_id).where(mishna_tag.c.tag_id.in_(tag_ids)).distinct()).scalars())
+
+
+def apply_tag_changes(mishna_ids: Iterable[str], add_tag_ids: Iterable[int] = (),
+                      remove_tag_ids: Iterable[int] = ()) -> TagChangeCounts:
+    """
+    Add and remove tags on a set of mishnayot in one transaction.
+
+    Every tag in add_tag_ids is linked to every mishna in mishna_ids with
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING, so existing links and
+    unknown ids are skipped. Links between the mishnayot and remove_tag_ids
+    are removed with a single DELETE.
+
+    Args:
+        mishna_ids: Ids of the mishnayot to change
+        add_tag_ids: Ids of the tags to add
+        remove_tag_ids: Ids of the tags to remove
+
+    Returns:
+        TagChangeCounts of the rows actually inserted and deleted
+
+    Raises:
+        ValueError: If a tag is both added and removed
+        SQLAlchemyError: If the transaction failed; nothing is written
+    """
+    mishna_ids = sorted(set(mishna_ids))
+    add_tag_ids, remove_tag_ids = sorted(set(add_tag_ids)), sorted(set(remove_tag_ids))
+    both = set(add_tag_ids) & set(remove_tag_ids)
+    if both:
+        raise ValueError(f'Tags {sorted(both)} are both added and removed')
+    if not mishna_ids or not (add_tag_ids or remove_tag_ids):
+        return TagChangeCounts(0, 0)
+
+    added = removed = 0
+    try:
+        if add_tag_ids:
+            # Cross join of the mishna and tag rows; ids that do not exist drop out
+            pairs = (select(Mishna.id, Tag.id).join(Tag, true())
+                     .where(Mishna.id.in_(mishna_ids), Tag.id.in_(add_tag_ids)))
+            result = db.session.execute(
+                insert(mishna_tag).from_select(['mishna_id', 'tag_id'], pairs).on_conflict_do_nothing()
+            )
+            added = result.rowcount
+        if remove_tag_ids:
+            result = db.session.execute(
+                delete(mishna_tag).where(mishna_tag.c.mishna_id.in_(mishna_ids),
+                                         mishna_tag.c.tag_id.in_(remove_tag_ids))
+            )
+            removed = result.rowcount
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+
+    current_app.logger.info(f'Bulk tagging of {len(mishna_ids)} mishnayot: {added} links added, {removed} removed')
+    return TagChangeCounts(added, removed)
+
+
+def delete_tags(tag_ids: Iterable[int]) -> TagRemovalCounts:
+    """
+    Delete tags together with their links to mishnayot.
+
+    Args:
+        tag_ids: Ids of the tags to delete; unknown ids are skipped
+
+    Returns:
+        TagRemovalCounts of the tags and links deleted
+
+    Raises:
+        SQLAlchemyError: If the transaction failed; nothing is deleted
+    """
+    tag_ids = sorted(set(tag_ids))
+    if not tag_ids:
+        return TagRemovalCounts(0, 0)
+
+    try:
+        links = db.session.execute(delete(mishna_tag).where(mishna_tag.c.tag_id.in_(tag_ids))).rowcount
+        tags = db.session.execute(delete(Tag).where(Tag.id.in_(tag_ids))).rowcount
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+
+    current_app.logger.info(f'Deleted {tags} tags and {links} links')
+    return TagRemovalCounts(tags, links)
+
+
+def merge_tags(source_tag_ids: Iterable[int], target_tag_id: int) -> TagRemovalCounts:
+    """
+    Merge tags into another tag.
+
+    Every mishna tagged with one of the source tags is tagged with the
+    target instead, and the source tags are deleted. A mishna that already
+    has the target, or has several of the sources, ends up with one link.
+
+    Args:
+        source_tag_ids: Ids of the tags to merge away
+        target_tag_id: Id of the tag that remains
+
+    Returns:
+        TagRemovalCounts of the source tags deleted and the links added to the target
+
+    Raises:
+        ValueError: If the target is one of the sources or does not exist
+        SQLAlchemyError: If the transaction failed; nothing is written
+    """
+    source_tag_ids = sorted(set(source_tag_ids))
+    if target_tag_id in source_tag_ids:
+        raise ValueError(f'Tag {target_tag_id} cannot be merged into itself')
+    if not source_tag_ids:
+        return TagRemovalCounts(0, 0)
+
+    try:
+        if db.session.execute(select(Tag.id).where(Tag.id == target_tag_id)).first() is None:
+            raise ValueError(f'Tag {target_tag_id} does not exist')
+
+        mishnas = select(mishna_tag.c.mishna_id, literal(target_tag_id)).where(
+            mishna_tag.c.tag_id.in_(source_tag_ids)).distinct()
+        links = db.session.execute(
+            insert(mishna_tag).from_select(['mishna_id', 'tag_id'], mishnas).on_conflict_do_nothing()
+        ).rowcount
+        db.session.execute(delete(mishna_tag).where(mishna_tag.c.tag_id.in_(source_tag_ids)))
+        tags = db.session.execute(delete(Tag).where(Tag.id.in_(source_tag_ids))).rowcount
+        db.session.commit()
+    except (SQLAlchemyError, ValueError):
+        db.session.rollback()
+        raise
+
+    current_app.logger.info(f'Merged {tags} tags into tag {target_tag_id}, {links} links added')
+    return TagRemovalCounts(tags, links)
+
+
+def recategorize_tags(tag_ids: Iterable[int], category_id: Optional[int]) -> int:
+    """
+    Move tags to another category.
+
+    Args:
+        tag_ids: Ids of the tags to move
+        category_id: Id of the new category, None for uncategorized
+
+    Returns:
+        Number of tags whose category changed
+
+    Raises:
+        ValueError: If the category does not exist
+        SQLAlchemyError: If the transaction failed; nothing is written
+    """
+    tag_ids = sorted(set(tag_ids))
+    if not tag_ids:
+        return 0
+
+    try:
+        if category_id is not None and \
+                db.session.execute(select(Category.id).where(Category.id == category_id)).first() is None:
+            raise ValueError(f'Category {category_id} does not exist')
+
+        moved = db.session.execute(
+            update(Tag).where(Tag.id.in_(tag_ids), Tag.category_id.is_distinct_from(category_id))
+            .values(category_id=category_id)
+        ).rowcount
+        db.session.commit()
+    except (SQLAlchemyError, ValueError):
+        db.session.rollback()
+        raise
+
+    current_app.logger.info(f'Moved {moved} tags to category {category_id}')
+    return moved
@@ -1,5 +1,144 @@
 import re
+import unicodedata
 
 
 def remove_niqqud(text):
-    return re.sub(r'[\u0591-\u05C7]', '', text)
\ No newline at end of file
+    return re.sub(r'[\u0591-\u05C7]', '', text)
+
+
+def query_cache_key(text):
+    """
+    Key under which a query's semantic results are cached and shared.
+
+    Only niqqud and spacing are ignored. Unlike normalize_hebrew, letters are
+    kept as typed: dropping vav and yod would make different words collide
+    (שלום and שלם, דין and דן), and the semantic model sees the letters.
+    """
+    return ' '.join(remove_niqqud(text or '').split())
+
+
+def niqqud_offsets(text):
+    """
+    Map the characters of remove_niqqud(text) back to text.
+
+    Computed once when a mishna is saved (mishna.text_offsets), so spans
+    found in text_raw can be highlighted in text_pretty without rescanning it.
+
+    Args:
+        text: Text with niqqud (text_pretty)
+
+    Returns:
+        List with the index in text of every character of the niqqud-free
+        text, followed by len(text)
+    """
+    offsets = [index for index, char in enumerate(text) if not _is_niqqud(char)]
+    offsets.append(len(text))
+    return offsets
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~ Hebrew Normalization ~~~~~~~~~~~~~~~~~~~~~~~~~
+# Canonical search form of a text. Applied once when a mishna is saved
+# (stored in mishna.text_normalized) and identically to every query, so
+# that spelling variants match:
+#   1. maqaf, paseq and sof pasuq separate words
+#   2. niqqud and cantillation marks are dropped
+#   3. final letters are folded to their regular forms (ך->כ, ם->מ, ...)
+#   4. geresh/gershayim and quote marks are dropped (ר"ת == ר\u05F4ת == רת)
+#   5. other punctuation and symbols become spaces
+#   6. ktiv male/haser: vav and yod are dropped except at the start of a word
+#   7. lowercase, whitespace collapsed
+
+WORD_SEPARATORS = {'\u05BE', '\u05C0', '\u05C3'}  # maqaf, paseq, sof pasuq
+FINAL_LETTERS = {'ך': 'כ', 'ם': 'מ', 'ן': 'נ', 'ף': 'פ', 'ץ': 'צ'}
+QUOTE_MARKS = {'\u05F3', '\u05F4', "'", '"', '`', '\u2018', '\u2019', '\u201C', '\u201D'}
+MATRES_LECTIONIS = {'ו', 'י'}
+
+
+def _is_niqqud(char):
+    return '\u0591' <= char <= '\u05C7'
+
+
+def _normalized_chars(text):
+    """
+    Run the normalization pipeline over text.
+
+    Yields:
+        (char, index) pairs: each character of the normalized text together
+        with the index of the source character it came from
+    """
+    at_word_start = True
+    pending_space = False
+
+    for index, char in enumerate(text):
+        if char in WORD_SEPARATORS:
+            char = ' '
+        elif _is_niqqud(char) or char in QUOTE_MARKS:
+            continue
+        elif not char.isspace() and unicodedata.category(char)[0] in ('P', 'S'):
+            char = ' '
+
+        if char.isspace():
+            pending_space = not at_word_start or pending_space
+            at_word_start = True
+            continue
+
+        char = FINAL_LETTERS.get(char, char).lower()
+        if char in MATRES_LECTIONIS and not at_word_start:
+            continue
+
+        if pending_space:
+            yield ' ', index
+            pending_space = False
+        at_word_start = False
+        yield char, index
+
+
+def normalize_hebrew(text):
+    """
+    Return the canonical search form of a Hebrew text.
+
+    Args:
+        text: Text with or without niqqud
+
+    Returns:
+        Normalized text (see the pipeline description above)
+    """
+    if not text:
+        return ''
+    return ''.join(char for char, _ in _normalized_chars(text))
+
+
+def normalized_tokens(text):
+    """
+    Split text into normalized words, keeping where each word came from.
+
+    Args:
+        text: Text with or without niqqud
+
+    Returns:
+        List of (word, start, end) tuples: the normalized word and the
+        [start, end) span of the source text it was produced from
+    """
+    text = text or ''
+    tokens = []
+    chars = []
+    start = end = 0
+    for char, index in _normalized_chars(text):
+        if char == ' ':
+            tokens.append((''.join(chars), start, end))
+            chars = []
+            continue
+        if not chars:
+            start = index
+        chars.append(char)
+        end = index + 1
+    if chars:
+        tokens.append((''.join(chars), start, end))
+    return [(word, start, _extend_word_end(text, end)) for word, start, end in tokens]
+
+
+def _extend_word_end(text, end):
+    """Extend a word's source span over trailing niqqud and dropped vav/yod."""
+    while end < len(text) and (_is_niqqud(text[end]) or text[end] in MATRES_LECTIONIS):
+        end += 1
+    return end
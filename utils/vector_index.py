@@ -0,0 +1,241 @@
+"""
+Approximate nearest-neighbour (ANN) indexes on mishna.embedding.
+
+Without an index, ordering by `embedding <=> :query_vector` scans and
+compares every row. pgvector offers two index types for cosine distance:
+
+- HNSW: a layered proximity graph. Slower to build and larger, best recall
+  for the latency; tuned at query time with hnsw.ef_search.
+- IVFFlat: k-means lists, of which ivfflat.probes are scanned per query.
+  Quick to build, but the lists are computed from the rows present at build
+  time, so rebuild it after loading substantially more data.
+
+The query-time settings are applied with set_config(..., is_local => true),
+so they last for the current transaction only and never leak to other
+requests through the connection pool.
+"""
+import math
+import statistics
+import time
+from typing import Dict, List, Optional
+
+from flask import current_app
+from sqlalchemy import text
+
+from models import db
+
+TABLE = 'mishna'
+COLUMN = 'embedding'
+INDEX_METHODS = ('hnsw', 'ivfflat')
+
+# pgvector defaults, except probes: pgvector scans a single IVFFlat list, which gives poor recall
+DEFAULT_HNSW_M = 16
+DEFAULT_HNSW_EF_CONSTRUCTION = 64
+DEFAULT_EF_SEARCH = 40
+DEFAULT_PROBES = 10  # same default as VECTOR_IVFFLAT_PROBES in config.py
+
+_SETTINGS = {'hnsw': 'hnsw.ef_search', 'ivfflat': 'ivfflat.probes'}
+
+
+def index_name(method: str) -> str:
+    """Name of the ANN index of the given method."""
+    return f'idx_{TABLE}_{COLUMN}_{method}'
+
+
+def default_lists(row_count: int) -> int:
+    """IVFFlat list count recommended by pgvector: rows / 1000 up to 1M rows, sqrt(rows) above."""
+    if row_count > 1_000_000:
+        return int(math.sqrt(row_count))
+    return max(1, row_count // 1000)
+
+
+def _autocommit_execute(statement: str) -> None:
+    # CREATE/REINDEX ... CONCURRENTLY cannot run inside a transaction block
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.execute(text(statement))
+
+
+def create_index(method: str, m: int = DEFAULT_HNSW_M, ef_construction: int = DEFAULT_HNSW_EF_CONSTRUCTION,
+                 lists: Optional[int] = None, concurrently: bool = True, replace: bool = False) -> str:
+    """
+    Create an ANN index on mishna.embedding for cosine distance.
+
+    Args:
+        method: 'hnsw' or 'ivfflat'
+        m: HNSW connections per node
+        ef_construction: HNSW candidate list size while building
+        lists: IVFFlat list count, derived from the row count if None
+        concurrently: Build without locking out writes
+        replace: Drop an existing index of the same method first, e.g. to change its parameters
+
+    Returns:
+        The CREATE INDEX statement that was executed
+    """
+    if method not in INDEX_METHODS:
+        raise ValueError(f'Unknown index method: {method}')
+
+    if method == 'hnsw':
+        options = f'm = {int(m)}, ef_construction = {int(ef_construction)}'
+    else:
+        if lists is None:
+            row_count = db.session.execute(
+                text(f'SELECT count(*) FROM {TABLE} WHERE {COLUMN} IS NOT NULL')).scalar()
+            db.session.commit()
+            lists = default_lists(row_count)
+        options = f'lists = {int(lists)}'
+
+    if replace:
+        drop_index(method, concurrently=concurrently)
+
+    statement = (f'CREATE INDEX {"CONCURRENTLY " if concurrently else ""}IF NOT EXISTS {index_name(method)} '
+                 f'ON {TABLE} USING {method} ({COLUMN} vector_cosine_ops) WITH ({options})')
+    current_app.logger.info(f'Creating vector index: {statement}')
+    _autocommit_execute(statement)
+    return statement
+
+
+def drop_index(method: str, concurrently: bool = True) -> None:
+    """Drop the ANN index of the given method, if it exists."""
+    _autocommit_execute(f'DROP INDEX {"CONCURRENTLY " if concurrently else ""}IF EXISTS {index_name(method)}')
+
+
+def rebuild_index(method: str, concurrently: bool = True) -> None:
+    """Rebuild an ANN index in place, e.g. to recompute IVFFlat lists after a bulk load."""
+    _autocommit_execute(f'REINDEX INDEX {"CONCURRENTLY " if concurrently else ""}{index_name(method)}')
+
+
+def list_indexes() -> List[Dict]:
+    """
+    ANN indexes present on mishna.embedding.
+
+    Returns:
+        List of dicts with name, definition and size in bytes
+    """
+    rows = db.session.execute(text('''
+        SELECT indexname AS name, indexdef AS definition,
+               pg_relation_size(quote_ident(indexname)::regclass) AS size
+        FROM pg_indexes
+        WHERE tablename = :table AND indexname = ANY(:names)
+        ORDER BY indexname
+    '''), {'table': TABLE, 'names': [index_name(method) for method in INDEX_METHODS]})
+    return [dict(row._mapping) for row in rows]
+
+
+def apply_search_settings(ef_search: Optional[int] = None, probes: Optional[int] = None) -> None:
+    """
+    Set the ANN query-time parameters for the current transaction.
+
+    Args:
+        ef_search: hnsw.ef_search, VECTOR_EF_SEARCH from the config if None
+        probes: ivfflat.probes, VECTOR_IVFFLAT_PROBES from the config if None
+    """
+    if ef_search is None:
+        ef_search = current_app.config.get('VECTOR_EF_SEARCH', DEFAULT_EF_SEARCH)
+    if probes is None:
+        probes = current_app.config.get('VECTOR_IVFFLAT_PROBES', DEFAULT_PROBES)
+    db.session.execute(text('SELECT set_config(:ef_name, :ef_search, true), set_config(:probes_name, :probes, true)'),
+                       {'ef_name': _SETTINGS['hnsw'], 'ef_search': str(ef_search),
+                        'probes_name': _SETTINGS['ivfflat'], 'probes': str(probes)})
+
+
+_NEIGHBOURS_SQL = text(f'''
+    SELECT id FROM {TABLE}
+    WHERE {COLUMN} IS NOT NULL
+    ORDER BY {COLUMN} <=> (SELECT {COLUMN} FROM {TABLE} WHERE id = :id)
+    LIMIT :k
+''')
+
+
+def _timed_neighbours(mishna_id: str, k: int, settings: Dict[str, str]):
+    """Top-k neighbour ids of a stored embedding and the query time in ms, in a fresh transaction."""
+    for name, value in settings.items():
+        db.session.execute(text('SELECT set_config(:name, :value, true)'), {'name': name, 'value': value})
+    started = time.perf_counter()
+    ids = db.session.execute(_NEIGHBOURS_SQL, {'id': mishna_id, 'k': k}).scalars().all()
+    elapsed = (time.perf_counter() - started) * 1000
+    db.session.rollback()
+    return ids, elapsed
+
+
+def _plan_index(mishna_id: str, k: int, settings: Dict[str, str]) -> str:
+    """ANN index the planner picks for the neighbour query, or 'seq scan'."""
+    for name, value in settings.items():
+        db.session.execute(text('SELECT set_config(:name, :value, true)'), {'name': name, 'value': value})
+    plan = db.session.execute(text(f'EXPLAIN (FORMAT JSON) {_NEIGHBOURS_SQL.text}'),
+                              {'id': mishna_id, 'k': k}).scalar()
+    db.session.rollback()
+
+    ann_indexes = {index_name(method) for method in INDEX_METHODS}
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node.get('Index Name') in ann_indexes:
+            return node['Index Name']
+        nodes.extend(node.get('Plans', ()))
+    return 'seq scan'
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def recall_report(method: str, values: List[int], k: int = 10, sample: int = 50) -> List[Dict]:
+    """
+    Compare ANN results with exact search over a sample of stored embeddings.
+
+    Each sampled row's embedding is used as a query. The exact top-k comes
+    from a sequential scan (index scans disabled); the ANN top-k is fetched
+    once per tuning value. When both index types exist the planner picks
+    one, so every row records the index that actually served the queries.
+
+    Args:
+        method: 'hnsw' or 'ivfflat', selecting which setting values tune
+        values: ef_search (HNSW) or probes (IVFFlat) values to try
+        k: Number of neighbours compared
+        sample: Number of query rows
+
+    Returns:
+        One dict per setting ('exact' first) with the index used, recall@k
+        and p50/p95/mean latency in ms
+    """
+    if method not in INDEX_METHODS:
+        raise ValueError(f'Unknown index method: {method}')
+
+    query_ids = db.session.execute(
+        text(f'SELECT id FROM {TABLE} WHERE {COLUMN} IS NOT NULL ORDER BY random() LIMIT :sample'),
+        {'sample': sample}).scalars().all()
+    db.session.rollback()
+    if not query_ids:
+        return []
+
+    exact_settings = {'enable_indexscan': 'off', 'enable_bitmapscan': 'off'}
+    exact, exact_latencies = {}, []
+    for mishna_id in query_ids:
+        exact[mishna_id], elapsed = _timed_neighbours(mishna_id, k, exact_settings)
+        exact_latencies.append(elapsed)
+
+    report = [_report_row('exact', _plan_index(query_ids[0], k, exact_settings),
+                          [1.0] * len(query_ids), exact_latencies)]
+    for value in values:
+        settings = {_SETTINGS[method]: str(value)}
+        recalls, latencies = [], []
+        for mishna_id in query_ids:
+            ids, elapsed = _timed_neighbours(mishna_id, k, settings)
+            expected = exact[mishna_id]
+            recalls.append(len(set(ids) & set(expected)) / len(expected) if expected else 1.0)
+            latencies.append(elapsed)
+        report.append(_report_row(f'{_SETTINGS[method]}={value}', _plan_index(query_ids[0], k, settings),
+                                  recalls, latencies))
+    return report
+
+
+def _report_row(setting: str, index: str, recalls: List[float], latencies: List[float]) -> Dict:
+    return {
+        'setting': setting,
+        'index': index,
+        'recall': statistics.mean(recalls),
+        'p50_ms': _percentile(latencies, 0.5),
+        'p95_ms': _percentile(latencies, 0.95),
+        'mean_ms': statistics.mean(latencies),
+    }